@@ -1,3 +1,4 @@
 pip install -r requirements.txt
 python manage.py collectstatic --no-input
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+python manage.py evaluate_alerts
\ No newline at end of file
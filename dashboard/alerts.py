@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import Max
+
+from weekly.models import StockSnapshot
+from .models import AlertRule, StockAlert
+
+# used when no AlertRule matches (the former hard-coded threshold)
+DEFAULT_WARNING_WEEKS = 5
+DEFAULT_CRITICAL_WEEKS = 2
+
+
+def load_rules():
+    """{(classification, lead_time): (warning, critical)}, "" = any."""
+    return {
+        (r.classification, r.lead_time): (r.warning_weeks, r.critical_weeks)
+        for r in AlertRule.objects.filter(is_active=True)
+    }
+
+
+def match_rule(rules, classification, lead_time):
+    """Most specific rule first: both fields, classification, lead time, default."""
+    classification, lead_time = classification or "", lead_time or ""
+    for key in ((classification, lead_time), (classification, ""), ("", lead_time), ("", "")):
+        if key in rules:
+            return rules[key]
+    return DEFAULT_WARNING_WEEKS, DEFAULT_CRITICAL_WEEKS
+
+
+@transaction.atomic
+def evaluate_alerts(product_ids=None):
+    """
+    Re-evaluate the need-attention rules for the given products (all when
+    None) against their snapshot in the latest recorded week, then upsert the
+    alerts that hold and drop the ones that cleared. An alert that stays
+    active keeps its first-seen week.
+
+    When the latest week moved on, every product is evaluated so alerts of
+    products without a record in the new week are dropped too.
+    """
+    latest = StockSnapshot.objects.aggregate(latest=Max("week_key"))["latest"]
+    if product_ids is not None:
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+        if StockAlert.objects.exclude(week_key=latest).exists():
+            product_ids = None
+
+    snapshots = StockSnapshot.objects.filter(week_key=latest, product__is_active=True)
+    existing = StockAlert.objects.all()
+    if product_ids is not None:
+        snapshots = snapshots.filter(product_id__in=product_ids)
+        existing = existing.filter(product_id__in=product_ids)
+
+    rules = load_rules()
+    alerts = []
+    for pid, classification, lead_time, remaining, inventory in snapshots.values_list(
+        "product_id", "product__classification", "product__lead_time",
+        "remaining_weeks", "inventory",
+    ):
+        warning, critical = match_rule(rules, classification, lead_time)
+        if remaining is None or remaining > warning:
+            continue
+        alerts.append(StockAlert(
+            product_id=pid,
+            severity=StockAlert.CRITICAL if remaining <= critical else StockAlert.WARNING,
+            remaining_weeks=remaining,
+            inventory=inventory,
+            threshold=warning,
+            week_key=latest,
+            first_seen_week_key=latest,
+        ))
+
+    alerting = {a.product_id for a in alerts}
+    cleared = set(existing.values_list("product_id", flat=True)) - alerting
+    if cleared:
+        StockAlert.objects.filter(product_id__in=cleared).delete()
+
+    # first_seen_week_key is left out of update_fields → kept on conflict
+    StockAlert.objects.bulk_create(
+        alerts,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["severity", "remaining_weeks", "inventory", "threshold",
+                       "week_key", "updated_at"],
+    )
+    return len(alerts)
@@ -0,0 +1,197 @@
+import warnings
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from inventory.calendar import week_range
+from weekly.models import WeeklyRecord
+from .models import DemandForecast
+from .versioning import bump_data_version
+
+HISTORY_WEEKS = 104      # weeks of outgoing history loaded into the matrix
+MOVING_AVERAGE_WEEKS = 8  # last N observed weeks
+SMOOTHING_ALPHA = 0.3
+HOLDOUT_WEEKS = 4        # weeks held back to pick the method per product
+
+METHODS = ("moving_average", "exp_smoothing", "linear_trend")
+
+
+def week_axis(last_key, weeks=HISTORY_WEEKS):
+    """Consecutive ISO week keys ending at ``last_key`` (53-week years included)."""
+    return week_range(last_key, 1 - weeks, weeks)
+
+
+def load_outgoing_matrix(weeks=HISTORY_WEEKS, product_ids=None):
+    """
+    Outgoing history as one product × week float matrix (NaN = no record),
+    built from a single values_list() query.
+
+    Returns (product_ids, week_keys, matrix).
+    """
+    records = WeeklyRecord.objects.all()
+    if product_ids is not None:
+        records = records.filter(product_id__in=product_ids)
+
+    last_key = records.aggregate(last=Max("week_key"))["last"]
+    if not last_key:
+        return np.array([], dtype=np.int64), [], np.empty((0, 0))
+
+    keys = week_axis(last_key, weeks)
+    axis = np.asarray(keys)
+    rows = np.array(
+        list(records.filter(week_key__gte=keys[0]).order_by().values_list(
+            "product_id", "week_key", "outgoing_goods"
+        )),
+        dtype=np.float64,
+    ).reshape(-1, 3)
+
+    ids, row_idx = np.unique(rows[:, 0].astype(np.int64), return_inverse=True)
+    col_idx = np.minimum(np.searchsorted(axis, rows[:, 1]), len(axis) - 1)
+    valid = axis[col_idx] == rows[:, 1]  # drops invalid week numbers (e.g. W53 of a 52-week year)
+
+    matrix = np.full((len(ids), len(keys)), np.nan)
+    matrix[row_idx[valid], col_idx[valid]] = rows[valid, 2]
+    return ids, keys, matrix
+
+
+# --- vectorized methods: every function fits all rows at once ---
+
+def moving_average(matrix, window=MOVING_AVERAGE_WEEKS):
+    """Mean of each row's last ``window`` observed weeks."""
+    observed = ~np.isnan(matrix)
+    # observations at or after each column, counted from the right
+    from_end = np.cumsum(observed[:, ::-1], axis=1)[:, ::-1]
+    recent = observed & (from_end <= window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(recent, matrix, 0).sum(axis=1) / recent.sum(axis=1)
+
+
+def exp_smoothing(matrix, alpha=SMOOTHING_ALPHA):
+    """Simple exponential smoothing; the level starts at the first observation."""
+    level = np.full(matrix.shape[0], np.nan)
+    for column in matrix.T:  # loop over weeks, vectorized over products
+        seen = ~np.isnan(column)
+        level = np.where(
+            seen & np.isnan(level), column,
+            np.where(seen, alpha * column + (1 - alpha) * level, level),
+        )
+    return level
+
+
+def linear_trend(matrix, ahead=1):
+    """
+    Least-squares line per row over observed weeks.
+    Returns (forecast ``ahead`` weeks past the last column, slope).
+
+    Closed form rather than scikit-learn's LinearRegression (pinned in
+    requirements.txt): every row has its own missing weeks, which one
+    multi-output fit cannot mask, and a fit per product is what this replaced.
+    """
+    observed = ~np.isnan(matrix)
+    t = np.arange(matrix.shape[1], dtype=np.float64)
+    y = np.where(observed, matrix, 0)
+    n = observed.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t_mean = (observed * t).sum(axis=1) / n
+        y_mean = y.sum(axis=1) / n
+        dt = np.where(observed, t - t_mean[:, None], 0)
+        slope = (dt * (y - y_mean[:, None])).sum(axis=1) / (dt ** 2).sum(axis=1)
+
+    slope = np.where(n >= 2, np.nan_to_num(slope), 0)
+    forecast = y_mean + slope * (matrix.shape[1] - 1 + ahead - t_mean)
+    return forecast, slope
+
+
+def fit_all(matrix):
+    """Next-week forecast of every method for every row, clipped at 0."""
+    trend, slope = linear_trend(matrix)
+    return {
+        "moving_average": np.clip(moving_average(matrix), 0, None),
+        "exp_smoothing": np.clip(exp_smoothing(matrix), 0, None),
+        "linear_trend": np.clip(trend, 0, None),
+    }, slope
+
+
+def holdout_errors(matrix, holdout=HOLDOUT_WEEKS):
+    """
+    Mean absolute error of each method on the last ``holdout`` weeks,
+    fit on the weeks before them. Shape (methods, products), NaN when unknown.
+    """
+    train, actual = matrix[:, :-holdout], matrix[:, -holdout:]
+    fitted, slope = fit_all(train)
+    trend_path = fitted["linear_trend"][:, None] + slope[:, None] * np.arange(holdout)
+
+    errors = []
+    for method in METHODS:
+        predicted = np.clip(trend_path, 0, None) if method == "linear_trend" else fitted[method][:, None]
+        errors.append(np.nanmean(np.abs(predicted - actual), axis=1))
+    return np.vstack(errors)
+
+
+def compute_forecasts(matrix):
+    """
+    Fit every method, choose per product the one with the lowest hold-out
+    error (moving average when the history is too short to compare).
+    """
+    fitted, slope = fit_all(matrix)
+    stacked = np.vstack([fitted[m] for m in METHODS])
+
+    if matrix.shape[1] > HOLDOUT_WEEKS + 2:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows
+            errors = holdout_errors(matrix)
+        best = np.argmin(np.where(np.isnan(errors), np.inf, errors), axis=0)
+        mae = errors[best, np.arange(matrix.shape[0])]
+    else:
+        best = np.zeros(matrix.shape[0], dtype=np.int64)
+        mae = np.full(matrix.shape[0], np.nan)
+
+    return {
+        **fitted,
+        "trend_slope": slope,
+        "method": best,
+        "weekly_forecast": stacked[best, np.arange(matrix.shape[0])],
+        "mae": mae,
+        "observations": (~np.isnan(matrix)).sum(axis=1),
+    }
+
+
+def _clean(value):
+    value = float(value)
+    return 0.0 if np.isnan(value) else round(value, 4)
+
+
+@transaction.atomic
+def refit_forecasts(weeks=HISTORY_WEEKS):
+    """
+    Refit every product with history and replace the DemandForecast table.
+    Two queries to load (latest week, history), then delete + bulk insert.
+    """
+    ids, keys, matrix = load_outgoing_matrix(weeks)
+    result = compute_forecasts(matrix) if len(ids) else {}
+    fitted_at = timezone.now()
+
+    forecasts = [
+        DemandForecast(
+            product_id=int(pid),
+            moving_average=_clean(result["moving_average"][i]),
+            exp_smoothing=_clean(result["exp_smoothing"][i]),
+            linear_trend=_clean(result["linear_trend"][i]),
+            trend_slope=_clean(result["trend_slope"][i]),
+            method=METHODS[result["method"][i]],
+            weekly_forecast=_clean(result["weekly_forecast"][i]),
+            mae=None if np.isnan(result["mae"][i]) else round(float(result["mae"][i]), 4),
+            observations=int(result["observations"][i]),
+            base_week_key=keys[-1],
+            fitted_at=fitted_at,
+        )
+        for i, pid in enumerate(ids)
+    ]
+
+    DemandForecast.objects.all().delete()
+    DemandForecast.objects.bulk_create(forecasts, batch_size=2000)
+    bump_data_version()  # demand changed → projection / reorder recomputed
+    return len(forecasts)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.alerts import evaluate_alerts
+
+
+class Command(BaseCommand):
+    help = "Re-evaluate the need-attention alerts of every product."
+
+    def handle(self, *args, **options):
+        count = evaluate_alerts()
+        self.stdout.write(self.style.SUCCESS(f"{count} active alerts"))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.forecasting import HISTORY_WEEKS, refit_forecasts
+
+
+class Command(BaseCommand):
+    help = "Refit the weekly demand forecast of every product in one batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--weeks", type=int, default=HISTORY_WEEKS,
+                            help="Weeks of outgoing history to fit on.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = refit_forecasts(weeks=options["weeks"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} forecasts refit in {time.perf_counter() - started:.2f}s"
+        ))
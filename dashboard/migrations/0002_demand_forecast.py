@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_data_version'),
+        ('products', '0016_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('moving_average', models.FloatField(default=0)),
+                ('exp_smoothing', models.FloatField(default=0)),
+                ('linear_trend', models.FloatField(default=0)),
+                ('trend_slope', models.FloatField(default=0)),
+                ('method', models.CharField(choices=[('moving_average', 'Moving average'), ('exp_smoothing', 'Exponential smoothing'), ('linear_trend', 'Linear trend')], default='moving_average', max_length=20)),
+                ('weekly_forecast', models.FloatField(default=0)),
+                ('mae', models.FloatField(blank=True, null=True)),
+                ('observations', models.IntegerField(default=0)),
+                ('base_week_key', models.IntegerField(blank=True, null=True)),
+                ('fitted_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecast', to='products.product')),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_demand_forecast'),
+        ('products', '0016_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('classification', models.CharField(blank=True, choices=[('国外', '国外'), ('国内', '国内')], max_length=10)),
+                ('lead_time', models.CharField(blank=True, choices=[('45', '45'), ('60', '60'), ('45～60', '45～60')], max_length=10)),
+                ('warning_weeks', models.FloatField(default=5)),
+                ('critical_weeks', models.FloatField(default=2)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('classification', 'lead_time')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('severity', models.CharField(choices=[('warning', 'Warning'), ('critical', 'Critical')], max_length=10)),
+                ('remaining_weeks', models.FloatField()),
+                ('inventory', models.IntegerField(blank=True, null=True)),
+                ('threshold', models.FloatField()),
+                ('week_key', models.IntegerField()),
+                ('first_seen_week_key', models.IntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alert', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['remaining_weeks'], name='dashboard_s_remaini_78667b_idx'), models.Index(fields=['severity', 'remaining_weeks'], name='dashboard_s_severit_29e429_idx')],
+            },
+        ),
+    ]
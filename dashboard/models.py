@@ -0,0 +1,98 @@
+from django.db import models
+
+from products.models import Product
+
+
+class DataVersion(models.Model):
+    """
+    Single-row watermark bumped on every write to products, weekly records,
+    plans or defaults. Read-heavy views derive their ETag from it.
+    """
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"v{self.version} ({self.updated_at})"
+
+
+class DemandForecast(models.Model):
+    """
+    Weekly outgoing forecast per product, refit in one batch by
+    dashboard.forecasting (``manage.py refit_forecasts``).
+    """
+    METHOD_CHOICES = (
+        ('moving_average', 'Moving average'),
+        ('exp_smoothing', 'Exponential smoothing'),
+        ('linear_trend', 'Linear trend'),
+    )
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='demand_forecast'
+    )
+    moving_average = models.FloatField(default=0)
+    exp_smoothing = models.FloatField(default=0)
+    linear_trend = models.FloatField(default=0)
+    trend_slope = models.FloatField(default=0)  # units / week
+
+    # method with the lowest hold-out error and its forecast
+    method = models.CharField(max_length=20, choices=METHOD_CHOICES, default='moving_average')
+    weekly_forecast = models.FloatField(default=0)
+    mae = models.FloatField(null=True, blank=True)
+
+    observations = models.IntegerField(default=0)  # weeks with a record
+    base_week_key = models.IntegerField(null=True, blank=True)  # last week of history
+    fitted_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.product} : {self.weekly_forecast:.1f}/week ({self.method})"
+
+
+class AlertRule(models.Model):
+    """
+    Need-attention thresholds, in remaining weeks. Blank classification /
+    lead time match any product; the most specific rule wins.
+    """
+    classification = models.CharField(max_length=10, choices=Product.CLASS_CHOICES, blank=True)
+    lead_time = models.CharField(max_length=10, choices=Product.LEAD_CHOICES, blank=True)
+    warning_weeks = models.FloatField(default=5)
+    critical_weeks = models.FloatField(default=2)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('classification', 'lead_time')
+
+    def __str__(self):
+        scope = " / ".join(filter(None, [self.classification, self.lead_time])) or "default"
+        return f"{scope}: warning <= {self.warning_weeks}, critical <= {self.critical_weeks}"
+
+
+class StockAlert(models.Model):
+    """Active need-attention alert per product, maintained by dashboard.alerts."""
+    WARNING = 'warning'
+    CRITICAL = 'critical'
+    SEVERITY_CHOICES = ((WARNING, 'Warning'), (CRITICAL, 'Critical'))
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_alert'
+    )
+    severity = models.CharField(max_length=10, choices=SEVERITY_CHOICES)
+    remaining_weeks = models.FloatField()
+    inventory = models.IntegerField(null=True, blank=True)
+    threshold = models.FloatField()  # warning_weeks of the matching rule
+    week_key = models.IntegerField()  # week the alert was last evaluated on
+    first_seen_week_key = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['remaining_weeks']),
+            models.Index(fields=['severity', 'remaining_weeks']),
+        ]
+
+    def __str__(self):
+        return f"{self.product} : {self.severity} ({self.remaining_weeks:.1f} weeks)"
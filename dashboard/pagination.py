@@ -0,0 +1,162 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+
+def encode_cursor(values, direction, offset):
+    payload = json.dumps({"v": values, "d": direction, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(values, direction, offset) or None for a missing / tampered cursor."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return list(data["v"]), data["d"], int(data["o"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        return None
+
+
+def cached_count(queryset, timeout=None):
+    """
+    COUNT(*) of a filtered queryset, cached per SQL for a short while.
+    Paging through a result set only counts it once; the total may lag
+    behind writes by up to ``timeout`` seconds.
+    """
+    if timeout is None:
+        timeout = settings.KEYSET_COUNT_TIMEOUT
+    sql = str(queryset.order_by().query)
+    key = "count:" + hashlib.md5(sql.encode()).hexdigest()
+
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class KeysetPage:
+    """Page object exposing what the list templates need (no page numbers)."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, start_index, count):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.start_index = start_index
+        self.count = count
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def end_index(self):
+        return self.start_index + len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _parse_ordering(ordering):
+    fields = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+    if fields[-1][0] not in ("id", "pk"):
+        fields.append(("id", False))  # unique tie-breaker
+    return fields
+
+
+def _beyond(fields, values, backwards):
+    """Rows strictly after ``values`` in the ordering (before when backwards)."""
+    q = Q()
+    for i, (name, desc) in enumerate(fields):
+        lookup = "lt" if desc != backwards else "gt"
+        equal = {f"_key{j}": values[j] for j in range(i)}
+        q |= Q(**equal, **{f"_key{i}__{lookup}": values[i]})
+    return q
+
+
+def _filter_beyond(keyed, fields, values, backwards):
+    """
+    ``keyed`` filtered past the cursor values, or None when they do not fit
+    the ordering (tampered cursor, or one from another sort / schema).
+    """
+    if len(values) != len(fields):
+        return None
+    try:
+        return keyed.filter(_beyond(fields, values, backwards))
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def keyset_paginate(queryset, ordering, cursor=None, per_page=50, with_count=True):
+    """
+    Cursor pagination: every page is an indexed range scan of ``per_page + 1``
+    rows, whatever its depth, instead of OFFSET + COUNT(*).
+
+    ``ordering`` is the list of order_by() fields (a SORT_MAP entry); the
+    cursor stores the key of the first/last row shown, plus the row offset
+    so serial numbers keep counting. ``cursor == "last"`` opens the last page;
+    a cursor that does not decode or fit the ordering opens the first one.
+    """
+    fields = _parse_ordering(ordering)
+    keyed = queryset.annotate(**{f"_key{i}": F(name) for i, (name, _) in enumerate(fields)})
+    forward = [f"-_key{i}" if desc else f"_key{i}" for i, (_, desc) in enumerate(fields)]
+    backward = [f"_key{i}" if desc else f"-_key{i}" for i, (_, desc) in enumerate(fields)]
+
+    count = cached_count(queryset) if with_count else None
+
+    if cursor == "last":
+        rows = list(keyed.order_by(*backward)[:per_page])[::-1]
+        offset = max((count or len(rows)) - len(rows), 0)
+        has_more_before, has_more_after = offset > 0, False
+    else:
+        decoded = decode_cursor(cursor)
+        values, direction, offset = decoded if decoded else (None, "n", 0)
+        beyond = None
+        if values is not None:
+            beyond = _filter_beyond(keyed, fields, values, direction == "p")
+        if beyond is None:  # first page
+            values, direction, offset = None, "n", 0
+        offset = max(offset, 0)
+
+        if direction == "p":
+            rows = list(beyond.order_by(*backward)[:per_page + 1])
+            has_more_before = len(rows) > per_page
+            rows = rows[:per_page][::-1]
+            offset = max(offset - len(rows), 0)
+            has_more_after = True
+        else:
+            page = keyed if beyond is None else beyond
+            rows = list(page.order_by(*forward)[:per_page + 1])
+            has_more_after = len(rows) > per_page
+            rows = rows[:per_page]
+            has_more_before = values is not None
+
+    def key_of(row):
+        # model instances, or dicts for values() querysets
+        if isinstance(row, dict):
+            return [row[f"_key{i}"] for i in range(len(fields))]
+        return [getattr(row, f"_key{i}") for i in range(len(fields))]
+
+    next_cursor = previous_cursor = None
+    if rows and has_more_after:
+        next_cursor = encode_cursor(key_of(rows[-1]), "n", offset + len(rows))
+    if rows and has_more_before:
+        previous_cursor = encode_cursor(key_of(rows[0]), "p", offset)
+
+    return KeysetPage(rows, next_cursor, previous_cursor, offset, count)
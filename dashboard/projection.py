@@ -0,0 +1,130 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+
+from products.models import Product
+from inventory.calendar import week_range
+from weekly.models import FutureIncomingPlan, StockSnapshot
+from .versioning import get_data_version
+
+PROJECTION_CACHE_KEY = "dashboard:projection"
+REORDER_CACHE_KEY = "dashboard:reorder"  # dashboard.reorder, same inputs
+PROJECTION_WEEKS = 26  # horizon after the latest recorded week
+CATCH_UP_WEEKS = 52  # at most this many weeks replayed for products recorded before it
+
+
+def weeks_after(base_key, weeks=PROJECTION_WEEKS, first=1):
+    """``weeks`` consecutive ISO week keys, starting ``first`` weeks after ``base_key``."""
+    return week_range(base_key, first, weeks)
+
+
+def project_inventory(inventory, demand, incoming):
+    """
+    Vectorized projection over a product × horizon array.
+
+    ``inventory`` (n,) stock at the base week, ``demand`` (n,) weekly
+    outgoing, ``incoming`` (n, h) planned arrivals per week.
+    Returns (curve (n, h), index of the first stock-out week or -1).
+    """
+    curve = inventory[:, None] + np.cumsum(incoming - demand[:, None], axis=1)
+    short = (curve <= 0) & (demand[:, None] > 0)
+    first = np.where(short.any(axis=1), short.argmax(axis=1), -1)
+    return curve, first
+
+
+def load_inputs(weeks=PROJECTION_WEEKS):
+    """
+    Arrays shared by the projection and the reorder engine, three queries
+    (base week, products, plans) whatever the catalogue size. None without data.
+
+    The horizon starts after the latest recorded week of any product. A
+    product whose own latest record is older is first brought up to that
+    week: its demand and planned arrivals of the weeks in between are
+    replayed (stock floored at 0, at most CATCH_UP_WEEKS), so its stock-out
+    is not reported late by the weeks it was not recorded.
+
+    Demand is the batch-fitted DemandForecast, falling back to
+    Product.forecast for products that were never fitted.
+    """
+    base = StockSnapshot.objects.aggregate(base=Max("week_key"))["base"]
+    if base is None:
+        return None
+
+    keys = weeks_after(base, weeks)
+    gap_keys = weeks_after(base, CATCH_UP_WEEKS, first=1 - CATCH_UP_WEEKS)  # ends at base
+    rows = list(Product.objects.filter(is_active=True).order_by("id").values_list(
+        "id", "yayoi_code", "jan_code", "product_name", "lead_time", "ordering",
+        "stock_snapshot__inventory", "demand_forecast__weekly_forecast", "forecast",
+        "stock_snapshot__week_key",
+    ))
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    inventory = np.array([r[6] or 0 for r in rows], dtype=np.float64)
+    demand = np.array([r[7] if r[7] is not None else (r[8] or 0) for r in rows], dtype=np.float64)
+    recorded = np.array([r[9] or base for r in rows], dtype=np.int64)
+
+    axis_keys = gap_keys + keys
+    incoming = np.zeros((len(ids), len(axis_keys)))
+    plans = np.array(list(
+        FutureIncomingPlan.objects.filter(
+            week_key__gte=axis_keys[0], week_key__lte=axis_keys[-1],
+            product__is_active=True, planned_incoming__gt=0,
+        ).values_list("product_id", "week_key", "planned_incoming")
+    ), dtype=np.int64).reshape(-1, 3)
+    if len(plans) and len(ids):
+        axis = np.asarray(axis_keys)
+        row = np.minimum(np.searchsorted(ids, plans[:, 0]), len(ids) - 1)
+        col = np.minimum(np.searchsorted(axis, plans[:, 1]), len(axis) - 1)
+        valid = (ids[row] == plans[:, 0]) & (axis[col] == plans[:, 1])
+        np.add.at(incoming, (row[valid], col[valid]), plans[valid, 2])
+
+    # --- catch-up: weeks after each product's own record, up to the base week ---
+    behind = np.asarray(gap_keys)[None, :] > recorded[:, None]
+    for col in np.flatnonzero(behind.any(axis=0)):  # vectorized over products
+        inventory = np.where(
+            behind[:, col],
+            np.maximum(inventory + incoming[:, col] - demand, 0),
+            inventory,
+        )
+    incoming = incoming[:, len(gap_keys):]
+
+    return {
+        "base_week_key": base,
+        "week_keys": keys,
+        "products": rows,
+        "ids": ids,
+        "inventory": inventory,
+        "demand": demand,
+        "incoming": incoming,
+    }
+
+
+def compute_projection(weeks=PROJECTION_WEEKS):
+    """Projected inventory and first stock-out week of every active product."""
+    inputs = load_inputs(weeks)
+    if inputs is None:
+        return {"base_week_key": None, "week_keys": [], "product_ids": [],
+                "curve": np.empty((0, 0)), "stockout": {}}
+
+    keys, ids = inputs["week_keys"], inputs["ids"]
+    curve, first = project_inventory(inputs["inventory"], inputs["demand"], inputs["incoming"])
+    return {
+        "base_week_key": inputs["base_week_key"],
+        "week_keys": keys,
+        "product_ids": ids.tolist(),
+        "curve": np.rint(curve).astype(np.int64),
+        "stockout": {int(pid): keys[i] for pid, i in zip(ids, first) if i >= 0},
+    }
+
+
+def get_projection(request=None):
+    """
+    Cached per data version: every record / plan / product / forecast write,
+    in any process (web or run_jobs worker), bumps it.
+    """
+    key = f"{PROJECTION_CACHE_KEY}:{get_data_version(request)[0]}"
+    projection = cache.get(key)
+    if projection is None:
+        projection = compute_projection()
+        cache.set(key, projection, settings.PROJECTION_TIMEOUT)
+    return projection
@@ -0,0 +1,127 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .projection import REORDER_CACHE_KEY, load_inputs, project_inventory, weeks_after
+from .versioning import get_data_version
+
+# Product.lead_time choice → days (a range counts as its upper bound)
+LEAD_TIME_DAYS = {"45": 45, "60": 60, "45～60": 60}
+DEFAULT_LEAD_TIME_DAYS = 60
+
+SAFETY_WEEKS = 2  # safety stock, in weeks of demand
+REVIEW_WEEKS = 4  # an order covers this many weeks after it arrives
+
+
+def compute_reorder(inventory, demand, incoming, lead_weeks, lot):
+    """
+    Vectorized reorder maths for every product at once.
+
+    Inventory position = stock + planned incoming arriving within the lead
+    time. A product needs an order once its position is at or below the
+    reorder point (demand over lead time + safety stock), or when its latest
+    order week has come: the first projected week below safety stock minus
+    the lead time, as an offset from the base week (horizon + 1 when the
+    product never runs short).
+
+    Due now → top up to lead time + review period + safety stock. Due later
+    → the order arrives as stock reaches safety level, so it covers the
+    review period.
+
+    ``lot`` is Product.ordering, read as the order lot size: suppliers ship
+    in multiples of it (cases), so quantities are rounded up to whole lots.
+    Blank / 0 → no lot, rounded up to whole units only.
+    """
+    horizon = incoming.shape[1]
+    within_lead = np.arange(horizon)[None, :] < lead_weeks[:, None]
+    on_order = (incoming * within_lead).sum(axis=1)
+    position = inventory + on_order
+
+    safety = demand * SAFETY_WEEKS
+    reorder_point = demand * lead_weeks + safety
+    needs_order = (demand > 0) & (position <= reorder_point)
+
+    curve, _ = project_inventory(inventory, demand, incoming)
+    short = (curve < safety[:, None]) & (demand[:, None] > 0)
+    has_short = short.any(axis=1)
+    order_offset = np.where(has_short, short.argmax(axis=1) + 1 - lead_weeks, horizon + 1)
+    needs_order |= has_short & (order_offset <= 1)
+
+    target = demand * (lead_weeks + REVIEW_WEEKS) + safety
+    quantity = np.where(
+        needs_order,
+        np.clip(target - position, 0, None),
+        np.where(has_short, demand * REVIEW_WEEKS, 0),
+    )
+    quantity = np.ceil(quantity)
+    quantity = np.where(lot > 0, np.ceil(quantity / np.where(lot > 0, lot, 1)) * lot, quantity)
+
+    return {
+        "on_order": on_order,
+        "position": position,
+        "reorder_point": reorder_point,
+        "needs_order": needs_order,
+        "quantity": quantity,
+        "order_offset": order_offset,
+        "has_short": has_short,
+    }
+
+
+def compute_reorder_suggestions():
+    """
+    Purchase suggestion list: products that need an order now or before the
+    horizon ends, most urgent first. Plain dicts, ready for the page and CSV.
+    """
+    inputs = load_inputs()
+    if inputs is None or not len(inputs["ids"]):
+        return {"base_week_key": None if inputs is None else inputs["base_week_key"], "rows": []}
+
+    products = inputs["products"]
+    lead_days = np.array(
+        [LEAD_TIME_DAYS.get(p[4], DEFAULT_LEAD_TIME_DAYS) for p in products], dtype=np.float64
+    )
+    lead_weeks = np.ceil(lead_days / 7).astype(np.int64)
+    lot = np.array([p[5] or 0 for p in products], dtype=np.float64)  # ordering = lot size
+
+    result = compute_reorder(
+        inputs["inventory"], inputs["demand"], inputs["incoming"], lead_weeks, lot
+    )
+
+    base = inputs["base_week_key"]
+    # offsets run from -lead_weeks (already late) to the end of the horizon
+    first = 1 - int(lead_weeks.max())
+    week_keys = weeks_after(base, len(inputs["week_keys"]) - first + 1, first=first)
+
+    rows = []
+    for i in np.flatnonzero(result["needs_order"] | result["has_short"]):
+        pid, yayoi, jan, name, lead_time = products[i][:5]
+        offset = int(result["order_offset"][i])
+        rows.append({
+            "product_id": pid,
+            "yayoi_code": yayoi,
+            "jan_code": jan,
+            "product_name": name,
+            "lead_time": lead_time,
+            "lead_weeks": int(lead_weeks[i]),
+            "inventory": int(inputs["inventory"][i]),
+            "on_order": int(result["on_order"][i]),
+            "weekly_demand": round(float(inputs["demand"][i]), 1),
+            "reorder_point": round(float(result["reorder_point"][i]), 1),
+            "order_now": bool(result["needs_order"][i]),
+            "latest_order_key": week_keys[offset - first] if result["has_short"][i] else None,
+            "overdue": bool(result["has_short"][i]) and offset < 1,
+            "suggested_quantity": int(result["quantity"][i]),
+        })
+
+    rows.sort(key=lambda r: (r["latest_order_key"] or 999999, r["yayoi_code"]))
+    return {"base_week_key": base, "rows": rows}
+
+
+def get_reorder_suggestions(request=None):
+    """Cached per data version, like the projection."""
+    key = f"{REORDER_CACHE_KEY}:{get_data_version(request)[0]}"
+    suggestions = cache.get(key)
+    if suggestions is None:
+        suggestions = compute_reorder_suggestions()
+        cache.set(key, suggestions, settings.PROJECTION_TIMEOUT)
+    return suggestions
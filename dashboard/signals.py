@@ -0,0 +1,45 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from products.models import Product, ProductDefaults
+from products.services import products_changed
+from weekly.snapshots import snapshots_refreshed
+from .alerts import evaluate_alerts
+from .models import AlertRule
+from .versioning import bump_data_version
+
+
+# Weekly record / plan writes (single or bulk) all end in a snapshot
+# refresh, so snapshots_refreshed covers them.
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductDefaults)
+@receiver(post_delete, sender=ProductDefaults)
+@receiver(post_save, sender=AlertRule)
+@receiver(post_delete, sender=AlertRule)
+@receiver(snapshots_refreshed)
+@receiver(products_changed)
+def bump_version_on_write(sender, **kwargs):
+    bump_data_version()
+
+
+# --- need-attention alerts: re-evaluated where the inputs change ---
+@receiver(snapshots_refreshed)
+def evaluate_alerts_on_refresh(sender, product_ids=None, **kwargs):
+    evaluate_alerts(product_ids)
+
+
+@receiver(products_changed)  # bulk upserts: classification / lead time may have changed
+def evaluate_alerts_on_products_changed(sender, **kwargs):
+    evaluate_alerts()
+
+
+@receiver(post_save, sender=Product)
+def evaluate_alerts_on_product_save(sender, instance, **kwargs):
+    evaluate_alerts([instance.id])
+
+
+@receiver(post_save, sender=AlertRule)
+@receiver(post_delete, sender=AlertRule)
+def evaluate_alerts_on_rule_change(sender, **kwargs):
+    evaluate_alerts()
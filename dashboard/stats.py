@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from products.models import Product
+from weekly.models import StockSnapshot
+from .versioning import get_data_version
+
+STATS_CACHE_KEY = "dashboard:stats"
+
+
+def compute_dashboard_stats():
+    """
+    Dashboard cards + latest-week watermark, two aggregate queries.
+    Inventory is summed over the latest week only (from the stock snapshot).
+    """
+    counts = Product.objects.aggregate(
+        total=Count("id"),
+        active=Count("id", filter=Q(is_active=True)),
+    )
+
+    latest = (
+        StockSnapshot.objects.filter(week_key__isnull=False)
+        .order_by("-week_key")
+        .values("year", "week_no", "week_key")
+        .first()
+    ) or {"year": None, "week_no": None, "week_key": None}
+
+    total_inventory = 0
+    if latest["week_key"] is not None:
+        total_inventory = StockSnapshot.objects.filter(
+            week_key=latest["week_key"], inventory__gt=0
+        ).aggregate(total=Sum("inventory"))["total"] or 0
+
+    return {
+        "total_products": counts["total"],
+        "total_active": counts["active"],
+        "total_inactive": counts["total"] - counts["active"],
+        "total_inventory": total_inventory,
+        "latest_year": latest["year"],
+        "latest_week": latest["week_no"],
+        "latest_week_key": latest["week_key"],
+    }
+
+
+def get_dashboard_stats(request=None):
+    """
+    Cached per data version: a write in any process (web or run_jobs
+    worker) bumps the version, so stale totals are never served.
+    """
+    key = f"{STATS_CACHE_KEY}:{get_data_version(request)[0]}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(key, stats, settings.DASHBOARD_STATS_TIMEOUT)
+    return stats
@@ -0,0 +1,297 @@
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from products.models import Product
+from weekly.models import FutureIncomingPlan, StockSnapshot, WeeklyRecord
+from .alerts import evaluate_alerts
+from .forecasting import (
+    METHODS, compute_forecasts, exp_smoothing, holdout_errors, linear_trend, moving_average,
+)
+from .models import StockAlert
+from .pagination import encode_cursor, keyset_paginate
+from .projection import compute_projection, get_projection
+from .reorder import compute_reorder, get_reorder_suggestions
+from .stats import get_dashboard_stats
+from .versioning import _bump
+
+NAN = np.nan
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        user = CustomUser.objects.create_superuser("admin", "admin@example.com", "pw", role="Admin")
+        self.client.force_login(user)
+        self.product = Product.objects.create(yayoi_code="02-52-0001", product_name="みるく")
+        self.client.get(reverse("dashboard-home"))  # sets the CSRF cookie (part of the ETag)
+
+    def test_unchanged_page_answers_304(self):
+        etag = self.client.get(reverse("dashboard-home"))["ETag"]
+        response = self.client.get(reverse("dashboard-home"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_pending_message_is_not_swallowed_by_a_304(self):
+        etag = self.client.get(reverse("dashboard-home"))["ETag"]
+
+        # the toggle redirects back with a flash message; the watermark is
+        # only bumped on commit, so the page version looks unchanged
+        self.client.get(reverse("toggle_product_status", args=[self.product.yayoi_code]),
+                        HTTP_REFERER=reverse("dashboard-home"))
+        response = self.client.get(reverse("dashboard-home"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "みるく is now inactive.")
+
+
+class ForecastingTests(SimpleTestCase):
+
+    def test_moving_average_of_last_observed_weeks(self):
+        matrix = np.array([
+            np.arange(1, 11, dtype=float),          # last 8 → 3..10
+            [NAN, 2, NAN, 4, NAN, NAN, NAN, NAN, NAN, NAN],
+            [NAN] * 10,
+        ])
+        result = moving_average(matrix, window=8)
+        self.assertEqual(result[0], 6.5)
+        self.assertEqual(result[1], 3)
+        self.assertTrue(np.isnan(result[2]))
+
+    def test_exp_smoothing_skips_missing_weeks(self):
+        matrix = np.array([[NAN, 10, 20, NAN, 30]])
+        # level: 10 → 15 → 15 → 22.5
+        self.assertEqual(exp_smoothing(matrix, alpha=0.5)[0], 22.5)
+
+    def test_linear_trend_over_observed_weeks(self):
+        matrix = np.array([
+            [1, 3, NAN, 7, 9, 11],  # y = 2t + 1
+            [NAN, NAN, 4, NAN, NAN, NAN],
+        ])
+        forecast, slope = linear_trend(matrix)
+        np.testing.assert_allclose(slope, [2, 0])
+        np.testing.assert_allclose(forecast, [13, 4])  # t = 6; one point → flat
+
+    def test_lowest_holdout_error_wins(self):
+        matrix = np.array([
+            np.arange(20) * 2.0,                    # straight line → trend
+            [50.0] * 6 + [5.0] * 14,                # old spike → moving average
+            [10.0] * 6 + [0.0] * 5 + [10.0] * 9,    # recovered dip → smoothing
+        ])
+        errors = holdout_errors(matrix)
+        self.assertEqual(errors.shape, (len(METHODS), 3))
+        self.assertEqual(errors[METHODS.index("linear_trend"), 0], 0)
+        self.assertEqual(errors[METHODS.index("moving_average"), 1], 0)
+
+        result = compute_forecasts(matrix)
+        self.assertEqual([METHODS[m] for m in result["method"]],
+                         ["linear_trend", "moving_average", "exp_smoothing"])
+        np.testing.assert_allclose(result["weekly_forecast"][:2], [40, 5])
+        np.testing.assert_allclose(result["mae"], errors.min(axis=0))
+
+    def test_short_history_defaults_to_moving_average(self):
+        result = compute_forecasts(np.array([[1.0, 2.0, 3.0]]))
+        self.assertEqual(METHODS[result["method"][0]], "moving_average")
+        self.assertTrue(np.isnan(result["mae"][0]))
+
+
+class ReorderTests(SimpleTestCase):
+
+    def test_worked_example(self):
+        horizon = 12
+        incoming = np.zeros((4, horizon))
+        incoming[1, 1] = 30  # arrives within the lead time → on order
+        result = compute_reorder(
+            inventory=np.array([20, 100, 50, 0], dtype=float),
+            demand=np.array([10, 10, 0, 2.5]),
+            incoming=incoming,
+            lead_weeks=np.array([2, 2, 2, 9]),
+            lot=np.array([25, 0, 12, 0], dtype=float),
+        )
+
+        # 0: position 20 <= reorder point 10 x 2 + safety 20 → order now, and
+        #    already late (below safety in week 1, lead time 2 weeks).
+        #    Target 10 x (2 + 4) + 20 = 80 → 60, three lots of 25 → 75.
+        # 1: position 130 > 40; 120 - 10/week falls below 20 in week 12,
+        #    so it is ordered in week 10 for the 4 review weeks: 40.
+        # 2: no demand → never ordered.
+        # 3: target 2.5 x (9 + 4) + 5 = 37.5, no lot → 38 units.
+        self.assertEqual(result["on_order"].tolist(), [0, 30, 0, 0])
+        self.assertEqual(result["reorder_point"].tolist(), [40, 40, 0, 27.5])
+        self.assertEqual(result["needs_order"].tolist(), [True, False, False, True])
+        self.assertEqual(result["order_offset"].tolist(), [-1, 10, horizon + 1, -8])
+        self.assertEqual(result["quantity"].tolist(), [75, 40, 0, 38])
+
+
+class ProjectionTests(TestCase):
+
+    def product(self, code, year, week_no, inventory):
+        # monthly 300 → Product.forecast 70/week; demand set to 10/week below
+        product = Product.objects.create(yayoi_code=code, product_name=code,
+                                         monthly_sales_prediction=300)
+        Product.objects.filter(id=product.id).update(forecast=10)
+        WeeklyRecord.objects.create(product=product, year=year, week_no=week_no, inventory=inventory)
+        return product
+
+    def test_products_recorded_earlier_are_caught_up_to_the_base_week(self):
+        current = self.product("02-52-0001", 2025, 10, 100)
+        behind = self.product("02-52-0002", 2025, 7, 100)
+        arriving = self.product("02-52-0003", 2025, 7, 100)
+        FutureIncomingPlan.objects.create(product=arriving, year=2025, week_no=9, planned_incoming=20)
+
+        projection = compute_projection()
+        self.assertEqual(projection["base_week_key"], 202510)
+        self.assertEqual(projection["stockout"], {
+            current.id: 202520,   # 100 - 10/week from W11
+            behind.id: 202517,    # W8-W10 already consumed 30
+            arriving.id: 202519,  # ... and received 20 in W9
+        })
+
+
+class VersionedCacheTests(TestCase):
+    """
+    Cached dashboard data follows the database watermark: writes from the
+    run_jobs worker (another process, another local cache) are picked up.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def worker_creates_product(self, code, **fields):
+        # no signals in this process; the worker's commit bumps the watermark
+        Product.objects.bulk_create([Product(yayoi_code=code, product_name=code, **fields)])
+        _bump()
+
+    def test_stats(self):
+        self.assertEqual(get_dashboard_stats()["total_products"], 0)
+        self.worker_creates_product("02-52-0001")
+        self.assertEqual(get_dashboard_stats()["total_products"], 1)
+
+    def test_projection_and_reorder(self):
+        product = Product.objects.create(yayoi_code="02-52-0001", product_name="みるく",
+                                         monthly_sales_prediction=300)
+        WeeklyRecord.objects.create(product=product, year=2025, week_no=10, inventory=100)
+        self.assertEqual(len(get_projection()["product_ids"]), 1)
+        self.assertEqual(len(get_reorder_suggestions()["rows"]), 1)
+
+        self.worker_creates_product("02-52-0002", forecast=70)  # bulk insert: save() does not set it
+        self.assertEqual(len(get_projection()["product_ids"]), 2)
+        self.assertEqual(len(get_reorder_suggestions()["rows"]), 2)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # lead time repeats: the id tie-breaker decides the order within one value
+        for n in range(7):
+            Product.objects.create(yayoi_code=f"02-52-000{n}", product_name=f"p{n}",
+                                   lead_time=["45", "60"][n % 2])
+        self.ordered = list(Product.objects.order_by("-lead_time", "id").values_list("id", flat=True))
+
+    def page(self, cursor=None):
+        return keyset_paginate(Product.objects.all(), ["-lead_time"], cursor, per_page=3)
+
+    def ids(self, page):
+        return [p.id for p in page]
+
+    def test_next_pages_cover_every_row_once(self):
+        seen, cursor, starts = [], None, []
+        while True:
+            page = self.page(cursor)
+            seen += self.ids(page)
+            starts.append(page.start_index)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.ordered)
+        self.assertEqual(starts, [0, 3, 6])
+
+    def test_previous_goes_back_one_page(self):
+        second = self.page(self.page().next_cursor)
+        third = self.page(second.next_cursor)
+        back = self.page(third.previous_cursor)
+        self.assertEqual(self.ids(back), self.ids(second))
+        self.assertEqual(back.start_index, 3)
+
+        first = self.page(back.previous_cursor)
+        self.assertEqual(self.ids(first), self.ordered[:3])
+        self.assertFalse(first.has_previous)
+
+    def test_last_page(self):
+        last = self.page("last")
+        self.assertEqual(self.ids(last), self.ordered[-3:])
+        self.assertEqual((last.start_index, last.count), (4, 7))
+        self.assertFalse(last.has_next)
+        self.assertEqual(self.ids(self.page(last.previous_cursor)), self.ordered[1:4])
+
+    def test_bad_cursors_open_the_first_page(self):
+        for cursor in [
+            "not-a-cursor",
+            encode_cursor(["60"], "n", 3),  # one value short
+            encode_cursor(["60", "abc"], "n", 3),  # not an id
+            encode_cursor(["60", "abc"], "p", 3),
+        ]:
+            with self.subTest(cursor=cursor):
+                page = self.page(cursor)
+                self.assertEqual(self.ids(page), self.ordered[:3])
+                self.assertEqual(page.start_index, 0)
+
+    def test_bad_cursor_in_a_list_view(self):
+        user = CustomUser.objects.create_superuser("admin", "admin@example.com", "pw", role="Admin")
+        self.client.force_login(user)
+        # as many values as each view's ordering (+ id), none of the right type
+        for name, fields in [("weekly-summary", 2), ("all_future_incoming", 3),
+                             ("weekly_records_api", 3)]:
+            with self.subTest(view=name):
+                cursor = encode_cursor(["abc"] * fields, "n", 50)
+                response = self.client.get(reverse(name), {"cursor": cursor})
+                self.assertEqual(response.status_code, 200)
+
+
+class AlertTests(TestCase):
+
+    def setUp(self):
+        # forecast 7/week; default rule: warning <= 5 weeks, critical <= 2
+        self.a, self.b = [
+            Product.objects.create(yayoi_code=f"02-52-000{n}", product_name=f"p{n}",
+                                   monthly_sales_prediction=30)
+            for n in range(2)
+        ]
+        self.record(self.a, 10, 14)  # 2 weeks left
+        self.record(self.b, 10, 28)  # 4 weeks left
+
+    def record(self, product, week_no, inventory):
+        return WeeklyRecord.objects.create(product=product, year=2025, week_no=week_no,
+                                           inventory=inventory)
+
+    def alerts(self):
+        return {
+            pid: rest for pid, *rest in StockAlert.objects.values_list(
+                "product_id", "severity", "week_key", "first_seen_week_key")
+        }
+
+    def test_alerts_follow_the_latest_week(self):
+        self.assertEqual(self.alerts(), {
+            self.a.id: ["critical", 202510, 202510],
+            self.b.id: ["warning", 202510, 202510],
+        })
+
+        self.record(self.a, 11, 21)  # still short; b has no record in the new week
+        self.assertEqual(self.alerts(), {self.a.id: ["warning", 202511, 202510]})
+
+    def test_cleared_alert_is_removed(self):
+        record = WeeklyRecord.objects.get(product=self.a)
+        record.inventory = 70
+        record.save()
+        self.assertEqual(set(self.alerts()), {self.b.id})
+
+    def test_partial_evaluation_leaves_other_alerts(self):
+        # both recovered, but only a is re-evaluated
+        StockSnapshot.objects.update(remaining_weeks=10)
+        evaluate_alerts([self.a.id])
+        self.assertEqual(set(self.alerts()), {self.b.id})
+
+        evaluate_alerts()
+        self.assertEqual(self.alerts(), {})
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, views_reorder
 
 urlpatterns = [
     path('', views.home, name='dashboard-home'),
@@ -8,4 +8,5 @@ urlpatterns = [
     path('products/', views.product_list, name='dashboard-products'),
     path('inventory/', views.inventory_list, name='dashboard-inventory'),
     path('need-attention/', views.need_attention_list, name='dashboard-need-attention'),
+    path('reorder/', views_reorder.reorder_suggestions, name='dashboard-reorder'),
    ]
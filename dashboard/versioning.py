@@ -0,0 +1,79 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import DataVersion
+
+WATERMARK_PK = 1
+
+
+def _bump():
+    updated = DataVersion.objects.filter(pk=WATERMARK_PK).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        DataVersion.objects.get_or_create(
+            pk=WATERMARK_PK, defaults={"version": 1, "updated_at": timezone.now()}
+        )
+
+
+def bump_data_version(**kwargs):
+    """Bump the watermark once the current transaction commits (now if none)."""
+    transaction.on_commit(_bump)
+
+
+def get_data_version(request=None):
+    """(version, updated_at), read once per request."""
+    cached = getattr(request, "_data_version", None)
+    if cached is not None:
+        return cached
+
+    row = DataVersion.objects.filter(pk=WATERMARK_PK).values_list("version", "updated_at").first()
+    watermark = row or (0, None)
+    if request is not None:
+        request._data_version = watermark
+    return watermark
+
+
+def data_version_etag(request, *args, **kwargs):
+    version, _ = get_data_version(request)
+    # Page also depends on who asks, the URL, the CSRF token and today's week
+    raw = ":".join(str(part) for part in (
+        version,
+        request.user.pk,
+        request.get_full_path(),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+        timezone.now().date(),
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def data_version_last_modified(request, *args, **kwargs):
+    return get_data_version(request)[1]
+
+
+def conditional_on_data_version(view_func):
+    """
+    ETag / Last-Modified from the data watermark; an unchanged page
+    answers 304 after a single primary-key lookup. Not while flash messages
+    are pending: the cached page would not show them.
+    """
+    conditional = condition(
+        etag_func=data_version_etag, last_modified_func=data_version_last_modified
+    )(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if len(messages.get_messages(request)):  # len() leaves them queued
+            return view_func(request, *args, **kwargs)
+        return conditional(request, *args, **kwargs)
+
+    # browsers revalidate every time, shared caches never store it
+    return cache_control(private=True, no_cache=True)(wrapper)
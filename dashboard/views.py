@@ -1,34 +1,36 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from products.models import Product
-from weekly.models import WeeklyRecord, FutureIncomingPlan
-#from .predict import predict_inventory
-from datetime import date
-from django.utils import timezone
+from weekly.models import WeeklyRecord, week_key
 from django.contrib import messages
-from django.db.models import Max, Subquery, OuterRef, Sum, IntegerField, Value, F, ExpressionWrapper
+from django.db.models import Count, Max, Subquery, OuterRef, Sum, IntegerField, Value, F, ExpressionWrapper
 from django.db.models.functions import Coalesce
 from django.core.paginator import Paginator
 
-import csv
-from django.http import HttpResponse
+from inventory.calendar import iso_week_to_japanese_label, label_for_key
+from .exports import stream_csv, EXPORT_CHUNK_SIZE
+from .stats import get_dashboard_stats
+from .projection import get_projection
+from .models import StockAlert
+from .pagination import keyset_paginate
+from .versioning import conditional_on_data_version
+from products.search import search_products
 
 from django.db.models import Q
 
-def iso_week_to_japanese_label(iso_year: int, iso_week: int) -> str:
-    # Monday of ISO week
-    monday = date.fromisocalendar(iso_year, iso_week, 1)
+def with_stockout(request, items, product_attr="id"):
+    # first projected stock-out week per row, from the cached projection
+    stockout = get_projection(request)["stockout"]
+    for item in items:
+        key = stockout.get(getattr(item, product_attr))
+        item.stockout_key = key
+        item.stockout_label = label_for_key(key)
+    return items
 
-    # Sunday-start week (Japanese UI)
-    sunday = monday
-    return f"{sunday.strftime('%y')}年{sunday.month}月{sunday.day}日週"
-
-today = timezone.now().date()
-current_year, current_week, _ = today.isocalendar()
-week_label = iso_week_to_japanese_label(current_year, current_week)
 
 
 @login_required
+@conditional_on_data_version
 def home(request):
     try:
         products = Product.objects.filter(is_active=True)
@@ -38,36 +40,24 @@ def home(request):
         lead_time_filter = request.GET.get('lead_time')
 
         if search:
-            products = products.filter(product_name__icontains=search)|products.filter(jan_code__icontains=search) |products.filter(yayoi_code__icontains=search)
+            products = search_products(products, search)
         if classification_filter:
             products = products.filter(classification=classification_filter)
         if lead_time_filter:
             products = products.filter(lead_time=lead_time_filter)
         
-        # --- LATEST WEEKLY RECORD ANNOTATIONS ---
-        latest_record = WeeklyRecord.objects.filter(
-            product=OuterRef('pk')
-        ).order_by('-year', '-week_no')
-        
-        # next non-zero incoming (strictly future weeks)
-        future_plans = (
-            FutureIncomingPlan.objects
-            .filter(product=OuterRef('pk'), planned_incoming__gt=0)
-            .filter(
-                Q(year__gt=current_year) |
-                (Q(year=current_year) & Q(week_no__gte=current_week))
-            )
-            .order_by('year', 'week_no')
-        )
-
+        # --- LATEST STOCK (write-maintained snapshot, one join) ---
         products = products.annotate(
-            latest_incoming=Subquery(latest_record.values('incoming_goods')[:1]),
-            latest_outgoing=Subquery(latest_record.values('outgoing_goods')[:1]),
-            latest_inventory=Subquery(latest_record.values('inventory')[:1]),
-            latest_remaining_weeks=Subquery(latest_record.values('remaining_weeks')[:1]),
+            latest_incoming=F('stock_snapshot__incoming_goods'),
+            latest_outgoing=F('stock_snapshot__outgoing_goods'),
+            latest_inventory=F('stock_snapshot__inventory'),
+            latest_remaining_weeks=F('stock_snapshot__remaining_weeks'),
+            # batch-fitted demand (manage.py refit_forecasts)
+            demand_weekly=F('demand_forecast__weekly_forecast'),
+            demand_method=F('demand_forecast__method'),
              # ⭐ NEW COLUMN
             future_incoming=Coalesce(
-                Subquery(future_plans.values('planned_incoming')[:1]),
+                F('stock_snapshot__next_incoming'),
                 Value(0),
                 output_field=IntegerField()
             )
@@ -79,18 +69,13 @@ def home(request):
         page_obj = paginator.get_page(page_number)
         # Calculate starting index for serial numbers
         start_index = (page_obj.number - 1) * paginator.per_page
+        with_stockout(request, page_obj)
 
-        # Get latest week info
-        glatest_record = WeeklyRecord.objects.order_by('-year', '-week_no').first()
-        latest_week= glatest_record.week_no
-        latest_year= glatest_record.year
-        latest_label = iso_week_to_japanese_label(latest_year, latest_week)
-
-        #dashboard stats
-        total_products = Product.objects.all().count()
-        total_inventory = WeeklyRecord.objects.filter(inventory__gt=0).aggregate(total=Sum('inventory'))['total'] or 0
-        total_active = products.count()
-        total_inactive = Product.objects.filter(is_active=False).count()
+        #dashboard stats + latest week info (cached per data version)
+        stats = get_dashboard_stats(request)
+        latest_week= stats['latest_week']
+        latest_year= stats['latest_year']
+        latest_label = iso_week_to_japanese_label(latest_year, latest_week) if latest_year else ""
 
         #need_attention = [r for p in products for r in [WeeklyRecord.objects.filter(product=p, year=current_year, week_no=current_week).first()] if r and r.remaining_weeks<=2]
         # --- NEED ATTENTION (CURRENT WEEK ONLY) ---
@@ -109,38 +94,28 @@ def home(request):
 
         recently_added = products.order_by('-created_at')[:5]        
 
+        # --- NEED ATTENTION (precomputed alert table, see dashboard.alerts) ---
+        alerts = StockAlert.objects.aggregate(count=Count('id'), last=Max('id'))
         need_attention = list(
-        WeeklyRecord.objects.filter(
-            year=latest_year,
-            week_no=latest_week,
-            remaining_weeks__lte=5,
-            product__is_active=True
+            StockAlert.objects.select_related('product').order_by('remaining_weeks')[:5]
         )
-    )
-        # Check your existing condition
-        has_need_attention = len(need_attention) > 0
-        
-        # Reset if no attention needed anymore
-        if len(need_attention) == 0:
-            request.session['need_attention_shown'] = False
 
-        show_modal = False
-        if has_need_attention and not request.session.get('need_attention_modal_shown', False):
-            show_modal = True
-            request.session['need_attention_modal_shown'] = True
+        # the modal opens again whenever the alert set changes (remembered
+        # client-side, so the dashboard never writes to the session)
+        alert_signature = f"{alerts['count']}-{alerts['last']}"
 
         context = {
             'products':page_obj,
-            'total_products':total_products,
-            'total_inventory':total_inventory,
-            'total_active': total_active,
-            'total_inactive': total_inactive,
+            'total_products':stats['total_products'],
+            'total_inventory':stats['total_inventory'],
+            'total_active': stats['total_active'],
+            'total_inactive': stats['total_inactive'],
             'need_attention':need_attention,
+            'need_attention_count':alerts['count'],
+            'alert_signature':alert_signature,
             'recently_added':recently_added,
-            'show_need_attention_popup':show_modal,
+            'show_need_attention_popup':alerts['count'] > 0,
             'show_recently_added_popup':len(recently_added)>0,
-            'current_year':current_year,
-            'current_week':current_week,
             'search':search,
             'classification_filter':classification_filter,
             'lead_time_filter':lead_time_filter,
@@ -148,7 +123,6 @@ def home(request):
             'start_index': start_index,
             'latest_year': latest_year,
             'latest_week': latest_week,
-            'week_label': week_label,
             'latest_label': latest_label,
   
         }
@@ -182,23 +156,22 @@ def export_csv(request):
         messages.error(request, "Invalid week format. Use YYYY-Www.")
         return redirect('weekly-summary')
 
-    # Filter records
+    # Filter records (week_key keeps ranges correct across year boundaries)
     records = WeeklyRecord.objects.filter(
-        year__gte=start_year,
-        year__lte=end_year,
-        week_no__gte=start_week,
-        week_no__lte=end_week
-    ).select_related('product')
+        week_key__gte=week_key(start_year, start_week),
+        week_key__lte=week_key(end_year, end_week)
+    ).values_list(
+        'year', 'week_no',
+        'product__yayoi_code', 'product__jan_code', 'product__product_name',
+        'product__classification', 'product__lead_time', 'product__specifications',
+        'product__monthly_sales_prediction', 'product__forecast',
+        'incoming_goods', 'outgoing_goods', 'inventory', 'remaining_weeks',
+    )
 
     # Build dynamic filename
     filename = f"inventory_export_{start_year}{start_week}_{end_year}{end_week}.csv"
 
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    response.write('\ufeff')
-
-    writer = csv.writer(response)
-    writer.writerow(['年',
+    header = ['年',
         '週',
         '週ラベル',
         '弥生',
@@ -213,28 +186,16 @@ def export_csv(request):
         '出庫',
         '在庫',
         '残週'
-        ])
-
-    for r in records:
-        p = r.product
-        week_label = iso_week_to_japanese_label(r.year, r.week_no)
-        writer.writerow([r.year,
-            r.week_no,
-            week_label,
-            p.yayoi_code,
-            p.jan_code,
-            p.product_name,
-            p.classification,
-            p.lead_time,
-            p.specifications,
-            p.monthly_sales_prediction,
-            p.forecast,
-            r.incoming_goods,
-            r.outgoing_goods,
-            r.inventory,
-            round(r.remaining_weeks, 1),])
-
-    return response
+        ]
+
+    # Streamed in chunks → memory stays flat whatever the range
+    rows = (
+        (year, week_no, iso_week_to_japanese_label(year, week_no), *product_cols,
+         incoming, outgoing, inventory, round(remaining, 1))
+        for year, week_no, *product_cols, incoming, outgoing, inventory, remaining
+        in records.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return stream_csv(filename, header, rows)
 
 
 @login_required
@@ -253,25 +214,20 @@ def weekly_summary(request):
 
     records = WeeklyRecord.objects.select_related("product")#.order_by("-year", "-week_no")
     SORT_MAP = {
-        "year_desc": ("-year", "-week_no"),
-        "year_asc": ("year", "week_no"),
+        "year_desc": ("-week_key",),
+        "year_asc": ("week_key",),
         # "week_desc": ("-week_no",),
         # "week_asc": ("week_no",),
-        "product_asc": ("product__product_name","year", "week_no",),
-        "product_desc": ("-product__product_name","-year", "-week_no",),
-        "yayoi_asc": ("product__yayoi_code","year", "week_no",),
-        "yayoi_desc": ("-product__yayoi_code","-year", "-week_no",),
+        "product_asc": ("product__product_name","week_key",),
+        "product_desc": ("-product__product_name","-week_key",),
+        "yayoi_asc": ("product__yayoi_code","week_key",),
+        "yayoi_desc": ("-product__yayoi_code","-week_key",),
     }
 
-    order_fields = SORT_MAP.get(sort, ("-year", "-week_no"))
-    records = records.order_by(*order_fields)
+    order_fields = SORT_MAP.get(sort, ("-week_key",))
 
     if search:
-        records = records.filter(
-            Q(product__product_name__icontains=search) |
-            Q(product__jan_code__icontains=search) |
-            Q(product__yayoi_code__icontains =search)
-        )
+        records = search_products(records, search, prefix="product__")
     # Apply week range filter if both start and end are provided
     if start_week_input and end_week_input:
         try:
@@ -279,20 +235,10 @@ def weekly_summary(request):
             start_year, start_week = map(int, start_week_input.split('-W'))
             end_year, end_week     = map(int, end_week_input.split('-W'))
 
-            if start_year == end_year:
-                # Same year: simple filter
-                records = records.filter(
-                    year=start_year,
-                    week_no__gte=start_week,
-                    week_no__lte=end_week
-                )
-            else:
-                # Different years: use Q objects
-                records = records.filter(
-                    Q(year=start_year, week_no__gte=start_week) |
-                    Q(year=end_year, week_no__lte=end_week) |
-                    Q(year__gt=start_year, year__lt=end_year)
-                )
+            records = records.filter(
+                week_key__gte=week_key(start_year, start_week),
+                week_key__lte=week_key(end_year, end_week)
+            )
         except ValueError:
         # Invalid input; ignore week filtering
             pass
@@ -300,13 +246,11 @@ def weekly_summary(request):
         end_label   = iso_week_to_japanese_label(end_year, end_week)
         selected_label = f"{start_label} ~ {end_label}"
 
-    # --- Pagination ---
-    paginator = Paginator(records, 50)  # 50 items per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
+    # --- Keyset pagination (cursor follows the active sort, no OFFSET) ---
+    page_obj = keyset_paginate(records, order_fields, request.GET.get('cursor'), per_page=50)
+
     # Calculate starting index for serial numbers
-    start_index = (page_obj.number - 1) * paginator.per_page
+    start_index = page_obj.start_index
     
     context = {
         "records": page_obj,
@@ -315,9 +259,6 @@ def weekly_summary(request):
         'start_index': start_index,
         "start_week_value": start_week_value,
         "end_week_value": end_week_value,
-        "current_year": current_year,
-        "current_week": current_week,
-        "week_label": week_label,
         "selected_label": selected_label,
         "sort": sort,
     }
@@ -329,7 +270,7 @@ def product_list(request):
     products = Product.objects.all()
 
     if search:
-        products = Product.objects.filter(jan_code__icontains=search)
+        products = search_products(products, search)
     
      # --- Pagination ---
     paginator = Paginator(products, 20)  # 20 items per page
@@ -347,23 +288,18 @@ def product_list(request):
 def inventory_list(request):
     search = request.GET.get('search', '')
     
-    # Find the latest weekly record for each product
-    latest_records = WeeklyRecord.objects.filter(
-        product__jan_code=OuterRef('jan_code')
-    ).order_by('-year', '-week_no')
-
-    # Annotate product with latest inventory
+    # Latest weekly record per product comes from the stock snapshot
     products = Product.objects.annotate(
-        year=Subquery(latest_records.values('year')[:1]),
-        week_no=Subquery(latest_records.values('week_no')[:1]),
-        latest_inventory=Subquery(latest_records.values('inventory')[:1]),
-        latest_incoming=Subquery(latest_records.values('incoming_goods')[:1]),
-        latest_outgoing=Subquery(latest_records.values('outgoing_goods')[:1]),
-        latest_remaining_weeks=Subquery(latest_records.values('remaining_weeks')[:1]),
-    ).filter(latest_inventory__gt=0, is_active=True)
+        year=F('stock_snapshot__year'),
+        week_no=F('stock_snapshot__week_no'),
+        latest_inventory=F('stock_snapshot__inventory'),
+        latest_incoming=F('stock_snapshot__incoming_goods'),
+        latest_outgoing=F('stock_snapshot__outgoing_goods'),
+        latest_remaining_weeks=F('stock_snapshot__remaining_weeks'),
+    ).filter(stock_snapshot__inventory__gt=0, is_active=True)
 
     if search:
-        products = products.filter(jan_code__icontains=search)
+        products = search_products(products, search)
     
         # --- Pagination ---
     paginator = Paginator(products, 20)  # 20 items per page
@@ -380,26 +316,18 @@ def inventory_list(request):
     })
 
 @login_required
+@conditional_on_data_version
 def need_attention_list(request):
     search = request.GET.get('search', '')
     export = request.GET.get('export')  # 👈 export flag
     sort = request.GET.get("sort", "-remaining_weeks")  # default sort by remaining weeks desc
-    # find latest week with data
-    latest_record = WeeklyRecord.objects.order_by('-year', "-week_no").first()
-   
-    if not latest_record:
-        return render(request, 'dashboard/need_attention.html', {'records': []})
-     
-    records = WeeklyRecord.objects.filter(year=latest_record.year, 
-                                          week_no=latest_record.week_no, 
-                                          remaining_weeks__lte=5,
-                                          product__is_active=True
-                                          ).select_related("product")
+    stats = get_dashboard_stats(request)
+
+    # active alerts only, maintained on write (dashboard.alerts)
+    records = StockAlert.objects.select_related("product__stock_snapshot")
 
     if search:
-        records = records.filter(Q(product__yayoi_code__icontains=search) | 
-                                 Q(product__product_name__icontains=search)
-                                 )
+        records = search_products(records, search, prefix="product__")
     
     # sort by remaining weeks (highest first)
     #records = records.order_by("-remaining_weeks")
@@ -412,33 +340,25 @@ def need_attention_list(request):
     order_fields = SORT_MAP.get(sort, ("-remaining_weeks"))
     records = records.order_by(order_fields)
 
-    # 🔹 EXPORT MODE (NO PAGINATION)
+    # 🔹 EXPORT MODE (NO PAGINATION, streamed)
     if export == "csv":
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = (
-            f'attachment; filename="need_attention_{latest_record.year}_W{latest_record.week_no}.csv"'
+        stockout = get_projection(request)["stockout"]
+        rows = (
+            (idx, name, jan, yayoi, round(remaining, 1), severity,
+             label_for_key(first_seen), label_for_key(stockout.get(pid)))
+            for idx, (pid, name, jan, yayoi, remaining, severity, first_seen) in enumerate(
+                records.values_list(
+                    'product_id', 'product__product_name', 'product__jan_code',
+                    'product__yayoi_code', 'remaining_weeks', 'severity', 'first_seen_week_key',
+                ).iterator(chunk_size=EXPORT_CHUNK_SIZE),
+                start=1,
+            )
+        )
+        return stream_csv(
+            f"need_attention_{stats['latest_year']}_W{stats['latest_week']}.csv",
+            ['#', '商品名', 'JAN', '弥生', '残週', '重要度', '初回週', '欠品週'],
+            rows,
         )
-        response.write('\ufeff')  # BOM for UTF-8
-
-        writer = csv.writer(response)
-        writer.writerow([
-            '#',
-            '商品名',
-            'JAN',
-            '弥生',
-            '残週'
-        ])
-
-        for idx, r in enumerate(records, start=1):
-            writer.writerow([
-                idx,
-                r.product.product_name,
-                r.product.jan_code,
-                r.product.yayoi_code,
-                round(r.remaining_weeks, 1)
-            ])
-
-        return response
     
     # PAGINATION (20 per page)
     paginator = Paginator(records, 50)
@@ -446,14 +366,14 @@ def need_attention_list(request):
     page_obj = paginator.get_page(page_number)
     # Calculate starting index for serial numbers
     start_index = (page_obj.number - 1) * paginator.per_page
-    
+    with_stockout(request, page_obj, product_attr="product_id")
+    for alert in page_obj:
+        alert.first_seen_label = label_for_key(alert.first_seen_week_key)
+
     return render(request, 'dashboard/need_attention.html', {
         'page_obj': page_obj,
         'search' : search,
         'start_index':start_index,
-        'current_year':current_year,
-        'current_week':current_week,
-        'week_label':week_label,
         'sort':sort,
     })
 
@@ -0,0 +1,50 @@
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.shortcuts import render
+
+from products.models import Product
+from products.search import search_products
+from .exports import stream_csv
+from .reorder import get_reorder_suggestions
+from .versioning import conditional_on_data_version
+from inventory.calendar import label_for_key
+
+@login_required
+@conditional_on_data_version
+def reorder_suggestions(request):
+    search = request.GET.get('search', '')
+    export = request.GET.get('export')
+
+    # whole catalogue in one vectorized pass, cached until the next write
+    suggestions = get_reorder_suggestions(request)
+    rows = suggestions['rows']
+
+    if search:
+        matches = set(search_products(Product.objects.all(), search).values_list('id', flat=True))
+        rows = [r for r in rows if r['product_id'] in matches]
+
+    # 🔹 EXPORT MODE (purchase list)
+    if export == "csv":
+        return stream_csv(
+            f"reorder_suggestions_{suggestions['base_week_key']}.csv",
+            ['弥生', 'JAN', '商品', 'LT', '在庫', '入荷予定(LT内)', '週予測',
+             '発注点', '発注期限', '発注数'],
+            (
+                (r['yayoi_code'], r['jan_code'], r['product_name'], r['lead_time'],
+                 r['inventory'], r['on_order'], r['weekly_demand'], r['reorder_point'],
+                 label_for_key(r['latest_order_key']), r['suggested_quantity'])
+                for r in rows
+            ),
+        )
+
+    paginator = Paginator(rows, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    for r in page_obj:
+        r['latest_order_label'] = label_for_key(r['latest_order_key'])
+
+    return render(request, 'dashboard/reorder.html', {
+        'page_obj': page_obj,
+        'search': search,
+        'start_index': (page_obj.number - 1) * paginator.per_page,
+        'base_label': label_for_key(suggestions['base_week_key']),
+    })
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from accounts.models import CustomUser
 from products.models import Product, ProductMaster
-from weekly.models import WeeklyRecord, WeeklyInventory, FutureIncomingPlan 
+from weekly.models import WeeklyRecord, WeeklyInventory, FutureIncomingPlan, PackRule
+from jobs.models import Job
+from dashboard.models import DemandForecast, AlertRule, StockAlert
 
 admin.site.register(CustomUser)
 admin.site.register(Product)
@@ -9,3 +11,8 @@ admin.site.register(WeeklyRecord)
 admin.site.register(WeeklyInventory)
 admin.site.register(ProductMaster)
 admin.site.register(FutureIncomingPlan)
+admin.site.register(PackRule)
+admin.site.register(Job)
+admin.site.register(DemandForecast)
+admin.site.register(AlertRule)
+admin.site.register(StockAlert)
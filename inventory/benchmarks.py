@@ -0,0 +1,190 @@
+"""
+End-to-end benchmarks of the key views through the Django test client.
+
+Each scenario is ``(name, run)`` where ``run(client, context)`` performs one
+request (uploads also run the jobs they queue) and returns the response.
+``run_benchmarks`` (management command) times them on a generated dataset
+at several scales and writes JSON that can be compared between commits.
+"""
+import statistics
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from jobs.services import run_next_job
+from products.models import Product
+from . import dataset
+from .calendar import current_week, get_week
+from .middleware import QueryStats
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _upload(name, content):
+    return SimpleUploadedFile(name, content, content_type=XLSX)
+
+
+def _run_jobs():
+    """Run every queued job, as ``run_jobs --once`` does; a failed job stops the run."""
+    while (job := run_next_job()) is not None:
+        if job.status != job.DONE:
+            raise RuntimeError(f"{job} failed: {job.error}")
+
+
+def _prepare(context):
+    """Upload files and POST data built once per scale from the generated data."""
+    last_week = context["last_week"]
+    context["files"] = {
+        "products": dataset.products_workbook(),
+        "yayoi_codes": dataset.yayoi_codes_workbook(),
+        "inventory_sheet": dataset.stock_sheet_workbook("総数"),
+        "product_master": dataset.stock_sheet_workbook("入り数"),
+        "historical": dataset.historical_workbook(),
+    }
+
+    # every product selected, half of them with an explicit incoming value
+    bulk = {"year": last_week.year, "week": last_week.week_no, "selected_products": []}
+    for i, (pid, inventory) in enumerate(
+        Product.objects.values_list("id", "stock_snapshot__inventory")
+    ):
+        bulk["selected_products"].append(str(pid))
+        bulk[f"incoming_{pid}"] = str(i % 7) if i % 2 else ""
+        bulk[f"inventory_{pid}"] = str(inventory or 0)
+    context["bulk_post"] = bulk
+
+
+# --- scenarios ---
+
+def home(client, context):
+    return client.get(reverse("dashboard-home"))
+
+
+def weekly_summary(client, context):
+    return client.get(reverse("weekly-summary"))
+
+
+def export_csv(client, context):
+    response = client.get(reverse("export_csv"))
+    if response.streaming:
+        b"".join(response.streaming_content)  # the rows are produced while streaming
+    return response
+
+
+def add_weekly_bulk(client, context):
+    return client.post(reverse("weekly_bulk_add"), context["bulk_post"])
+
+
+def upload_products(client, context):
+    response = client.post(reverse("upload_products"), {
+        "file": _upload("products.xlsx", context["files"]["products"]),
+    })
+    _run_jobs()
+    return response
+
+
+def upload_yayoi_codes(client, context):
+    return client.post(reverse("upload_yayoi_codes"), {
+        "file": _upload("yayoi.xlsx", context["files"]["yayoi_codes"]),
+    })
+
+
+def upload_weekly_inventory(client, context):
+    response = client.post(reverse("upload_weekly_inventory"), {
+        "file": _upload("inventory.xlsx", context["files"]["inventory_sheet"]),
+    })
+    _run_jobs()
+    return response
+
+
+def upload_historical_weekly(client, context):
+    last_week = context["last_week"]
+    response = client.post(reverse("upload_historical_weekly"), {
+        "year": last_week.year,
+        "week_no": last_week.week_no,
+        "file": _upload("historical.xlsx", context["files"]["historical"]),
+    })
+    _run_jobs()
+    return response
+
+
+def upload_product_master(client, context):
+    response = client.post(reverse("upload_product_master"), {
+        "file": _upload("master.xlsx", context["files"]["product_master"]),
+    })
+    _run_jobs()
+    return response
+
+
+SCENARIOS = [
+    ("home", home),
+    ("weekly_summary", weekly_summary),
+    ("export_csv", export_csv),
+    ("add_weekly_bulk", add_weekly_bulk),
+    ("upload_products", upload_products),
+    ("upload_yayoi_codes", upload_yayoi_codes),
+    ("upload_weekly_inventory", upload_weekly_inventory),
+    ("upload_historical_weekly", upload_historical_weekly),
+    ("upload_product_master", upload_product_master),
+]
+
+
+def measure(run, client, context, repeat=5):
+    """
+    One untimed warm-up call (fills caches, turns first-time inserts into the
+    steady-state updates), then ``repeat`` timed calls.
+    """
+    run(client, context)
+
+    timings, queries, status = [], None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with QueryStats() as stats:
+            response = run(client, context)
+        timings.append(time.perf_counter() - started)
+        queries, status = stats.count, response.status_code
+
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "min_ms": round(min(timings) * 1000, 1),
+        "queries": queries,
+        "status": status,
+    }
+
+
+def run_scale(client, products, years=2, repeat=5, names=None, progress=None):
+    """Regenerate the dataset with ``products`` products and time every scenario."""
+    report = progress or (lambda message: None)
+    dataset.flush_dataset()
+    dataset.generate_dataset(products=products, years=years)
+
+    context = {"last_week": get_week(current_week().prev_key)}
+    _prepare(context)
+
+    results = {}
+    for name, run in SCENARIOS:
+        if names and name not in names:
+            continue
+        results[name] = measure(run, client, context, repeat=repeat)
+        report(f"  {name}: {results[name]['median_ms']} ms, {results[name]['queries']} queries")
+    return results
+
+
+def compare(old, new):
+    """
+    Rows of (scale, scenario, old ms, new ms, change %, old queries, new queries)
+    for every scenario present in both result files.
+    """
+    rows = []
+    for scale, scenarios in new["results"].items():
+        for name, result in scenarios.items():
+            before = old.get("results", {}).get(scale, {}).get(name)
+            if before is None:
+                continue
+            change = (
+                (result["median_ms"] - before["median_ms"]) / before["median_ms"] * 100
+                if before["median_ms"] else 0.0
+            )
+            rows.append((scale, name, before["median_ms"], result["median_ms"], change,
+                         before["queries"], result["queries"]))
+    return rows
@@ -0,0 +1,134 @@
+"""
+ISO week helpers shared by every app.
+
+Weeks are keyed ``year*100 + week_no`` (see weekly.models.WeekKeyField).
+A table of every ISO week in TABLE_YEARS (53-week years included) is built
+once per process, so labels and previous/next week lookups are dict hits.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+
+from django.utils import timezone
+
+TABLE_YEARS = (2000, 2100)  # [first, last) ISO years kept in the table
+
+Week = namedtuple("Week", "key year week_no monday label prev_key next_key")
+
+
+def week_key(year, week_no):
+    """Sortable integer for an ISO week, e.g. 2025 W3 → 202503."""
+    if year is None or week_no is None:
+        return None
+    return int(year) * 100 + int(week_no)
+
+
+@lru_cache(maxsize=4096)
+def iso_week_to_japanese_label(iso_year: int, iso_week: int) -> str:
+    # Monday of ISO week
+    monday = date.fromisocalendar(iso_year, iso_week, 1)
+
+    # Sunday-start week (Japanese UI)
+    sunday = monday
+    return f"{sunday.strftime('%y')}年{sunday.month}月{sunday.day}日週"
+
+
+@lru_cache(maxsize=1)
+def week_table():
+    """(weeks in order, {key: index}) for every ISO week of TABLE_YEARS."""
+    first, last = TABLE_YEARS
+    monday = date.fromisocalendar(first, 1, 1)
+    end = date.fromisocalendar(last, 1, 1)
+
+    keys = []
+    while monday < end:
+        year, week_no, _ = monday.isocalendar()
+        keys.append((week_key(year, week_no), year, week_no, monday))
+        monday += timedelta(weeks=1)
+
+    weeks = [
+        Week(key, year, week_no, monday, iso_week_to_japanese_label(year, week_no),
+             keys[i - 1][0] if i else None,
+             keys[i + 1][0] if i + 1 < len(keys) else None)
+        for i, (key, year, week_no, monday) in enumerate(keys)
+    ]
+    return weeks, {w.key: i for i, w in enumerate(weeks)}
+
+
+def _from_monday(monday):
+    year, week_no, _ = monday.isocalendar()
+    key = week_key(year, week_no)
+    prev_year, prev_week, _ = (monday - timedelta(weeks=1)).isocalendar()
+    next_year, next_week, _ = (monday + timedelta(weeks=1)).isocalendar()
+    return Week(key, year, week_no, monday, iso_week_to_japanese_label(year, week_no),
+                week_key(prev_year, prev_week), week_key(next_year, next_week))
+
+
+def get_week(key):
+    """Week for a key; ValueError for a week that does not exist (e.g. W53 of a 52-week year)."""
+    weeks, index = week_table()
+    i = index.get(key)
+    if i is not None:
+        return weeks[i]
+    # outside the table → computed
+    return _from_monday(date.fromisocalendar(key // 100, key % 100, 1))
+
+
+def week_of(day):
+    year, week_no, _ = day.isocalendar()
+    return get_week(week_key(year, week_no))
+
+
+def label_for_key(key):
+    return get_week(key).label if key else ""
+
+
+def previous_iso_week(year, week_no):
+    """(year, week_no) of the week before; week 1 → last ISO week of the previous year."""
+    weeks, index = week_table()
+    i = index.get(week_key(year, week_no))
+    if i:
+        return weeks[i - 1].year, weeks[i - 1].week_no
+    # outside the table (or not a real ISO week) → arithmetic
+    if week_no > 1:
+        return year, week_no - 1
+    prev_year = year - 1
+    return prev_year, date(prev_year, 12, 28).isocalendar()[1]
+
+
+def next_iso_week(year, week_no):
+    weeks, index = week_table()
+    i = index.get(week_key(year, week_no))
+    if i is not None and i + 1 < len(weeks):
+        return weeks[i + 1].year, weeks[i + 1].week_no
+    last_week = date(year, 12, 28).isocalendar()[1]
+    if week_no < last_week:
+        return year, week_no + 1
+    return year + 1, 1
+
+
+def week_range(key, first, count):
+    """``count`` consecutive week keys starting ``first`` weeks after ``key`` (negative = before)."""
+    weeks, index = week_table()
+    i = index.get(key)
+    if i is not None and 0 <= i + first and i + first + count <= len(weeks):
+        return [w.key for w in weeks[i + first:i + first + count]]
+    monday = get_week(key).monday
+    return [_from_monday(monday + timedelta(weeks=n)).key for n in range(first, first + count)]
+
+
+def current_week(request=None):
+    """
+    Today's ISO week. Computed per call (never at import time), and
+    memoized on ``request`` when one is given.
+    """
+    if request is not None:
+        week = getattr(request, "_current_week", None)
+        if week is None:
+            week = request._current_week = week_of(timezone.localdate())
+        return week
+    return week_of(timezone.localdate())
+
+
+def current_week_key(request=None):
+    return current_week(request).key
@@ -0,0 +1,11 @@
+from .calendar import current_week as get_current_week
+
+
+def current_week(request):
+    """Today's week for every template (base.html shows 今週), once per request."""
+    week = get_current_week(request)
+    return {
+        'current_year': week.year,
+        'current_week': week.week_no,
+        'week_label': week.label,
+    }
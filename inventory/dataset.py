@@ -0,0 +1,217 @@
+import io
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from dashboard.forecasting import refit_forecasts
+from products.models import Product, ProductDefaults, ProductMaster
+from products.services import PRODUCT_COLUMNS
+from weekly.models import FutureIncomingPlan, WeeklyInventory, WeeklyRecord
+from weekly.snapshots import refresh_snapshots
+from .calendar import current_week, get_week, week_range
+
+# Japanese-looking catalogue: brand × item × size
+BRANDS = ["わんちゃん", "ねこちゃん", "うさぎさん", "ことり", "はむすたー", "さかな"]
+ITEMS = ["にもやさしいみるく", "ドライフード", "ウェットフード", "おやつジャーキー",
+         "デンタルガム", "シャンプー", "トイレ砂", "ふりかけ"]
+SIZES = ["300ml", "500g", "1kg", "3個", "6袋", "12缶"]
+HANDLING = ["常温", "冷暗所", "要冷蔵"]
+LOTS = [6, 12, 24, 48]
+
+PLAN_WEEKS = 12  # future incoming plans after the current week
+INVENTORY_SHEET_WEEKS = 8  # WeeklyInventory (stock count sheet) weeks kept
+
+BATCH_SIZE = 2000
+
+
+def _catalogue(count, rng):
+    """Product rows as plain dicts (unique yayoi / JAN codes)."""
+    rows = []
+    for n in range(count):
+        name = (
+            f"{BRANDS[n % len(BRANDS)]}{ITEMS[(n // len(BRANDS)) % len(ITEMS)]}"
+            f" {SIZES[rng.integers(len(SIZES))]}"
+        )
+        weekly = float(rng.gamma(2.0, 15.0))  # mean weekly outgoing
+        rows.append({
+            "classification": "国外" if n % 3 == 0 else "国内",
+            "lead_time": ["45", "60", "45～60"][n % 3],
+            "ordering": int(rng.choice(LOTS)),
+            "yayoi_code": f"02-{52 + n // 10000:02d}-{n % 10000:04d}",
+            "jan_code": f"49{n:011d}",
+            "product_name": f"{name} #{n + 1}",
+            "handling": HANDLING[n % len(HANDLING)],
+            "specifications": f"{rng.integers(1, 40)}入",
+            "monthly_sales_prediction": round(weekly * 30 / 7, 1),
+            "weekly": weekly,
+        })
+    return rows
+
+
+def _simulate(weekly, weeks, rng):
+    """
+    Incoming / outgoing / inventory matrices (products × weeks): seasonal
+    Poisson demand, reorders of ~6 weeks of demand when stock runs low.
+    """
+    n = len(weekly)
+    season = 1 + 0.25 * np.sin(np.arange(weeks) * 2 * np.pi / 52 + rng.uniform(0, 2 * np.pi, (n, 1)))
+    demand = rng.poisson(weekly[:, None] * season)
+
+    incoming = np.zeros((n, weeks), dtype=np.int64)
+    outgoing = np.zeros((n, weeks), dtype=np.int64)
+    inventory = np.zeros((n, weeks), dtype=np.int64)
+    stock = np.ceil(weekly * 8).astype(np.int64)
+    for t in range(weeks):  # vectorized over products
+        low = stock < weekly * 3
+        arrive = np.where(low, np.ceil(weekly * 6 * rng.uniform(0.8, 1.2, n)), 0).astype(np.int64)
+        stock = stock + arrive
+        out = np.minimum(demand[:, t], stock)
+        stock = stock - out
+        incoming[:, t], outgoing[:, t], inventory[:, t] = arrive, out, stock
+    return incoming, outgoing, inventory
+
+
+@transaction.atomic
+def generate_dataset(products=500, years=2, seed=0, progress=None):
+    """
+    Fill the database with ``products`` products and ``years`` years of
+    weekly history ending last week, plus plans for the coming weeks.
+    Bulk inserts only; snapshots, alerts and forecasts are rebuilt at the end.
+    Returns row counts per model.
+    """
+    rng = np.random.default_rng(seed)
+    report = progress or (lambda message: None)
+
+    catalogue = _catalogue(products, rng)
+    Product.objects.bulk_create(
+        [Product(**{k: v for k, v in row.items() if k != "weekly"},
+                 forecast=row["monthly_sales_prediction"] / 30 * 7)
+         for row in catalogue],
+        batch_size=BATCH_SIZE,
+    )
+    ids = dict(Product.objects.values_list("yayoi_code", "id"))
+    product_ids = np.array([ids[row["yayoi_code"]] for row in catalogue])
+    weekly = np.array([row["weekly"] for row in catalogue])
+    forecasts = np.array([row["monthly_sales_prediction"] / 30 * 7 for row in catalogue])
+    report(f"{products} products")
+
+    ProductDefaults.objects.bulk_create(
+        [ProductDefaults(product_id=pid, default_outgoing=int(round(w)))
+         for pid, w in zip(product_ids, weekly)],
+        batch_size=BATCH_SIZE,
+    )
+    ProductMaster.objects.bulk_create(
+        [ProductMaster(yayoi_code=row["yayoi_code"], product_name=row["product_name"],
+                       quantity=row["ordering"])
+         for row in catalogue],
+        batch_size=BATCH_SIZE,
+    )
+
+    # --- weekly history: `years` × 52 weeks up to last week ---
+    this_week = current_week()
+    history = week_range(this_week.key, -52 * years, 52 * years)
+    incoming, outgoing, inventory = _simulate(weekly, len(history), rng)
+
+    records = 0
+    for col, key in enumerate(history):
+        week = get_week(key)
+        WeeklyRecord.objects.bulk_create(
+            [WeeklyRecord(product_id=int(pid), year=week.year, week_no=week.week_no,
+                          incoming_goods=int(incoming[i, col]), outgoing_goods=int(outgoing[i, col]),
+                          inventory=int(inventory[i, col]),
+                          remaining_weeks=inventory[i, col] / forecasts[i] if forecasts[i] > 0 else 0,
+                          is_historical=True)
+             for i, pid in enumerate(product_ids)],
+            batch_size=BATCH_SIZE,
+        )
+        records += len(product_ids)
+    report(f"{records} weekly records")
+
+    # --- plans: past arrivals + the next PLAN_WEEKS weeks ---
+    plans = [
+        FutureIncomingPlan(product_id=int(product_ids[i]), year=get_week(history[col]).year,
+                           week_no=get_week(history[col]).week_no,
+                           planned_incoming=int(incoming[i, col]))
+        for i, col in zip(*np.nonzero(incoming))
+    ]
+    for key in week_range(this_week.key, 0, PLAN_WEEKS):
+        week = get_week(key)
+        due = rng.random(len(product_ids)) < 0.15
+        plans += [
+            FutureIncomingPlan(product_id=int(pid), year=week.year, week_no=week.week_no,
+                               planned_incoming=int(np.ceil(w * 6)))
+            for pid, w in zip(product_ids[due], weekly[due])
+        ]
+    FutureIncomingPlan.objects.bulk_create(plans, batch_size=BATCH_SIZE)
+    report(f"{len(plans)} incoming plans")
+
+    # --- stock count sheets of the last weeks ---
+    masters = list(ProductMaster.objects.order_by("id").values_list("id", "quantity"))
+    sheets = 0
+    for col in range(max(len(history) - INVENTORY_SHEET_WEEKS, 0), len(history)):
+        week = get_week(history[col])
+        rows = []
+        for i, (mid, per_case) in enumerate(masters):
+            total = int(inventory[i, col])
+            per_case = per_case or 1
+            rows.append(WeeklyInventory(product_id=mid, year=week.year, week_no=week.week_no,
+                                        total_quantity=total, no_of_cases=total // per_case,
+                                        loose=total % per_case))
+        WeeklyInventory.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        sheets += len(rows)
+
+    refresh_snapshots()
+    refit_forecasts()
+    report("snapshots, alerts and forecasts rebuilt")
+
+    return {
+        "products": products,
+        "weekly_records": records,
+        "plans": len(plans),
+        "weekly_inventory": sheets,
+    }
+
+
+def flush_dataset():
+    """Remove every product (records, plans, defaults cascade) and the product master."""
+    Product.objects.all().delete()
+    ProductMaster.objects.all().delete()
+
+
+# --- upload files in the formats the upload views expect (.xlsx) ---
+
+def _xlsx(df, header_row=0):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, startrow=header_row)
+    return buffer.getvalue()
+
+
+def products_workbook():
+    """products.upload: the PRODUCT_COLUMNS of every product."""
+    return _xlsx(pd.DataFrame(list(Product.objects.values_list(*PRODUCT_COLUMNS)),
+                              columns=PRODUCT_COLUMNS))
+
+
+def yayoi_codes_workbook():
+    """upload_yayoi_codes: product_name / yayoi_code (unchanged codes)."""
+    return _xlsx(pd.DataFrame(list(Product.objects.values_list("product_name", "yayoi_code")),
+                              columns=["product_name", "yayoi_code"]))
+
+
+def stock_sheet_workbook(quantity_column):
+    """Yayoi stock export: header on the 4th row, 商品コード / 商品名 + ``quantity_column``."""
+    rows = ProductMaster.objects.values_list("yayoi_code", "product_name", "quantity")
+    return _xlsx(pd.DataFrame(list(rows), columns=["商品コード", "商品名", quantity_column]),
+                 header_row=3)
+
+
+def historical_workbook():
+    """weekly.historical: one week of yayoi_code / incoming / outgoing / inventory."""
+    snapshot = Product.objects.values_list(
+        "yayoi_code", "stock_snapshot__incoming_goods",
+        "stock_snapshot__outgoing_goods", "stock_snapshot__inventory",
+    )
+    return _xlsx(pd.DataFrame(list(snapshot),
+                              columns=["yayoi_code", "incoming", "outgoing", "inventory"]))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.dataset import flush_dataset, generate_dataset
+from products.models import Product, ProductMaster
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic catalogue with weekly history (local load testing)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=500)
+        parser.add_argument("--years", type=int, default=2, help="Years of weekly history.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--flush", action="store_true",
+                            help="Delete every product and the product master first.")
+
+    def handle(self, *args, **options):
+        if Product.objects.exists() or ProductMaster.objects.exists():
+            if not options["flush"]:
+                raise CommandError("The database already has products; use --flush to replace them.")
+            flush_dataset()
+
+        started = time.perf_counter()
+        counts = generate_dataset(
+            products=options["products"],
+            years=options["years"],
+            seed=options["seed"],
+            progress=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            ", ".join(f"{count} {name}" for name, count in counts.items())
+            + f" in {time.perf_counter() - started:.1f}s"
+        ))
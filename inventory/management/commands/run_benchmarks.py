@@ -0,0 +1,107 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from inventory import benchmarks
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the key views on generated data at several scales, in a throwaway "
+        "test database. Writes JSON results that --compare can diff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", default="100,1000",
+                            help="Comma separated product counts.")
+        parser.add_argument("--years", type=int, default=2, help="Years of weekly history.")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per scenario.")
+        parser.add_argument("--scenario", action="append", dest="scenarios",
+                            help="Only this scenario (repeatable).")
+        parser.add_argument("--output", help="Write the JSON results to this file.")
+        parser.add_argument("--compare", help="Earlier JSON results to compare against.")
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(s) for s in options["scales"].split(",") if s.strip()]
+        except ValueError:
+            raise CommandError("--scales must be comma separated integers, e.g. 100,1000")
+
+        known = [name for name, _ in benchmarks.SCENARIOS]
+        unknown = set(options["scenarios"] or []) - set(known)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))} (known: {', '.join(known)})")
+
+        old = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as f:
+                old = json.load(f)
+
+        report = {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "years": options["years"],
+            "repeat": options["repeat"],
+            "scales": scales,
+            "results": {},
+        }
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # own cache so cached pages / projections never leak between runs
+            with override_settings(
+                CACHES={"default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": "benchmarks",
+                }},
+                QUERY_STATS_ENABLED=False,
+            ):
+                user = get_user_model().objects.create_superuser(
+                    "benchmark", "benchmark@example.com", "benchmark", role="Admin",
+                )
+                client = Client()
+                client.force_login(user)
+
+                for scale in scales:
+                    self.stdout.write(f"{scale} products")
+                    report["results"][str(scale)] = benchmarks.run_scale(
+                        client, scale,
+                        years=options["years"],
+                        repeat=options["repeat"],
+                        names=options["scenarios"],
+                        progress=self.stdout.write,
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if old is not None:
+            self.stdout.write(f"\nvs {old.get('commit') or options['compare']}")
+            for scale, name, before, after, change, q_before, q_after in benchmarks.compare(old, report):
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+                self.stdout.write(style(
+                    f"{scale:>7} {name:<26} {before:>9.1f} → {after:>9.1f} ms ({change:+.0f}%)"
+                    f"  queries {q_before} → {q_after}"
+                ))
@@ -0,0 +1,148 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("inventory.queries")
+
+# literals and IN-lists vary between otherwise identical statements
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+
+
+def sql_shape(sql):
+    """Statement with literals / placeholder lists collapsed, for N+1 detection."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _IN_LIST.sub("(%s, ...)", sql)
+
+
+class QueryStats:
+    """
+    Records every statement run on any connection inside the block
+    (``connection.execute_wrapper``, so DEBUG is not needed).
+    """
+
+    def __init__(self):
+        self.queries = []  # (sql, seconds)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def db_time(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def slowest(self, limit):
+        return sorted(self.queries, key=lambda q: q[1], reverse=True)[:limit]
+
+    def duplicates(self, threshold):
+        """[(count, shape)] of statement shapes run at least ``threshold`` times."""
+        shapes = Counter(sql_shape(sql) for sql, _ in self.queries)
+        return [(count, shape) for shape, count in shapes.most_common() if count >= threshold]
+
+
+class QueryStatsMiddleware:
+    """
+    Opt-in (QUERY_STATS_ENABLED) per-request query count, DB time, slowest
+    statements and repeated statement shapes. Sampled requests get one JSON
+    log line on ``inventory.queries`` (a warning when a shape repeats
+    QUERY_STATS_DUPLICATE_THRESHOLD times); staff users also get a
+    ``Server-Timing`` header.
+
+    Streamed responses (CSV export) run their queries while the body is
+    consumed, after this middleware has returned: their content is wrapped so
+    the statements are still recorded, and the line is logged once the stream
+    is exhausted (``"streamed": true``, no header — it is already sent).
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_STATS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.QUERY_STATS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with QueryStats() as stats:
+            response = self.get_response(request)
+
+        if response.streaming:
+            response.streaming_content = self._consume(
+                request, response, stats, started, response.streaming_content,
+            )
+            return response
+
+        total = time.perf_counter() - started
+        if getattr(request, "user", None) is not None and request.user.is_staff:
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.count} queries"',
+                f'app;dur={(total - stats.db_time) * 1000:.1f}',
+                f"total;dur={total * 1000:.1f}",
+            ])
+        self.log(request, response, stats, total)
+        return response
+
+    def _consume(self, request, response, stats, started, content):
+        """
+        Yield the streamed chunks, recording each one's statements; log once
+        the body is exhausted (or the client went away).
+        """
+        chunks = iter(content)
+        try:
+            while True:
+                # re-entered per chunk: the wrapper must not stay installed
+                # while the server holds the generator between chunks
+                with stats:
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            self.log(request, response, stats, time.perf_counter() - started, streamed=True)
+
+    def log(self, request, response, stats, total, streamed=False):
+        duplicates = stats.duplicates(settings.QUERY_STATS_DUPLICATE_THRESHOLD)
+        line = json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "view": getattr(request.resolver_match, "view_name", None),
+            "status": response.status_code,
+            "streamed": streamed,
+            "queries": stats.count,
+            "db_ms": round(stats.db_time * 1000, 1),
+            "total_ms": round(total * 1000, 1),
+            "slowest": [
+                {"ms": round(seconds * 1000, 1), "sql": sql[:500]}
+                for sql, seconds in stats.slowest(settings.QUERY_STATS_SLOWEST)
+            ],
+            "duplicates": [{"count": count, "sql": shape[:500]} for count, shape in duplicates],
+        }, ensure_ascii=False)
+        logger.log(logging.WARNING if duplicates else logging.INFO, line)
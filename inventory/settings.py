@@ -47,10 +47,13 @@ INSTALLED_APPS = [
     'weekly',
     'dashboard',
     'products',
+    'jobs',
     'django_select2',
    ]
 
 MIDDLEWARE = [
+    # first → times the whole stack; removed at startup unless QUERY_STATS_ENABLED
+    'inventory.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -73,6 +76,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'inventory.context_processors.current_week',
             ],
         },
     },
@@ -110,6 +114,43 @@ DATABASES = {
 }
 
 
+# Cache (dashboard stats...). Local memory by default; CACHE_BACKEND /
+# CACHE_LOCATION select another backend. Cached dashboard data is keyed on the
+# database watermark (dashboard.versioning), so writes made by the run_jobs
+# worker are seen by the web process whatever the backend.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'inventory'),
+    }
+}
+# Upper bound on staleness for writes that do not bump the watermark (e.g. raw SQL)
+DASHBOARD_STATS_TIMEOUT = int(os.environ.get('DASHBOARD_STATS_TIMEOUT', 300))
+# Totals shown under keyset-paginated lists are cached this long
+KEYSET_COUNT_TIMEOUT = int(os.environ.get('KEYSET_COUNT_TIMEOUT', 60))
+# Stock-out projection / reorder suggestions; recomputed after every write anyway
+PROJECTION_TIMEOUT = int(os.environ.get('PROJECTION_TIMEOUT', 3600))
+
+# Per-request query count / DB time (inventory.middleware.QueryStatsMiddleware).
+# Off by default; QUERY_STATS_SAMPLE_RATE keeps the overhead low in production.
+QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'False') == 'True'
+QUERY_STATS_SAMPLE_RATE = float(os.environ.get('QUERY_STATS_SAMPLE_RATE', 1.0))
+QUERY_STATS_SLOWEST = int(os.environ.get('QUERY_STATS_SLOWEST', 3))
+# same statement shape this many times in one request → logged as a likely N+1
+QUERY_STATS_DUPLICATE_THRESHOLD = int(os.environ.get('QUERY_STATS_DUPLICATE_THRESHOLD', 10))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'inventory.queries': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+
 AUTH_USER_MODEL = 'accounts.CustomUser'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
@@ -0,0 +1,262 @@
+import json
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from accounts.models import CustomUser
+from dashboard import urls as dashboard_urls
+from products import urls as products_urls
+from products.models import Product, ProductMaster
+from weekly import urls as weekly_urls
+from . import dataset
+from .calendar import (
+    TABLE_YEARS, current_week, get_week, next_iso_week, previous_iso_week, week_range, week_table,
+)
+
+def iso(day):
+    year, week_no, _ = day.isocalendar()
+    return year, week_no
+
+
+class CalendarTests(SimpleTestCase):
+
+    def test_53_week_years(self):
+        weeks, index = week_table()
+        for key in (202053, 202653, 201553):
+            with self.subTest(key=key):
+                self.assertIn(key, index)
+        self.assertNotIn(202153, index)
+        with self.assertRaises(ValueError):
+            get_week(202153)
+        self.assertEqual(get_week(202053).monday, date(2020, 12, 28))
+        self.assertEqual(get_week(202653).label, "26年12月28日週")
+
+    def test_year_boundaries(self):
+        cases = [
+            # (year, week) → previous, next
+            ((2021, 1), (2020, 53), (2021, 2)),
+            ((2020, 53), (2020, 52), (2021, 1)),
+            ((2027, 1), (2026, 53), (2027, 2)),
+            ((2026, 53), (2026, 52), (2027, 1)),
+            ((2022, 1), (2021, 52), (2022, 2)),
+            ((2021, 52), (2021, 51), (2022, 1)),
+        ]
+        for week, previous, following in cases:
+            with self.subTest(week=week):
+                self.assertEqual(previous_iso_week(*week), previous)
+                self.assertEqual(next_iso_week(*week), following)
+
+    def test_table_matches_date_arithmetic(self):
+        weeks, _ = week_table()
+        self.assertEqual((weeks[0].key, weeks[-1].year), (TABLE_YEARS[0] * 100 + 1, TABLE_YEARS[1] - 1))
+        for week in weeks[1:-1]:
+            self.assertEqual(previous_iso_week(week.year, week.week_no),
+                             iso(week.monday - timedelta(weeks=1)))
+            self.assertEqual(next_iso_week(week.year, week.week_no),
+                             iso(week.monday + timedelta(weeks=1)))
+
+    def test_outside_the_table(self):
+        for monday in (date.fromisocalendar(1998, 53, 1), date.fromisocalendar(2105, 53, 1),
+                       date.fromisocalendar(TABLE_YEARS[0], 1, 1)):
+            week = iso(monday)
+            with self.subTest(week=week):
+                self.assertEqual(previous_iso_week(*week), iso(monday - timedelta(weeks=1)))
+                self.assertEqual(next_iso_week(*week), iso(monday + timedelta(weeks=1)))
+                self.assertEqual(get_week(week[0] * 100 + week[1]).monday, monday)
+
+    def test_week_range_across_the_year_end(self):
+        self.assertEqual(week_range(202052, 0, 3), [202052, 202053, 202101])
+        self.assertEqual(week_range(202102, -2, 2), [202053, 202101])
+        self.assertEqual(week_range(209953, 1, 2), [210001, 210002])  # runs out of the table
+
+
+# Generated catalogue sizes; a view's query count must not grow between them.
+# Data-dependent branches (e.g. alerts cleared or not) may add a statement or
+# two; an N+1 adds one per extra product.
+SMALL, LARGE = 10, 40
+SCALE_TOLERANCE = 2
+
+# Max queries per URL name (GET, cold cache, logged-in Admin).
+# Session + user lookups are included.
+QUERY_BUDGETS = {
+    # dashboard
+    "dashboard-home": 14,
+    "export_csv": 3,
+    "weekly-summary": 4,
+    "dashboard-products": 4,
+    "dashboard-inventory": 4,
+    "dashboard-need-attention": 11,
+    "dashboard-reorder": 6,
+    # weekly
+    "weekly_list": 3,
+    "add_weekly_record": 2,
+    "weekly_bulk_add": 3,
+    "upload_weekly_inventory": 2,
+    "upload_historical_weekly": 2,
+    "future_incoming": 4,
+    "all_future_incoming": 4,
+    "weekly_inventory_form": 4,
+    "save_weekly_inventory_table": 4,
+    "upload_product_master": 2,
+    "weekly_records_api": 3,
+    # products
+    "product_list": 4,
+    "add_product": 2,
+    "update_product": 3,
+    "delete_product": 3,
+    "product_default_settings": 4,
+    "get_product_defaults": 4,
+    "upload_products": 2,
+    "upload_yayoi_codes": 2,
+    "toggle_product_status": 10,
+}
+
+
+def _week_fields(prefix="week"):
+    week = current_week()
+    return {"year": week.year, prefix: week.week_no}
+
+
+def _bulk_add(products, masters):
+    data = {**_week_fields(), "selected_products": [str(p.id) for p in products]}
+    for p in products:
+        data[f"incoming_{p.id}"] = "3"
+        data[f"inventory_{p.id}"] = "10"
+    return data
+
+
+def _inventory_table(products, masters):
+    data = _week_fields("week_no")
+    for m in masters:
+        data[f"quantity_{m.id}"] = str(m.quantity)
+        data[f"total_{m.id}"] = "25"
+    return data
+
+
+def _future_incoming(products, masters):
+    week = current_week()
+    data = {"week": f"{week.year}-W{week.week_no:02d}"}
+    for i, p in enumerate(products):
+        data[f"incoming_{p.id}"] = str(i % 3)  # 0 → the plan is removed
+    return data
+
+
+def _default_settings(products, masters):
+    return {f"default_outgoing_{p.id}": "7" for p in products}
+
+
+# Routes whose POST writes one row per product: max queries per URL name.
+POST_BUDGETS = {
+    "weekly_bulk_add": (27, _bulk_add),
+    "save_weekly_inventory_table": (5, _inventory_table),
+    "future_incoming": (15, _future_incoming),
+    "product_default_settings": (5, _default_settings),
+}
+
+ROUTE_MODULES = [dashboard_urls, weekly_urls, products_urls]
+
+
+def route_names():
+    return {p.name for m in ROUTE_MODULES for p in m.urlpatterns if isinstance(p, URLPattern)}
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Query counts per view at two catalogue sizes: over budget, or growing
+    with the number of products (an N+1), fails.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_superuser(
+            "budget", "budget@example.com", "budget", role="Admin",
+        )
+        self.client.force_login(self.user)
+
+    def url(self, name):
+        if name in ("update_product", "delete_product", "toggle_product_status"):
+            return reverse(name, args=[Product.objects.order_by("id").first().yayoi_code])
+        return reverse(name)
+
+    def count(self, method, name, data=None):
+        cache.clear()
+        url = self.url(name)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data or {})
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 500, f"{method.upper()} {name}")
+        return len(queries)
+
+    def measure(self, products):
+        dataset.flush_dataset()
+        dataset.generate_dataset(products=products, years=1)
+        items = list(Product.objects.order_by("id"))
+        masters = list(ProductMaster.objects.order_by("id"))
+
+        counts = {("get", name): self.count("get", name) for name in QUERY_BUDGETS}
+        for name, (_, build) in POST_BUDGETS.items():
+            counts["post", name] = self.count("post", name, build(items, masters))
+        return counts
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(route_names(), set(QUERY_BUDGETS))
+        self.assertLessEqual(set(POST_BUDGETS), set(QUERY_BUDGETS))
+
+    def test_query_budgets(self):
+        small = self.measure(SMALL)
+        large = self.measure(LARGE)
+
+        for (method, name), count in large.items():
+            budget = QUERY_BUDGETS[name] if method == "get" else POST_BUDGETS[name][0]
+            with self.subTest(method=method, view=name):
+                self.assertLessEqual(
+                    count, budget, f"{method.upper()} {name}: {count} queries, budget {budget}"
+                )
+                self.assertLessEqual(
+                    count - small[method, name], SCALE_TOLERANCE,
+                    f"{method.upper()} {name}: {small[method, name]} queries with {SMALL} "
+                    f"products, {count} with {LARGE}",
+                )
+
+
+@override_settings(QUERY_STATS_ENABLED=True, QUERY_STATS_SAMPLE_RATE=1.0)
+class QueryStatsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        dataset.generate_dataset(products=SMALL, years=1)
+        self.client = Client()  # middleware is loaded with the overridden settings
+
+    def login(self, is_staff):
+        name = "staff" if is_staff else "user"
+        user = CustomUser.objects.create_user(
+            name, f"{name}@example.com", name, role="Admin", is_staff=is_staff,
+        )
+        self.client.force_login(user)
+
+    def get(self, name):
+        with self.assertLogs("inventory.queries", "INFO") as logs:
+            response = self.client.get(reverse(name))
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return response, json.loads(logs.records[-1].getMessage())
+
+    def test_server_timing_is_staff_only(self):
+        self.login(is_staff=False)
+        response, line = self.get("weekly-summary")
+        self.assertNotIn("Server-Timing", response)
+        self.assertGreater(line["queries"], 0)
+
+        self.login(is_staff=True)
+        response, _ = self.get("weekly-summary")
+        self.assertIn("queries", response["Server-Timing"])
+
+    def test_streamed_queries_are_counted(self):
+        self.login(is_staff=True)
+        response, line = self.get("export_csv")
+        self.assertTrue(line["streamed"])
+        self.assertNotIn("Server-Timing", response)
+        self.assertTrue(any("weekly_weeklyrecord" in q["sql"] for q in line["slowest"]))
@@ -24,6 +24,7 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('products/', include('products.urls')),
     path('weekly/', include('weekly.urls')),
+    path('jobs/', include('jobs.urls')),
     path('', include('dashboard.urls')),
     path("select2/", include("django_select2.urls")),
 ]
@@ -0,0 +1,56 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.services import fail_stale_jobs, run_next_job, run_periodic_tasks
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (uploads...). Keep one running next to gunicorn."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Run every queued job, then exit.")
+        parser.add_argument("--poll", type=float, default=2.0,
+                            help="Seconds to wait between polls when the queue is empty.")
+        parser.add_argument("--periodic", type=float, default=60.0,
+                            help="Seconds between housekeeping runs (stale jobs, passed plans...).")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        last_periodic = None
+        while not self.stopping:
+            close_old_connections()
+
+            now = time.monotonic()
+            if last_periodic is None or now - last_periodic >= options["periodic"]:
+                # not only at start: a job orphaned shortly before a restart
+                # becomes stale while this worker runs
+                failed = fail_stale_jobs()
+                if failed:
+                    self.stdout.write(self.style.WARNING(f"{failed} stale jobs marked as failed"))
+                run_periodic_tasks()
+                last_periodic = now
+
+            job = run_next_job()
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll"])
+                continue
+
+            style = self.style.SUCCESS if job.status == job.DONE else self.style.ERROR
+            self.stdout.write(style(
+                f"{job} {job.rows_processed} rows in {job.elapsed:.2f}s "
+                f"({job.throughput:.0f} rows/s) {job.error}"
+            ))
+
+    def stop(self, signum, frame):
+        # finish the current job, then exit
+        self.stopping = True
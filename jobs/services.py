@@ -0,0 +1,179 @@
+import io
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# kind → handler(job, file, progress) returning {"message", "warnings", ...result}
+HANDLERS = {}
+
+# name → housekeeping callable run by the worker (run_jobs --periodic seconds)
+PERIODIC = {}
+
+# a running job whose heartbeat is older than this is considered dead
+STALE_AFTER = timedelta(minutes=15)
+
+
+class JobError(Exception):
+    """Expected failure (bad file, missing columns...) shown to the user as-is."""
+
+
+def job_handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def periodic_task(name):
+    def register(func):
+        PERIODIC[name] = func
+        return func
+    return register
+
+
+def run_periodic_tasks():
+    """Run every registered housekeeping task; one failing does not stop the others."""
+    for name, func in PERIODIC.items():
+        try:
+            func()
+        except Exception:
+            logger.error("Periodic task %s failed\n%s", name, traceback.format_exc())
+
+
+def enqueue(kind, file=None, user=None, **params):
+    """Store the job (and the uploaded file's bytes) and return it right away."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    return Job.objects.create(
+        kind=kind,
+        created_by=user if user is not None and user.is_authenticated else None,
+        file_name=file.name if file else "",
+        file_data=file.read() if file else None,
+        params=params,
+    )
+
+
+class Progress:
+    """
+    Progress callback handed to handlers: ``progress(done, total=None)``.
+
+    Writes are throttled so a tight loop does not turn into one UPDATE per row.
+    """
+
+    def __init__(self, job, interval=0.5):
+        self.job = job
+        self.interval = interval
+        self.last_write = 0.0
+
+    def __call__(self, done, total=None, force=False):
+        self.job.rows_processed = done
+        fields = {"rows_processed": done, "updated_at": timezone.now()}
+        if total is not None:
+            self.job.rows_total = total
+            fields["rows_total"] = total
+            force = True
+
+        now = time.monotonic()
+        if force or now - self.last_write >= self.interval:
+            Job.objects.filter(id=self.job.id).update(**fields)
+            self.last_write = now
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest queued job to running. The conditional
+    UPDATE makes this safe with several workers on any database.
+    """
+    candidates = Job.objects.filter(status=Job.QUEUED).order_by("created_at", "id")
+    for job_id in candidates.values_list("id", flat=True)[:10]:
+        claimed = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, started_at=timezone.now(), updated_at=timezone.now()
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    progress = Progress(job)
+    file = io.BytesIO(bytes(job.file_data)) if job.file_data is not None else None
+    if file is not None:
+        file.name = job.file_name
+
+    try:
+        outcome = HANDLERS[job.kind](job, file, progress)
+    except JobError as e:
+        job.status = Job.FAILED
+        job.error = str(e)
+    except Exception as e:
+        logger.error("Job %s failed\n%s", job.id, traceback.format_exc())
+        job.status = Job.FAILED
+        job.error = f"Unexpected error: {e}"
+    else:
+        outcome = dict(outcome or {})
+        job.status = Job.DONE
+        job.message = outcome.pop("message", "")
+        job.warnings = outcome.pop("warnings", [])
+        job.result = outcome
+        if job.rows_total is not None:
+            job.rows_processed = job.rows_total
+
+    job.finished_at = timezone.now()
+    job.file_data = None  # the upload is not needed anymore
+    fields = ["status", "message", "warnings", "result", "error",
+              "rows_processed", "finished_at", "file_data"]
+    # only while still running: fail_stale_jobs may have given up on it meanwhile
+    finished = Job.objects.filter(id=job.id, status=Job.RUNNING).update(
+        updated_at=job.finished_at, **{name: getattr(job, name) for name in fields}
+    )
+    if not finished:
+        logger.warning("Job %s finished after it was marked as failed", job.id)
+        job.refresh_from_db()
+    return job
+
+
+def run_next_job():
+    job = claim_next_job()
+    if job is not None:
+        run_job(job)
+    return job
+
+
+def fail_stale_jobs():
+    """Jobs left running by a worker that died (deploy, OOM...)."""
+    return Job.objects.filter(
+        Q(updated_at__lt=timezone.now() - STALE_AFTER) | Q(started_at__isnull=True),
+        status=Job.RUNNING,
+    ).update(
+        status=Job.FAILED,
+        error="The worker stopped before this job finished. Please upload again.",
+        finished_at=timezone.now(),
+        file_data=None,
+    )
+
+
+def job_status(job):
+    """JSON-ready view of a job for the polling endpoint."""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "file_name": job.file_name,
+        "rows_total": job.rows_total,
+        "rows_processed": job.rows_processed,
+        "elapsed": round(job.elapsed, 2),
+        "throughput": round(job.throughput, 1),
+        "message": job.message,
+        "warnings": job.warnings,
+        "error": job.error,
+        "result": job.result if job.status == Job.DONE else None,
+    }
@@ -0,0 +1,121 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .services import (
+    HANDLERS, STALE_AFTER, JobError, claim_next_job, enqueue, fail_stale_jobs, run_job,
+)
+
+
+def echo_job(job, file, progress):
+    progress(0, total=2)
+    return {"message": "read", "warnings": ["w"], "size": len(file.read()), **job.params}
+
+
+def bad_file_job(job, file, progress):
+    raise JobError("Missing required columns")
+
+
+def crashing_job(job, file, progress):
+    raise KeyError("商品コード")
+
+
+TEST_HANDLERS = {"test.echo": echo_job, "test.bad_file": bad_file_job, "test.crash": crashing_job}
+
+
+@mock.patch.dict(HANDLERS, TEST_HANDLERS)
+class JobQueueTests(TestCase):
+
+    def queue(self, kind="test.echo", **params):
+        return enqueue(kind, SimpleUploadedFile("sheet.xlsx", b"12345"), **params)
+
+    def test_unknown_kind_is_refused(self):
+        with self.assertRaises(ValueError):
+            enqueue("test.nope")
+
+    def test_claims_oldest_queued_job_first(self):
+        first, second = self.queue(), self.queue()
+        Job.objects.filter(id=second.id).update(created_at=first.created_at - timedelta(seconds=1))
+
+        claimed = claim_next_job()
+        self.assertEqual(claimed.id, second.id)
+        self.assertEqual(claimed.status, Job.RUNNING)
+        self.assertIsNotNone(claimed.started_at)
+
+        self.assertEqual(claim_next_job().id, first.id)
+        self.assertIsNone(claim_next_job())  # running jobs are never claimed again
+
+    def test_successful_job(self):
+        self.queue(week=3)
+        job = run_job(claim_next_job())
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.message, "read")
+        self.assertEqual(job.warnings, ["w"])
+        self.assertEqual(job.result, {"size": 5, "week": 3})
+        self.assertEqual(job.rows_processed, 2)
+        self.assertIsNone(job.file_data)
+
+    def test_expected_failure_keeps_the_message(self):
+        self.queue("test.bad_file")
+        job = run_job(claim_next_job())
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.error, "Missing required columns")
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(job.file_data)
+
+    def test_unexpected_failure_is_reported(self):
+        self.queue("test.crash")
+        with self.assertLogs("jobs.services", "ERROR"):
+            job = run_job(claim_next_job())
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertTrue(job.error.startswith("Unexpected error:"))
+        self.assertIsNone(job.file_data)
+
+    def test_stale_running_jobs_are_failed(self):
+        stale, fresh, queued = self.queue(), self.queue(), self.queue()
+        now = timezone.now()
+        Job.objects.filter(id__in=[stale.id, fresh.id]).update(status=Job.RUNNING, started_at=now)
+        Job.objects.filter(id=stale.id).update(updated_at=now - STALE_AFTER - timedelta(minutes=1))
+
+        self.assertEqual(fail_stale_jobs(), 1)
+        statuses = dict(Job.objects.values_list("id", "status"))
+        self.assertEqual(statuses, {stale.id: Job.FAILED, fresh.id: Job.RUNNING, queued.id: Job.QUEUED})
+
+    def test_worker_fails_stale_jobs_and_runs_the_queue(self):
+        stale, queued = self.queue(), self.queue()
+        Job.objects.filter(id=stale.id).update(
+            status=Job.RUNNING, started_at=timezone.now(),
+            updated_at=timezone.now() - STALE_AFTER - timedelta(minutes=1),
+        )
+
+        out = io.StringIO()
+        call_command("run_jobs", "--once", stdout=out)
+
+        self.assertIn("1 stale jobs marked as failed", out.getvalue())
+        statuses = dict(Job.objects.values_list("id", "status"))
+        self.assertEqual(statuses, {stale.id: Job.FAILED, queued.id: Job.DONE})
+
+    def test_late_finish_does_not_undo_a_stale_failure(self):
+        self.queue()
+        job = claim_next_job()
+        # the worker stalled long enough for another one to give up on the job
+        Job.objects.filter(id=job.id).update(updated_at=timezone.now() - STALE_AFTER * 2)
+        fail_stale_jobs()
+
+        with self.assertLogs("jobs.services", "WARNING"):
+            job = run_job(job)
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.FAILED)
@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('<int:job_id>/', views.job_status_view, name='job_status'),
+]
@@ -0,0 +1,16 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from .models import Job
+from .services import job_status
+
+
+@login_required
+def job_status_view(request, job_id):
+    job = get_object_or_404(Job, id=job_id)
+
+    if job.created_by_id != request.user.id and request.user.role != 'Admin':
+        return JsonResponse({"error": "Not allowed"}, status=403)
+
+    return JsonResponse(job_status(job))
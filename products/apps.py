@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def create_search_indexes(sender, using="default", **kwargs):
+    from .models import Product, ProductMaster
+    from .search import ensure_search_indexes
+
+    ensure_search_indexes([Product, ProductMaster], using=using)
+
+
+class ProductsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'products'
+
+    def ready(self):
+        post_migrate.connect(create_search_indexes, sender=self)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_remove_productmaster_sn_productmaster_quantity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='product_name',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+    ]
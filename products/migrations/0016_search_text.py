@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:00
+
+import products.search
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def backfill_search_text(apps, schema_editor):
+    for model_name in ('Product', 'ProductMaster'):
+        model = apps.get_model('products', model_name)
+        field = model._meta.get_field('search_text')
+        batch = []
+        for obj in model.objects.all().iterator(chunk_size=BATCH_SIZE):
+            obj.search_text = field.build(obj)
+            batch.append(obj)
+            if len(batch) >= BATCH_SIZE:
+                model.objects.bulk_update(batch, ['search_text'])
+                batch = []
+        model.objects.bulk_update(batch, ['search_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_product_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_text',
+            field=products.search.SearchTextField(blank=True, default='', editable=False, sources=('product_name', 'yayoi_code', 'jan_code')),
+        ),
+        migrations.AddField(
+            model_name='productmaster',
+            name='search_text',
+            field=products.search.SearchTextField(blank=True, default='', editable=False, sources=('product_name', 'yayoi_code')),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+    ]
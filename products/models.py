@@ -1,5 +1,7 @@
 from django.db import models
 
+from .search import SearchTextField
+
 class Product(models.Model):
     CLASS_CHOICES = (('国外','国外'),('国内','国内'))
     LEAD_CHOICES = (('45','45'),('60','60'),('45～60','45～60'))
@@ -9,13 +11,14 @@ class Product(models.Model):
     ordering = models.IntegerField(null=True, blank=True)
     yayoi_code = models.CharField(max_length=50, unique=True, null=False, blank=False)
     jan_code = models.CharField(max_length=50, unique=True, null=True, blank=True)
-    product_name = models.CharField(max_length=200, null=False, blank=False)
+    product_name = models.CharField(max_length=200, null=False, blank=False, db_index=True)
     handling = models.CharField(max_length=200, blank=True, null=True)
     specifications = models.CharField(max_length=200, blank=True ,null=True)
     monthly_sales_prediction = models.FloatField(default=0, null=True, blank=True)
     forecast = models.FloatField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
+    search_text = SearchTextField(sources=("product_name", "yayoi_code", "jan_code"))
 
     def __str__(self):
         return f"{self.yayoi_code} | {self.product_name}"
@@ -36,6 +39,7 @@ class ProductMaster(models.Model):
     yayoi_code = models.CharField(max_length=50, unique=True)
     product_name = models.CharField(max_length=255)
     quantity = models.IntegerField(default=0)
+    search_text = SearchTextField(sources=("product_name", "yayoi_code"))
 
     def __str__(self):
         return f"{self.yayoi_code} - {self.product_name}"
\ No newline at end of file
@@ -0,0 +1,194 @@
+import logging
+import re
+import unicodedata
+
+from django.db import connection, models
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+# katakana (ァ..ヶ) → hiragana (ぁ..ゖ)
+KANA_FOLD = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+WHITESPACE = re.compile(r"\s+")
+# joins the source fields; queries never contain it → no match across fields
+SEPARATOR = "\n"
+
+# FTS5 trigram needs 3 characters; shorter terms use a plain LIKE
+MIN_NGRAM = 3
+
+
+def normalize_search_text(value):
+    """
+    Fold the variants users type interchangeably into one form:
+    NFKC (full/half-width, ㈱ → (株)...), case, katakana → hiragana,
+    and drop whitespace ("みるく 300ml" == "ミルク３００ＭＬ").
+    """
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKC", str(value)).casefold().translate(KANA_FOLD)
+    return WHITESPACE.sub("", value)
+
+
+class SearchTextField(models.TextField):
+    """
+    Normalized copy of ``sources`` kept up to date on every save and
+    bulk_create (pre_save). bulk_update callers must call refresh_search_text().
+    """
+
+    def __init__(self, *args, sources=(), **kwargs):
+        self.sources = tuple(sources)
+        kwargs.setdefault("default", "")
+        kwargs.setdefault("editable", False)
+        kwargs.setdefault("blank", True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["sources"] = self.sources
+        return name, path, args, kwargs
+
+    def build(self, instance):
+        return SEPARATOR.join(
+            normalize_search_text(getattr(instance, source)) for source in self.sources
+        )
+
+    def pre_save(self, model_instance, add):
+        value = self.build(model_instance)
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def refresh_search_text(objs):
+    """Recompute search_text on instances about to go through bulk_update."""
+    for obj in objs:
+        obj._meta.get_field("search_text").pre_save(obj, False)
+    return objs
+
+
+# -------------------------
+# Query side
+# -------------------------
+def fts_table(model):
+    return f"{model._meta.db_table}_search"
+
+
+def search_q(query, model, prefix=""):
+    """
+    Q matching rows of ``model`` (reached through ``prefix``, e.g. "product__")
+    whose normalized text contains every word of ``query``.
+
+    PostgreSQL: LIKE on search_text, served by the pg_trgm GIN index.
+    SQLite: FTS5 trigram table for terms of 3+ characters, LIKE otherwise.
+    """
+    q = Q()
+    for word in str(query or "").split():
+        term = normalize_search_text(word)
+        if not term:
+            continue
+        if connection.vendor == "sqlite" and len(term) >= MIN_NGRAM:
+            phrase = '"' + term.replace('"', '""') + '"'
+            q &= Q(**{f"{prefix}id__in": RawSQL(
+                f'SELECT rowid FROM "{fts_table(model)}" WHERE "{fts_table(model)}" MATCH %s',
+                [phrase],
+            )})
+        else:
+            q &= Q(**{f"{prefix}search_text__contains": term})
+    return q
+
+
+def search_products(queryset, query, prefix=""):
+    """
+    The one search entry point for product lists. ``queryset`` may be of
+    Product / ProductMaster or of a model linked to Product via ``prefix``.
+    """
+    if not query or not str(query).strip():
+        return queryset
+    model = queryset.model
+    if prefix:
+        for part in prefix.strip("_").split("__"):
+            model = model._meta.get_field(part).related_model
+    return queryset.filter(search_q(query, model, prefix))
+
+
+# -------------------------
+# Index maintenance (post_migrate)
+# -------------------------
+SQLITE_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS "{fts}" USING fts5(
+    search_text, content='{table}', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS "{fts}_ai" AFTER INSERT ON "{table}" BEGIN
+    INSERT INTO "{fts}"(rowid, search_text) VALUES (new.id, new.search_text);
+END;
+CREATE TRIGGER IF NOT EXISTS "{fts}_ad" AFTER DELETE ON "{table}" BEGIN
+    INSERT INTO "{fts}"("{fts}", rowid, search_text) VALUES ('delete', old.id, old.search_text);
+END;
+CREATE TRIGGER IF NOT EXISTS "{fts}_au" AFTER UPDATE OF search_text ON "{table}" BEGIN
+    INSERT INTO "{fts}"("{fts}", rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    INSERT INTO "{fts}"(rowid, search_text) VALUES (new.id, new.search_text);
+END;
+"""
+SQLITE_FTS_REBUILD = """INSERT INTO "{fts}"("{fts}") VALUES ('rebuild');"""
+SQLITE_FTS_OBJECTS = ("{fts}", "{fts}_ai", "{fts}_ad", "{fts}_au")
+
+POSTGRES_TRGM = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS "{table}_search_trgm"
+    ON "{table}" USING gin (search_text gin_trgm_ops);
+"""
+
+
+def ensure_search_indexes(models_, using="default"):
+    """
+    Create the n-gram index for each model. Runs after every migrate:
+    SQLite rebuilds a table on ALTER and its triggers go with it, so they
+    are recreated (IF NOT EXISTS). The FTS table is rebuilt from the data
+    only when it or one of its triggers was missing (writes may have been
+    missed); otherwise the migrate leaves the index alone.
+    """
+    from django.db import connections
+
+    conn = connections[using]
+    for model in models_:
+        table = model._meta.db_table
+        if table not in conn.introspection.table_names():
+            continue
+        if conn.vendor == "sqlite":
+            fts = fts_table(model)
+            script = SQLITE_FTS.format(table=table, fts=fts)
+            if _sqlite_missing_objects(conn, fts):
+                script += SQLITE_FTS_REBUILD.format(fts=fts)
+        elif conn.vendor == "postgresql":
+            script = POSTGRES_TRGM.format(table=table)
+        else:
+            continue
+        try:
+            with conn.cursor() as cursor:
+                for statement in split_statements(script):
+                    cursor.execute(statement)
+        except Exception:
+            # search still works, with a sequential scan
+            logger.warning("Could not create the search index for %s", table, exc_info=True)
+
+
+def _sqlite_missing_objects(conn, fts):
+    names = [name.format(fts=fts) for name in SQLITE_FTS_OBJECTS]
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})",
+            names,
+        )
+        return cursor.fetchone()[0] < len(names)
+
+
+def split_statements(script):
+    """Split on ';' at line ends, keeping trigger bodies (BEGIN ... END;) whole."""
+    statements, current = [], []
+    for line in script.strip().splitlines():
+        current.append(line)
+        stripped = line.strip()
+        if stripped.endswith(";") and (stripped == "END;" or "BEGIN" not in "\n".join(current)):
+            statements.append("\n".join(current).rstrip(";"))
+            current = []
+    return statements
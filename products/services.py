@@ -0,0 +1,251 @@
+import time
+
+import pandas as pd
+from django.db import transaction
+from django.dispatch import Signal
+
+from .models import Product, ProductMaster
+from .search import refresh_search_text
+
+# sent after bulk writes to Product (bulk_create / bulk_update → no post_save)
+products_changed = Signal()
+
+PRODUCT_COLUMNS = ["classification", "lead_time", "ordering", "yayoi_code", "jan_code",
+                   "product_name", "handling", "specifications", "monthly_sales_prediction"]
+
+# Fields compared against the database; forecast follows monthly_sales_prediction
+DIFF_FIELDS = ["classification", "lead_time", "ordering", "jan_code", "product_name",
+               "handling", "specifications", "monthly_sales_prediction", "forecast"]
+
+
+def normalize_code(series):
+    """
+    Excel turns long numeric codes into floats ("4901234567890.0") or
+    scientific notation ("4.90123e+12"). Bring them back to digit strings,
+    keeping real text codes (with leading zeros, dashes...) untouched.
+    """
+    text = series.astype(str).str.strip()
+    numbers = pd.to_numeric(series, errors="coerce")
+
+    scientific = text.str.fullmatch(r"\d+(\.\d+)?[eE][+-]?\d+") & numbers.notna()
+    text = text.mask(scientific, numbers.round().astype("Int64").astype(str))
+    text = text.str.replace(r"^(\d+)\.0+$", r"\1", regex=True)
+
+    return text.where(series.notna() & (text != "") & (text.str.lower() != "nan"), None)
+
+
+def normalize_products(df):
+    df = df[PRODUCT_COLUMNS].copy()
+
+    df["yayoi_code"] = normalize_code(df["yayoi_code"])
+    df["jan_code"] = normalize_code(df["jan_code"])
+    df["lead_time"] = normalize_code(df["lead_time"])
+    df = df[df["yayoi_code"].notna() & df["product_name"].notna()].copy()
+
+    df["ordering"] = pd.to_numeric(df["ordering"], errors="coerce").round().astype("Int64")
+    df["monthly_sales_prediction"] = (
+        pd.to_numeric(df["monthly_sales_prediction"], errors="coerce").fillna(0).astype(float)
+    )
+    # Product.save() is skipped by bulk writes → compute forecast here
+    df["forecast"] = df["monthly_sales_prediction"] / 30 * 7
+
+    df = df.astype(object).where(df.notna(), None)
+    return df.drop_duplicates("yayoi_code", keep="last")
+
+
+def upsert_products(df, batch_size=500, progress=None):
+    """
+    Create/update products from an uploaded master sheet, keyed on yayoi_code.
+
+    Existing rows are read with one query and only rows whose values
+    changed are written. Returns a created/updated/unchanged breakdown
+    plus the yayoi codes skipped because their JAN belongs to another product.
+    """
+    df = normalize_products(df)
+    rows = df.to_dict("records")
+    if progress:
+        progress(0, total=len(rows))
+
+    existing = {
+        p.yayoi_code: p
+        for p in Product.objects.filter(yayoi_code__in=df["yayoi_code"].tolist())
+    }
+    jan_owner = dict(
+        Product.objects.filter(
+            jan_code__in=df["jan_code"].dropna().tolist()
+        ).values_list("jan_code", "yayoi_code")
+    )
+
+    to_create, to_update, skipped = [], [], []
+    unchanged = 0
+    seen_jans = set()
+
+    for row in rows:
+        jan = row["jan_code"]
+        if jan is not None:
+            owner = jan_owner.get(jan, row["yayoi_code"])
+            if owner != row["yayoi_code"] or jan in seen_jans:
+                skipped.append(row["yayoi_code"])
+                continue
+            seen_jans.add(jan)
+
+        product = existing.get(row["yayoi_code"])
+        if product is None:
+            to_create.append(Product(**row))
+            continue
+
+        changed = False
+        for field in DIFF_FIELDS:
+            if getattr(product, field) != row[field]:
+                setattr(product, field, row[field])
+                changed = True
+
+        if changed:
+            to_update.append(product)
+        else:
+            unchanged += 1
+
+    with transaction.atomic():
+        Product.objects.bulk_create(to_create, batch_size=batch_size)
+        Product.objects.bulk_update(
+            refresh_search_text(to_update), DIFF_FIELDS + ["search_text"], batch_size=batch_size
+        )
+    products_changed.send(sender=Product)
+    if progress:
+        progress(len(rows))
+
+    return {
+        "created": len(to_create),
+        "updated": len(to_update),
+        "unchanged": unchanged,
+        "skipped": skipped,
+    }
+
+
+def sync_product_master(df, batch_size=500, progress=None):
+    """
+    Load the Yayoi product export (商品コード / 商品名 / 入り数) into ProductMaster.
+
+    The current table is read into a dict once and compared with the
+    sheet, so only new or changed rows are written. Returns counts and
+    per-stage timings in seconds.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    df = df[["商品コード", "商品名", "入り数"]].copy()
+    df["商品コード"] = normalize_code(df["商品コード"])
+    df = df[df["商品コード"].notna()].copy()
+    df["商品名"] = df["商品名"].fillna("").astype(str).str.strip()
+    df["入り数"] = pd.to_numeric(df["入り数"], errors="coerce").fillna(0).astype(int)
+    df = df.drop_duplicates("商品コード", keep="last")
+    if progress:
+        progress(0, total=len(df))
+
+    existing = {m.yayoi_code: m for m in ProductMaster.objects.all()}
+
+    to_create, to_update = [], []
+    for code, name, quantity in zip(df["商品コード"], df["商品名"], df["入り数"].tolist()):
+        master = existing.get(code)
+        if master is None:
+            to_create.append(ProductMaster(yayoi_code=code, product_name=name, quantity=quantity))
+        elif master.product_name != name or master.quantity != quantity:
+            master.product_name = name
+            master.quantity = quantity
+            to_update.append(master)
+    timings["diff"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with transaction.atomic():
+        ProductMaster.objects.bulk_create(to_create, batch_size=batch_size)
+        ProductMaster.objects.bulk_update(
+            refresh_search_text(to_update), ["product_name", "quantity", "search_text"],
+            batch_size=batch_size,
+        )
+    timings["write"] = time.perf_counter() - started
+    if progress:
+        progress(len(df))
+
+    return {
+        "created": len(to_create),
+        "updated": len(to_update),
+        "unchanged": len(df) - len(to_create) - len(to_update),
+        "timings": timings,
+    }
+
+
+def reassign_yayoi_codes(df):
+    """
+    Apply a product_name → new yayoi_code sheet in one transaction.
+
+    Names are resolved with a single query. Collisions on the unique
+    yayoi_code (two rows claiming one code, or a code still held by a
+    product that is not being renamed) are reported up front and nothing
+    is written. Swaps and chains (A→B while B→C) are allowed: those rows
+    are first moved to temporary codes, then to their final ones.
+    """
+    df = df[["product_name", "yayoi_code"]].copy()
+    df["product_name"] = df["product_name"].astype(str).str.strip()
+    df["yayoi_code"] = normalize_code(df["yayoi_code"])
+    df = df[df["yayoi_code"].notna()].drop_duplicates("product_name", keep="last")
+
+    products = Product.objects.filter(
+        product_name__in=df["product_name"].tolist()
+    ).only("id", "product_name", "yayoi_code", "jan_code")
+
+    by_name = {}
+    for p in products:
+        by_name.setdefault(p.product_name, []).append(p)
+
+    not_found, ambiguous, changes = [], [], {}
+    for name, code in zip(df["product_name"], df["yayoi_code"]):
+        matches = by_name.get(name)
+        if not matches:
+            not_found.append(name)
+        elif len(matches) > 1:
+            ambiguous.append(name)
+        elif matches[0].yayoi_code != code:
+            changes[matches[0].id] = (matches[0], code)
+
+    # --- collisions: a new code used twice, or held by a product that keeps it ---
+    conflicts = []
+    claimed = {}
+    for product, code in changes.values():
+        if code in claimed:
+            conflicts.append(code)
+        claimed[code] = product.id
+
+    holders = dict(
+        Product.objects.filter(yayoi_code__in=list(claimed)).values_list("yayoi_code", "id")
+    )
+    moving = set(changes)
+    for code, holder_id in holders.items():
+        if holder_id not in moving:
+            conflicts.append(code)
+
+    result = {
+        "updated": 0,
+        "not_found": not_found,
+        "ambiguous": ambiguous,
+        "conflicts": sorted(set(conflicts)),
+    }
+    if result["conflicts"] or not changes:
+        return result
+
+    to_update = []
+    for product, code in changes.values():
+        product.yayoi_code = code
+        to_update.append(product)
+
+    with transaction.atomic():
+        if holders:
+            # Swap/chain → park the rows on unique temporary codes first
+            parked = [Product(id=p.id, yayoi_code=f"__tmp__{p.id}") for p in to_update]
+            Product.objects.bulk_update(parked, ["yayoi_code"], batch_size=500)
+        Product.objects.bulk_update(
+            refresh_search_text(to_update), ["yayoi_code", "search_text"], batch_size=500
+        )
+        products_changed.send(sender=Product)
+
+    result["updated"] = len(to_update)
+    return result
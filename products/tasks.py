@@ -0,0 +1,32 @@
+import pandas as pd
+
+from jobs.services import JobError, job_handler
+from .services import PRODUCT_COLUMNS, upsert_products
+
+
+@job_handler("products.upload")
+def upload_products_job(job, file, progress):
+    try:
+        df = pd.read_excel(file)
+    except Exception as e:
+        raise JobError(f"Error reading file: {e}")
+
+    for col in PRODUCT_COLUMNS:
+        if col not in df.columns:
+            raise JobError(f"Missing column: {col}")
+
+    result = upsert_products(df, progress=progress)
+
+    warnings = []
+    if result["skipped"]:
+        warnings.append(
+            f"JAN code already used by another product, skipped: {', '.join(result['skipped'])}"
+        )
+    return {
+        "message": (
+            f"Upload complete! Created: {result['created']}, Updated: {result['updated']}, "
+            f"Unchanged: {result['unchanged']}"
+        ),
+        "warnings": warnings,
+        **result,
+    }
@@ -0,0 +1,188 @@
+import pandas as pd
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import Product
+from .search import ensure_search_indexes, fts_table, normalize_search_text, search_products
+from .services import PRODUCT_COLUMNS, normalize_code, reassign_yayoi_codes, upsert_products
+
+
+def product_sheet(rows):
+    """Upload DataFrame with the PRODUCT_COLUMNS, defaults for what a row leaves out."""
+    defaults = {
+        "classification": "国内", "lead_time": "45", "ordering": 12, "jan_code": None,
+        "handling": "常温", "specifications": "", "monthly_sales_prediction": 30,
+    }
+    return pd.DataFrame([{**defaults, **row} for row in rows], columns=PRODUCT_COLUMNS)
+
+
+class NormalizeCodeTests(SimpleTestCase):
+
+    def normalize(self, values):
+        return normalize_code(pd.Series(values, dtype=object)).tolist()
+
+    def test_excel_floats_back_to_digits(self):
+        self.assertEqual(self.normalize(["4901234567890.0", 4901234567890.0, 45.0]),
+                         ["4901234567890", "4901234567890", "45"])
+
+    def test_scientific_notation(self):
+        self.assertEqual(self.normalize(["4.90123e+12", "4.9E+12"]),
+                         ["4901230000000", "4900000000000"])
+
+    def test_text_codes_untouched(self):
+        self.assertEqual(self.normalize(["02-52-0001", " 0123 ", "45～60"]),
+                         ["02-52-0001", "0123", "45～60"])
+
+    def test_blanks_become_none(self):
+        self.assertEqual(self.normalize([None, "", "  ", "nan", float("nan")]),
+                         [None, None, None, None, None])
+
+
+class UpsertProductsTests(TestCase):
+
+    def setUp(self):
+        upsert_products(product_sheet([
+            {"yayoi_code": "02-52-0001", "product_name": "みるく", "jan_code": "4900000000001"},
+            {"yayoi_code": "02-52-0002", "product_name": "ふーど", "jan_code": "4900000000002"},
+        ]))
+
+    def test_created_updated_unchanged_skipped(self):
+        result = upsert_products(product_sheet([
+            # same values → unchanged
+            {"yayoi_code": "02-52-0001", "product_name": "みるく", "jan_code": "4900000000001"},
+            # new name → updated
+            {"yayoi_code": "02-52-0002", "product_name": "ドライフード", "jan_code": "4900000000002"},
+            # new code → created
+            {"yayoi_code": "02-52-0003", "product_name": "おやつ", "jan_code": "4900000000003"},
+            # JAN of 02-52-0001 → skipped
+            {"yayoi_code": "02-52-0004", "product_name": "しゃんぷー", "jan_code": "4900000000001"},
+        ]))
+
+        self.assertEqual(
+            {k: result[k] for k in ("created", "updated", "unchanged")},
+            {"created": 1, "updated": 1, "unchanged": 1},
+        )
+        self.assertEqual(result["skipped"], ["02-52-0004"])
+        self.assertEqual(Product.objects.get(yayoi_code="02-52-0002").product_name, "ドライフード")
+        self.assertFalse(Product.objects.filter(yayoi_code="02-52-0004").exists())
+
+    def test_forecast_and_search_text_follow_bulk_writes(self):
+        upsert_products(product_sheet([
+            {"yayoi_code": "02-52-0001", "product_name": "ミルク 300ML",
+             "jan_code": "4900000000001", "monthly_sales_prediction": 60},
+        ]))
+        product = Product.objects.get(yayoi_code="02-52-0001")
+        self.assertAlmostEqual(product.forecast, 60 / 30 * 7)
+        self.assertIn(normalize_search_text("ミルク 300ML"), product.search_text)
+
+    def test_float_codes_match_existing_rows(self):
+        result = upsert_products(product_sheet([
+            {"yayoi_code": "02-52-0001", "product_name": "みるく", "jan_code": 4900000000001.0},
+        ]))
+        self.assertEqual((result["created"], result["unchanged"]), (0, 1))
+
+
+class ReassignYayoiCodesTests(TestCase):
+
+    def setUp(self):
+        for n, name in enumerate(["A", "B", "C", "D"], start=1):
+            Product.objects.create(yayoi_code=f"02-52-000{n}", product_name=name)
+
+    def reassign(self, pairs):
+        return reassign_yayoi_codes(pd.DataFrame(pairs, columns=["product_name", "yayoi_code"]))
+
+    def codes(self):
+        return dict(Product.objects.values_list("product_name", "yayoi_code"))
+
+    def test_swap(self):
+        result = self.reassign([("A", "02-52-0002"), ("B", "02-52-0001")])
+        self.assertEqual(result["updated"], 2)
+        self.assertEqual(self.codes(), {
+            "A": "02-52-0002", "B": "02-52-0001", "C": "02-52-0003", "D": "02-52-0004",
+        })
+        self.assertEqual(search_products(Product.objects.all(), "52-0001").get().product_name, "B")
+
+    def test_three_cycle(self):
+        result = self.reassign([("A", "02-52-0002"), ("B", "02-52-0003"), ("C", "02-52-0001")])
+        self.assertEqual(result["updated"], 3)
+        self.assertEqual(self.codes(), {
+            "A": "02-52-0002", "B": "02-52-0003", "C": "02-52-0001", "D": "02-52-0004",
+        })
+
+    def test_collision_with_untouched_product_writes_nothing(self):
+        before = self.codes()
+        result = self.reassign([("A", "02-52-0002"), ("B", "02-52-0004"), ("C", "02-52-0009")])
+        self.assertEqual(result["conflicts"], ["02-52-0004"])
+        self.assertEqual(result["updated"], 0)
+        self.assertEqual(self.codes(), before)
+
+    def test_two_rows_claiming_one_code(self):
+        result = self.reassign([("A", "02-52-0009"), ("B", "02-52-0009")])
+        self.assertEqual(result["conflicts"], ["02-52-0009"])
+        self.assertFalse(Product.objects.filter(yayoi_code="02-52-0009").exists())
+
+    def test_no_temporary_codes_left(self):
+        self.reassign([("A", "02-52-0002"), ("B", "02-52-0003"), ("C", "02-52-0001"),
+                       ("D", "02-52-0005"), ("missing", "02-52-0006")])
+        self.assertFalse(Product.objects.filter(yayoi_code__startswith="__tmp__").exists())
+        self.assertFalse(Product.objects.filter(search_text__contains="tmp").exists())
+
+
+class SearchProductsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for code, name, jan in [
+            ("02-52-0001", "わんちゃんにもやさしいみるく 300ml", "4900000000001"),
+            ("02-52-0002", "ねこちゃんドライフード 1kg", "4900000000002"),
+            ("02-52-0003", "ミルクボーン ＳＳ", "4900000000003"),
+        ]:
+            Product.objects.create(yayoi_code=code, product_name=name, jan_code=jan,
+                                   classification="国内", lead_time="45")
+
+    def codes(self, query):
+        return sorted(search_products(Product.objects.all(), query)
+                      .values_list("yayoi_code", flat=True))
+
+    def test_kana_and_width_variants_match(self):
+        # katakana / full-width / spacing typed either way (trigram index)
+        self.assertEqual(self.codes("ミルク"), ["02-52-0001", "02-52-0003"])
+        self.assertEqual(self.codes("みるく３００ＭＬ"), ["02-52-0001"])
+        self.assertEqual(self.codes("ssぼーん"), [])
+        self.assertEqual(self.codes("ぼーんss"), ["02-52-0003"])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.codes("ちゃん 1kg"), ["02-52-0002"])
+
+    def test_short_terms_fall_back_to_like(self):
+        self.assertEqual(self.codes("ss"), ["02-52-0003"])
+        self.assertEqual(self.codes("ml"), ["02-52-0001"])
+
+    def test_codes_are_searchable(self):
+        self.assertEqual(self.codes("52-0002"), ["02-52-0002"])
+        self.assertEqual(self.codes("4900000000003"), ["02-52-0003"])
+
+    def test_blank_query_returns_everything(self):
+        self.assertEqual(len(self.codes("  ")), 3)
+
+    def test_index_is_rebuilt_when_a_trigger_was_lost(self):
+        # what a table rebuild (ALTER) on SQLite does: triggers dropped, writes missed
+        if connection.vendor != "sqlite":
+            self.skipTest("FTS5 index is SQLite only")
+        product = Product.objects.get(yayoi_code="02-52-0002")
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER "{fts_table(Product)}_au"')
+        product.product_name = "うさぎさんのおやつ"
+        product.save()
+        self.assertEqual(self.codes("うさぎ"), [])
+
+        ensure_search_indexes([Product])
+        self.assertEqual(self.codes("うさぎ"), ["02-52-0002"])
+
+    def test_existing_index_is_not_rebuilt(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("FTS5 index is SQLite only")
+        with CaptureQueriesContext(connection) as queries:
+            ensure_search_indexes([Product])
+        self.assertFalse(any("'rebuild'" in q["sql"] for q in queries.captured_queries))
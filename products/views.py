@@ -1,21 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from .models import Product
 from .forms import ProductForm
+from .services import reassign_yayoi_codes
+from .search import search_products
+from jobs.services import enqueue
 from accounts.decorators import role_required
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 from django.core.paginator import Paginator
 from django.db.models import Q
-from datetime import date
 
 import pandas as pd
 from django.contrib import messages
 
-from dashboard.views import iso_week_to_japanese_label
-today = date.today()
-current_year = today.isocalendar().year
-current_week = today.isocalendar().week
-week_label = iso_week_to_japanese_label(current_year, current_week)
 
 @login_required
 @role_required(['add'])
@@ -57,10 +55,7 @@ def product_list(request):
         products = Product.objects.all()
 
     if search:
-        products = products.filter(Q(jan_code__icontains=search) | 
-                                   Q(yayoi_code__icontains=search) |
-                                   Q(product_name__icontains=search)
-        )
+        products = search_products(products, search)
 
          # --- Pagination ---
     paginator = Paginator(products, 50)  # 20 items per page
@@ -74,9 +69,6 @@ def product_list(request):
         'search': search,
         'status_filter': status_filter,
         'start_index': start_index,
-        'current_year':current_year,
-        'current_week':current_week,
-        'week_label':week_label,
         })
 
 @login_required
@@ -98,66 +90,14 @@ def upload_products(request):
             messages.error(request, "Please upload an Excel file.")
             return redirect("upload_products")
 
-        try:
-            df = pd.read_excel(file)
-
-            required_columns = ["classification", "lead_time", "ordering", "yayoi_code", "jan_code", 
-                                "product_name", "handling", "specifications", "monthly_sales_prediction"]
-            for col in required_columns:
-                if col not in df.columns:
-                    messages.error(request, f"Missing column: {col}")
-                    return redirect("upload_products")
-
-            created_count = 0
-            updated_count = 0
-
-            for _, row in df.iterrows():
-                yayoi = str(row["yayoi_code"]).strip()
-
-                def clean_value(value):
-                    if pd.isna(value):
-                        return None
-                    return value
-
-                jan_raw = row.get("jan_code")
-
-                # convert to string safely
-                if pd.isna(jan_raw):
-                    jan = None
-                else:
-                    jan = str(jan_raw).replace(".0", "").strip()
-                    # Fix scientific notation
-                    if "e" in jan.lower():
-                        jan = "{:.0f}".format(float(jan_raw))
+        # processed by the run_jobs worker, the page polls the job status
+        job = enqueue("products.upload", file, request.user)
+        messages.info(request, "Upload queued, processing in the background.")
+        return redirect(f"{reverse('upload_products')}?job={job.id}")
 
-                product, created = Product.objects.update_or_create(
-                    yayoi_code = yayoi,
-                    jan_code=jan,
-                    defaults={
-                        "classification": clean_value(row.get("classification")),
-                        "lead_time": clean_value(row.get("lead_time")),
-                        "ordering": clean_value(row.get("ordering")),
-                        "product_name": row.get("product_name"),
-                        "handling": clean_value(row.get("handling")),
-                        "specifications": clean_value(row.get("specifications")),
-                        "monthly_sales_prediction": clean_value(row.get("monthly_sales_prediction")) or 0,
-                    }
-                )
-
-
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
-
-            messages.success(request, f"Upload complete! Created: {created_count}, Updated: {updated_count}")
-
-        except Exception as e:
-            messages.error(request, f"Error reading file: {e}")
-
-        return redirect("upload_products")
-
-    return render(request, "products/upload_products.html")
+    return render(request, "products/upload_products.html", {
+        "job_id": request.GET.get("job"),
+    })
 
 
 @login_required
@@ -186,25 +126,21 @@ def upload_yayoi_codes(request):
             messages.error(request, "Missing required columns: product_name, yayoi_code")
             return redirect("upload_yayoi_codes")
 
-        updated = 0
-        not_found = []
-
-        for _, row in df.iterrows():
-            pname = str(row["product_name"]).strip()
-            new_yayoi = str(row["yayoi_code"]).strip()
+        result = reassign_yayoi_codes(df)
 
-            try:
-                product = Product.objects.get(product_name=pname)
-                product.yayoi_code = new_yayoi
-                product.save()
-                updated += 1
-            except Product.DoesNotExist:
-                not_found.append(pname)
+        if result["conflicts"]:
+            messages.error(
+                request,
+                f"No codes were changed. Yayoi codes already in use: {', '.join(result['conflicts'])}"
+            )
+        else:
+            messages.success(request, f"Updated Yayoi codes for {result['updated']} products.")
 
-        messages.success(request, f"Updated Yayoi codes for {updated} products.")
+        if result["not_found"]:
+            messages.warning(request, f"Products not found: {', '.join(result['not_found'])}")
 
-        if not_found:
-            messages.warning(request, f"Products not found: {', '.join(not_found)}")
+        if result["ambiguous"]:
+            messages.warning(request, f"Several products share these names, skipped: {', '.join(result['ambiguous'])}")
 
         return redirect("upload_yayoi_codes")
 
@@ -6,22 +6,28 @@ from django.contrib.auth.decorators import login_required
 from accounts.decorators import role_required
 from weekly.models import WeeklyRecord
 from django.utils import timezone
+from dashboard.versioning import bump_data_version, conditional_on_data_version
 
 @login_required
 @role_required(['add'])
 def product_default_settings(request):
-    # Ensure every product has defaults
-    for p in Product.objects.all():
-        ProductDefaults.objects.get_or_create(product=p)
+    # Ensure every product has defaults (one insert for the missing ones)
+    missing = Product.objects.filter(productdefaults__isnull=True).values_list("id", flat=True)
+    if missing:
+        ProductDefaults.objects.bulk_create([ProductDefaults(product_id=pid) for pid in missing])
 
     defaults = ProductDefaults.objects.select_related("product").all()
 
     if request.method == "POST":
+        defaults = list(defaults)
         for d in defaults:
             outgoing = request.POST.get(f"default_outgoing_{d.product.id}", 0)
 
             d.default_outgoing = int(outgoing or 0)
-            d.save()
+
+        # bulk_update skips post_save → bump the dashboard version here
+        ProductDefaults.objects.bulk_update(defaults, ["default_outgoing"], batch_size=500)
+        bump_data_version()
 
         messages.success(request, "Default values updated successfully!")
         return redirect("product_default_settings")
@@ -32,14 +38,12 @@ def product_default_settings(request):
 
 @login_required
 @role_required(['add'])
+@conditional_on_data_version
 def get_product_defaults(request):
-    products = Product.objects.all()
-    data = {}
-
-    for p in products:
-        d = getattr(p, "productdefaults", None)
-        data[p.id] = {
-            "outgoing": d.default_outgoing if d else 0,
-        }
+    # one LEFT JOIN instead of a productdefaults lookup per product
+    data = {
+        pid: {"outgoing": outgoing or 0}
+        for pid, outgoing in Product.objects.values_list("id", "productdefaults__default_outgoing")
+    }
 
     return JsonResponse(data)
@@ -0,0 +1,26 @@
+// Poll a background job until it is done or failed.
+// onUpdate(status) is called on every poll; resolves with the final status.
+function pollJob(statusUrl, onUpdate, interval = 1000) {
+    return new Promise((resolve, reject) => {
+        function tick() {
+            fetch(statusUrl, { headers: { "Accept": "application/json" } })
+                .then(res => res.json())
+                .then(job => {
+                    if (onUpdate) onUpdate(job);
+                    if (job.status === "done" || job.status === "failed") {
+                        resolve(job);
+                    } else {
+                        setTimeout(tick, interval);
+                    }
+                })
+                .catch(reject);
+        }
+        tick();
+    });
+}
+
+function jobProgressText(job) {
+    if (job.status === "queued") return "Waiting for the worker...";
+    const total = job.rows_total != null ? ` / ${job.rows_total}` : "";
+    return `${job.rows_processed}${total} rows · ${job.throughput} rows/s · ${job.elapsed}s`;
+}
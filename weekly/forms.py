@@ -3,13 +3,19 @@ from .models import WeeklyRecord, WeeklyInventory
 from products.models import Product
 from datetime import date
 from django_select2.forms import ModelSelect2Widget
+from products.search import search_products
 
 class ProductWidget(ModelSelect2Widget):
     model = Product
     search_fields = [
-        "jan_code__icontains",
-        "product_name__icontains",
+        "search_text__contains",
     ]
+
+    def filter_queryset(self, request, term, queryset=None, **dependent_fields):
+        # same normalized / indexed search as the list pages
+        if queryset is None:
+            queryset = self.get_queryset()
+        return search_products(queryset.filter(**dependent_fields), term)
     
     def label_from_instance(self, obj):
         return f"{obj.jan_code} - {obj.product_name}"
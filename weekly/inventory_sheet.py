@@ -0,0 +1,189 @@
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from django.db.models import F
+
+from .models import PackRule, PackRuleVersion
+
+RULES_VERSION_PK = 1
+
+
+class PatternMatcher:
+    """
+    Aho-Corasick automaton over the name patterns. A name is scanned once,
+    character by character, whatever the number of patterns; each state
+    knows the lowest pattern index ending there (itself or via its suffix
+    links), so priority is resolved during the same pass.
+    """
+
+    def __init__(self, patterns):
+        self.no_match = len(patterns)
+        goto, fail, best = [{}], [0], [self.no_match]
+
+        for n, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto.append({})
+                    fail.append(0)
+                    best.append(self.no_match)
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            best[state] = min(best[state], n)
+
+        # breadth-first: suffix links, and best inherited along them
+        queue = deque(goto[0].values())  # depth 1: suffix link to the root
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                link = fail[state]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                fail[child] = goto[link].get(char, 0)
+                best[child] = min(best[child], best[fail[child]])
+                queue.append(child)
+
+        self.goto, self.fail, self.best = goto, fail, best
+
+    def first(self, text):
+        """Lowest index of the patterns contained in ``text`` (``no_match`` when none)."""
+        goto, fail, best = self.goto, self.fail, self.best
+        state, found = 0, self.no_match
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if best[state] < found:
+                found = best[state]
+                if found == 0:
+                    break
+        return found
+
+
+class CompiledPackRules:
+    """
+    Pack rules turned into lookup tables and one multi-pattern matcher.
+
+    ``links``       code → linked code (DATA3 cross-reference, G column)
+    ``categories``  code → E column value
+    ``name_groups`` [(pattern, group, multiplier)] in priority order, first match wins
+    """
+
+    def __init__(self, links, categories, name_groups):
+        self.links = dict(links)
+        self.categories = dict(categories)
+        self.groups = np.array([g for _, g, _ in name_groups] + [None], dtype=object)
+        self.multipliers = np.array([m for _, _, m in name_groups] + [1])
+        self.no_match = len(name_groups)
+        self.matcher = PatternMatcher([p for p, _, _ in name_groups]) if name_groups else None
+
+    def match_names(self, names):
+        """Index of the winning name rule per row (``no_match`` when none)."""
+        if self.matcher is None:
+            return np.full(len(names), self.no_match)
+
+        # sheets repeat names → scan each distinct name once
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+        matched = np.array([self.matcher.first(name) for name in uniques], dtype=int)
+        return matched[codes] if len(codes) else np.empty(0, dtype=int)
+
+
+# -------------------------
+# Per-process cache, refreshed when PackRule rows change
+# -------------------------
+_cache_lock = threading.Lock()
+_compiled = {"version": None, "rules": None}
+
+
+def rules_version():
+    """Watermark of the PackRule table, one primary-key lookup."""
+    return (
+        PackRuleVersion.objects.filter(pk=RULES_VERSION_PK)
+        .values_list("version", flat=True).first()
+    ) or 0
+
+
+def load_pack_rules():
+    links, categories, name_groups = {}, {}, []
+    for rule in PackRule.objects.filter(is_active=True).order_by("priority", "id"):
+        if rule.kind == "link":
+            links[rule.code] = rule.linked_code
+        elif rule.kind == "category":
+            categories[rule.code] = rule.multiplier
+        elif rule.kind == "name" and rule.pattern:
+            name_groups.append((rule.pattern, rule.group, rule.multiplier))
+    return CompiledPackRules(links, categories, name_groups)
+
+
+def get_pack_rules():
+    """
+    Compiled rules for this process. Checks the rules watermark (one
+    query); they are only reloaded and recompiled when it changed.
+    """
+    version = rules_version()
+    with _cache_lock:
+        if _compiled["rules"] is None or _compiled["version"] != version:
+            _compiled["rules"] = load_pack_rules()
+            _compiled["version"] = version
+        return _compiled["rules"]
+
+
+def invalidate_pack_rules():
+    """
+    Bump the watermark in the writing transaction: every process sees the
+    new version together with the new rows, never one without the other.
+    This process recompiles on its next call in any case.
+    """
+    with _cache_lock:
+        _compiled["version"] = None
+        _compiled["rules"] = None
+    updated = PackRuleVersion.objects.filter(pk=RULES_VERSION_PK).update(
+        version=F("version") + 1
+    )
+    if not updated:
+        PackRuleVersion.objects.get_or_create(pk=RULES_VERSION_PK, defaults={"version": 1})
+
+
+def compute_final_quantities(df, rules=None):
+    """
+    Vectorized version of the stock sheet's Excel formulas.
+
+    Takes the sheet with 商品コード / 商品名 / 総数 columns and returns a
+    Series of final D values indexed by product code (first row wins
+    for duplicated codes):
+
+      I = sum of C x multiplier over all rows of the same name group
+      D = IF(I > 0, I, C + G), G = F of the linked code, F = IF(I > 0, I, C) * E
+    """
+    if rules is None:
+        rules = get_pack_rules()
+
+    codes = df["商品コード"].astype(str)
+    names = df["商品名"].astype(str)
+    c_values = df["総数"].fillna(0).astype(int)
+
+    # --- H column: name group & multiplier, one automaton pass per name ---
+    matched = rules.match_names(names.tolist())
+    group = pd.Series(rules.groups[matched], index=df.index, dtype=object)
+    multiplier = pd.Series(rules.multipliers[matched], index=df.index)
+
+    # --- I column: grouped sums ---
+    group_totals = (c_values * multiplier).groupby(group).sum()
+    i_values = group.map(group_totals).fillna(0).astype(int)
+
+    # --- E / F columns ---
+    e_values = codes.map(rules.categories).fillna(0).astype(int)
+    f_values = np.where(i_values > 0, i_values, c_values) * e_values.to_numpy()
+
+    # --- G column: linked-code cross-reference (last row wins, like a dict) ---
+    f_lookup = pd.Series(f_values, index=codes.values)
+    f_lookup = f_lookup[~f_lookup.index.duplicated(keep="last")]
+    g_values = codes.map(rules.links).map(f_lookup).fillna(0).astype(int)
+
+    # --- FINAL D ---
+    final_d = pd.Series(
+        np.where(i_values > 0, i_values, c_values + g_values), index=codes.values
+    )
+    return final_d[~final_d.index.duplicated(keep="first")]
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from weekly.snapshots import refresh_snapshots
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-product stock snapshot used by the dashboard."
+
+    def handle(self, *args, **options):
+        count = refresh_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"{count} stock snapshots rebuilt"))
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:45
+
+import django.db.models.deletion
+from datetime import date
+
+from django.db import migrations, models
+
+
+def populate_snapshots(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    WeeklyRecord = apps.get_model('weekly', 'WeeklyRecord')
+    FutureIncomingPlan = apps.get_model('weekly', 'FutureIncomingPlan')
+    StockSnapshot = apps.get_model('weekly', 'StockSnapshot')
+
+    current_year, current_week, _ = date.today().isocalendar()
+
+    latest = {}
+    for r in WeeklyRecord.objects.order_by('product_id', '-year', '-week_no').iterator(chunk_size=2000):
+        latest.setdefault(r.product_id, r)
+
+    upcoming = {}
+    plans = FutureIncomingPlan.objects.filter(planned_incoming__gt=0).order_by('product_id', 'year', 'week_no')
+    for plan in plans:
+        if (plan.year, plan.week_no) >= (current_year, current_week):
+            upcoming.setdefault(plan.product_id, plan)
+
+    snapshots = []
+    for pid in Product.objects.values_list('id', flat=True):
+        r = latest.get(pid)
+        plan = upcoming.get(pid)
+        snapshots.append(StockSnapshot(
+            product_id=pid,
+            year=r.year if r else None,
+            week_no=r.week_no if r else None,
+            incoming_goods=r.incoming_goods if r else None,
+            outgoing_goods=r.outgoing_goods if r else None,
+            inventory=r.inventory if r else None,
+            remaining_weeks=r.remaining_weeks if r else None,
+            next_incoming=plan.planned_incoming if plan else 0,
+            next_incoming_year=plan.year if plan else None,
+            next_incoming_week=plan.week_no if plan else None,
+        ))
+    StockSnapshot.objects.bulk_create(snapshots, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_remove_productmaster_sn_productmaster_quantity'),
+        ('weekly', '0010_remove_weeklyinventory_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(blank=True, null=True)),
+                ('week_no', models.IntegerField(blank=True, null=True)),
+                ('incoming_goods', models.IntegerField(blank=True, null=True)),
+                ('outgoing_goods', models.IntegerField(blank=True, null=True)),
+                ('inventory', models.IntegerField(blank=True, null=True)),
+                ('remaining_weeks', models.FloatField(blank=True, null=True)),
+                ('next_incoming', models.IntegerField(default=0)),
+                ('next_incoming_year', models.IntegerField(blank=True, null=True)),
+                ('next_incoming_week', models.IntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshot', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'week_no', 'remaining_weeks'], name='weekly_stoc_year_4ff4dc_idx'), models.Index(fields=['inventory'], name='weekly_stoc_invento_8de666_idx'), models.Index(fields=['next_incoming_year', 'next_incoming_week'], name='weekly_stoc_next_in_d15cf6_idx')],
+            },
+        ),
+        migrations.RunPython(populate_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:47
+
+import weekly.models
+from django.db import migrations, models
+from django.db.models import F, Max, Min
+
+BATCH_SIZE = 5000
+
+
+def backfill_week_keys(apps, schema_editor):
+    for model_name in ('WeeklyRecord', 'FutureIncomingPlan', 'WeeklyInventory', 'StockSnapshot'):
+        model = apps.get_model('weekly', model_name)
+        bounds = model.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            continue
+        for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+            model.objects.filter(
+                id__gte=start, id__lt=start + BATCH_SIZE, year__isnull=False
+            ).update(week_key=F('year') * 100 + F('week_no'))
+
+    StockSnapshot = apps.get_model('weekly', 'StockSnapshot')
+    StockSnapshot.objects.filter(next_incoming_year__isnull=False).update(
+        next_incoming_key=F('next_incoming_year') * 100 + F('next_incoming_week')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_remove_productmaster_sn_productmaster_quantity'),
+        ('weekly', '0011_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='weeklyrecord',
+            options={'ordering': ['-week_key', 'product__jan_code']},
+        ),
+        migrations.AddField(
+            model_name='futureincomingplan',
+            name='week_key',
+            field=weekly.models.WeekKeyField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='next_incoming_key',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='week_key',
+            field=weekly.models.WeekKeyField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='weeklyinventory',
+            name='week_key',
+            field=weekly.models.WeekKeyField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='weeklyrecord',
+            name='week_key',
+            field=weekly.models.WeekKeyField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_week_keys, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='stocksnapshot',
+            name='weekly_stoc_year_4ff4dc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='stocksnapshot',
+            name='weekly_stoc_next_in_d15cf6_idx',
+        ),
+        migrations.RemoveField(
+            model_name='stocksnapshot',
+            name='next_incoming_week',
+        ),
+        migrations.RemoveField(
+            model_name='stocksnapshot',
+            name='next_incoming_year',
+        ),
+        migrations.AddIndex(
+            model_name='futureincomingplan',
+            index=models.Index(fields=['product', 'week_key'], name='weekly_futu_product_16e089_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='futureincomingplan',
+            index=models.Index(fields=['week_key'], name='weekly_futu_week_ke_bfa1fa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['week_key', 'remaining_weeks'], name='weekly_stoc_week_ke_9ed886_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['next_incoming_key'], name='weekly_stoc_next_in_e25353_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weeklyinventory',
+            index=models.Index(fields=['product', 'week_key'], name='weekly_week_product_1ac42f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weeklyinventory',
+            index=models.Index(fields=['week_key'], name='weekly_week_week_ke_66c974_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weeklyrecord',
+            index=models.Index(fields=['product', 'week_key'], name='weekly_week_product_767608_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weeklyrecord',
+            index=models.Index(fields=['week_key', 'remaining_weeks'], name='weekly_week_week_ke_d6ac58_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+# Rules previously hard-coded in weekly.views (DATA3_MAP / CATEGORY_MAP / name checks)
+DATA3_MAP = {
+    "02-99-0059": "02-52-0001",
+    "02-99-0060": "02-52-0002",
+    "02-99-0061": "02-52-0003",
+    "02-99-0062": "02-52-0004",
+    "02-99-0063": "02-52-0005",
+    "02-99-0064": "02-52-0006",
+    "02-99-0065": "02-52-0007",
+    "02-99-0066": "02-52-0008",
+    "02-99-0067": "02-52-0009",
+    "02-99-0068": "02-52-0010",
+    "02-99-0069": "02-52-0011",
+    "02-99-0070": "02-52-0012",
+}
+
+CATEGORY_MAP = {
+    "02-52-0001": 25, "02-52-0002": 15, "02-52-0003": 8,
+    "02-52-0004": 5,  "02-52-0005": 3,  "02-52-0006": 25,
+    "02-52-0007": 25, "02-52-0008": 15, "02-52-0009": 8,
+    "02-52-0010": 5,  "02-52-0011": 3,  "02-52-0012": 25
+}
+
+NAME_GROUPS = [
+    ("ねこちゃんにもやさしいみるく2", "C", 1),
+    ("わんちゃんにもやさしいみるく300ml 3", "D", 1),
+    ("わんちゃんにもやさしいみるく3個", "D", 3),
+]
+
+
+def seed_rules(apps, schema_editor):
+    PackRule = apps.get_model('weekly', 'PackRule')
+    rules = [PackRule(kind='link', code=code, linked_code=linked) for code, linked in DATA3_MAP.items()]
+    rules += [PackRule(kind='category', code=code, multiplier=value) for code, value in CATEGORY_MAP.items()]
+    rules += [
+        PackRule(kind='name', pattern=pattern, group=group, multiplier=times, priority=priority)
+        for priority, (pattern, group, times) in enumerate(NAME_GROUPS)
+    ]
+    PackRule.objects.bulk_create(rules)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weekly', '0012_week_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('link', 'Code link (DATA3)'), ('category', 'Category multiplier (E column)'), ('name', 'Name pattern (H column)')], max_length=10)),
+                ('code', models.CharField(blank=True, max_length=50)),
+                ('linked_code', models.CharField(blank=True, max_length=50)),
+                ('pattern', models.CharField(blank=True, max_length=200)),
+                ('group', models.CharField(blank=True, max_length=10)),
+                ('multiplier', models.IntegerField(default=1)),
+                ('priority', models.IntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['kind', 'priority', 'id'],
+            },
+        ),
+        migrations.RunPython(seed_rules, migrations.RunPython.noop),
+    ]
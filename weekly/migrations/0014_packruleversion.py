@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weekly', '0013_packrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackRuleVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
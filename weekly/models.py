@@ -1,11 +1,22 @@
 from django.db import models
 from products.models import Product, ProductDefaults, ProductMaster
 from django.conf import settings
-from datetime import date
+from inventory.calendar import previous_iso_week, week_key  # noqa: F401 (week_key re-exported)
+
+
+class WeekKeyField(models.IntegerField):
+    """year*100 + week_no of the row, refreshed from its own year/week_no on every insert or save."""
+
+    def pre_save(self, model_instance, add):
+        value = week_key(model_instance.year, model_instance.week_no)
+        setattr(model_instance, self.attname, value)
+        return value
+
 
 class WeeklyRecord(models.Model):
     year = models.IntegerField()
     week_no = models.IntegerField()
+    week_key = WeekKeyField(default=0, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     incoming_goods = models.IntegerField(default=0)
     outgoing_goods = models.IntegerField(default=0)
@@ -16,7 +27,11 @@ class WeeklyRecord(models.Model):
 
     class Meta:
         unique_together = ('year', 'week_no', 'product')
-        ordering = ['-year', '-week_no', 'product__jan_code']
+        ordering = ['-week_key', 'product__jan_code']
+        indexes = [
+            models.Index(fields=['product', 'week_key']),
+            models.Index(fields=['week_key', 'remaining_weeks']),
+        ]
 
     def save(self, *args, **kwargs):    # 🚨 Historical data → NEVER recalculate
         if self.is_historical:
@@ -27,14 +42,8 @@ class WeeklyRecord(models.Model):
             super().save(*args, **kwargs)
             return
 
-        # --- 1. Determine previous year & week correctly ---
-        if self.week_no > 1:
-            prev_year = self.year
-            prev_week = self.week_no - 1
-        else:
-            # Week 1 → look up last ISO week of previous year
-            prev_year = self.year - 1
-            prev_week = date(prev_year, 12, 28).isocalendar()[1]
+        # --- 1. Determine previous year & week correctly (week table lookup) ---
+        prev_year, prev_week = previous_iso_week(self.year, self.week_no)
 
         # --- 2. Query the actual previous weekly record ---
         try:
@@ -78,6 +87,7 @@ class FutureIncomingPlan(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     year = models.IntegerField()
     week_no = models.IntegerField()
+    week_key = WeekKeyField(default=0, editable=False)
 
     planned_incoming = models.IntegerField()
 
@@ -85,6 +95,10 @@ class FutureIncomingPlan(models.Model):
 
     class Meta:
         unique_together = ('product', 'year', 'week_no')
+        indexes = [
+            models.Index(fields=['product', 'week_key']),
+            models.Index(fields=['week_key']),
+        ]
     
     def __str__(self):
         return f"{self.product.jan_code} | {self.product.product_name} — Y{self.year} W{self.week_no} : {self.planned_incoming}"
@@ -99,6 +113,7 @@ class WeeklyInventory(models.Model):
 
     year = models.IntegerField()
     week_no = models.IntegerField()
+    week_key = WeekKeyField(default=0, editable=False)
     total_quantity = models.IntegerField()
     no_of_cases = models.IntegerField()
     loose = models.IntegerField()
@@ -106,9 +121,87 @@ class WeeklyInventory(models.Model):
 
     class Meta:
         unique_together = ("year", "week_no", "product")
+        indexes = [
+            models.Index(fields=["product", "week_key"]),
+            models.Index(fields=["week_key"]),
+        ]
     
     def __str__(self):
         return f"{self.product.jan_code} | {self.product.product_name} — Y{self.year} W{self.week_no}"
 
 
 
+
+
+class StockSnapshot(models.Model):
+    """Latest known stock per product, kept in sync by weekly.snapshots."""
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="stock_snapshot"
+    )
+
+    # latest WeeklyRecord
+    year = models.IntegerField(null=True, blank=True)
+    week_no = models.IntegerField(null=True, blank=True)
+    week_key = WeekKeyField(null=True, blank=True, editable=False)
+    incoming_goods = models.IntegerField(null=True, blank=True)
+    outgoing_goods = models.IntegerField(null=True, blank=True)
+    inventory = models.IntegerField(null=True, blank=True)
+    remaining_weeks = models.FloatField(null=True, blank=True)
+
+    # next non-zero FutureIncomingPlan (current week or later)
+    next_incoming = models.IntegerField(default=0)
+    next_incoming_key = models.IntegerField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["week_key", "remaining_weeks"]),
+            models.Index(fields=["inventory"]),
+            models.Index(fields=["next_incoming_key"]),
+        ]
+
+    def __str__(self):
+        return f"{self.product.jan_code} | {self.product.product_name} — Y{self.year} W{self.week_no} : {self.inventory}"
+
+
+class PackRule(models.Model):
+    """Bundle/pack rule used when reading the stock sheet (weekly.inventory_sheet)."""
+    KIND_CHOICES = (
+        ('link', 'Code link (DATA3)'),
+        ('category', 'Category multiplier (E column)'),
+        ('name', 'Name pattern (H column)'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    code = models.CharField(max_length=50, blank=True)  # link source / category code
+    linked_code = models.CharField(max_length=50, blank=True)  # link target
+    pattern = models.CharField(max_length=200, blank=True)  # substring of 商品名
+    group = models.CharField(max_length=10, blank=True)  # name group, e.g. "C" / "D"
+    multiplier = models.IntegerField(default=1)  # E value / count multiplier
+    priority = models.IntegerField(default=0)  # name patterns: lowest wins
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['kind', 'priority', 'id']
+
+    def __str__(self):
+        if self.kind == 'link':
+            return f"{self.code} → {self.linked_code}"
+        if self.kind == 'category':
+            return f"{self.code} x{self.multiplier}"
+        return f"{self.pattern} → {self.group} x{self.multiplier}"
+
+
+class PackRuleVersion(models.Model):
+    """
+    Single-row watermark bumped with every PackRule write, so each process
+    (web, run_jobs worker) knows when to recompile its rules.
+    """
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"v{self.version}"
@@ -0,0 +1,288 @@
+import pandas as pd
+from django.db import connection, transaction
+
+from products.models import Product, ProductDefaults
+from .models import WeeklyRecord, FutureIncomingPlan, week_key
+from .snapshots import deferred_refresh, refresh_passed_plans, refresh_snapshots
+from inventory.calendar import next_iso_week, previous_iso_week
+
+
+def remaining_weeks_for(inventory, forecast):
+    if forecast and forecast > 0:
+        return (inventory or 0) / forecast
+    return 0
+
+
+class QueryCounter:
+    """Counts the SQL statements executed on the default connection."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def close_week(year, week_no, entries):
+    """
+    Close one week for many products at once.
+
+    ``entries`` maps product id → {"incoming": int | None, "inventory": int}.
+    An incoming of None falls back to the planned incoming for that week.
+    Outgoing and remaining weeks follow the same rules as WeeklyRecord.save.
+    """
+    counter = QueryCounter()
+    product_ids = [int(pid) for pid in entries]
+    entries = {int(pid): values for pid, values in entries.items()}
+    key = week_key(year, week_no)
+    prev_key = week_key(*previous_iso_week(year, week_no))
+
+    with connection.execute_wrapper(counter), transaction.atomic(), deferred_refresh() as touched:
+        # --- 1. Load everything the calculation needs, one query each ---
+        forecasts = dict(
+            Product.objects.filter(id__in=product_ids).values_list("id", "forecast")
+        )
+        prev_inventory = dict(
+            WeeklyRecord.objects.filter(
+                product_id__in=product_ids, week_key=prev_key
+            ).values_list("product_id", "inventory")
+        )
+        default_outgoing = dict(
+            ProductDefaults.objects.filter(
+                product_id__in=product_ids
+            ).values_list("product_id", "default_outgoing")
+        )
+        planned = dict(
+            FutureIncomingPlan.objects.filter(
+                product_id__in=product_ids, week_key=key
+            ).values_list("product_id", "planned_incoming")
+        )
+        existing = {
+            r.product_id: r
+            for r in WeeklyRecord.objects.filter(
+                product_id__in=product_ids, week_key=key
+            )
+        }
+
+        # --- 2. Compute in memory ---
+        to_create, to_update = [], []
+        for pid in product_ids:
+            if pid not in forecasts:
+                continue
+
+            values = entries[pid]
+            incoming = values.get("incoming")
+            if incoming is None:
+                incoming = planned.get(pid, 0)
+            inventory = values.get("inventory") or 0
+
+            record = existing.get(pid)
+            if record is None:
+                record = WeeklyRecord(product_id=pid, year=year, week_no=week_no)
+                to_create.append(record)
+            else:
+                to_update.append(record)
+
+            record.incoming_goods = incoming
+            record.inventory = inventory
+
+            # Historical data → NEVER recalculate outgoing
+            if not record.is_historical:
+                if pid in prev_inventory:
+                    record.outgoing_goods = abs(
+                        (prev_inventory[pid] or 0) + (incoming or 0) - inventory
+                    )
+                else:
+                    record.outgoing_goods = default_outgoing.get(pid, 0)
+
+            record.remaining_weeks = remaining_weeks_for(inventory, forecasts[pid])
+
+        # --- 3. Write in bulk ---
+        WeeklyRecord.objects.bulk_create(to_create, batch_size=500)
+        WeeklyRecord.objects.bulk_update(
+            to_update,
+            ["incoming_goods", "outgoing_goods", "inventory", "remaining_weeks"],
+            batch_size=500,
+        )
+        FutureIncomingPlan.objects.filter(
+            product_id__in=product_ids, week_key=key
+        ).delete()
+
+        # --- 4. Closing a past week → fix the following weeks too ---
+        cascaded = recompute_downstream(
+            {r.product_id: (year, week_no, r.inventory) for r in to_create + to_update},
+            forecasts=forecasts,
+        )
+        touched.update(forecasts)
+
+    # snapshots still pointing at a plan of a week that is over move on
+    refresh_passed_plans()
+
+    return {
+        "created": len(to_create),
+        "updated": len(to_update),
+        "cascaded": cascaded,
+        "queries": counter.count,
+    }
+
+
+def recompute_downstream(starts, forecasts=None):
+    """
+    Recalculate the weeks that follow edited records.
+
+    ``starts`` maps product id → (year, week_no, inventory) of the edited
+    record.  Outgoing of week N+1 is derived from the inventory of week N, so
+    we walk forward week by week, only for products whose successor actually
+    changed, and stop at historical rows, gaps, or once values settle.
+    All changed rows are written with one bulk_update.
+
+    Returns the number of rows that were updated.
+    """
+    if not starts:
+        return 0
+
+    if forecasts is None:
+        forecasts = dict(
+            Product.objects.filter(id__in=starts).values_list("id", "forecast")
+        )
+
+    # (year, week_no) → {product_id: inventory of that week}
+    pending = {}
+    for pid, (year, week_no, inventory) in starts.items():
+        pending.setdefault((year, week_no), {})[pid] = inventory
+
+    changed = []
+    while pending:
+        key = min(pending)
+        frontier = pending.pop(key)
+        next_year, next_week = next_iso_week(*key)
+
+        successors = WeeklyRecord.objects.filter(
+            product_id__in=frontier, week_key=week_key(next_year, next_week)
+        )
+        for record in successors:
+            if record.is_historical:
+                continue
+
+            outgoing = abs(
+                (frontier[record.product_id] or 0)
+                + (record.incoming_goods or 0)
+                - (record.inventory or 0)
+            )
+            remaining = remaining_weeks_for(
+                record.inventory, forecasts.get(record.product_id)
+            )
+            if (
+                outgoing == record.outgoing_goods
+                and remaining == record.remaining_weeks
+            ):
+                continue
+
+            record.outgoing_goods = outgoing
+            record.remaining_weeks = remaining
+            changed.append(record)
+            pending.setdefault((next_year, next_week), {})[
+                record.product_id
+            ] = record.inventory
+
+    WeeklyRecord.objects.bulk_update(
+        changed, ["outgoing_goods", "remaining_weeks"], batch_size=500
+    )
+    with deferred_refresh() as touched:
+        touched.update(r.product_id for r in changed)
+    return len(changed)
+
+
+def import_historical(df, year=None, week_no=None, chunk_size=1000, progress=None):
+    """
+    Upsert historical weekly records from a DataFrame in bulk.
+
+    ``df`` needs yayoi_code, incoming, outgoing and inventory columns.
+    When it also has year and week_no (or week) columns every row keeps
+    its own week, so a whole history loads at once; otherwise all rows
+    go to the given ``year``/``week_no``.
+
+    Each chunk commits on its own and is reported to ``progress(done, total)``
+    so a background job can show how far it got; the upserts are idempotent,
+    so uploading the same file again completes a failed import.
+    """
+    df = df.rename(columns={"week": "week_no"})
+    if "year" not in df.columns or "week_no" not in df.columns:
+        if year is None or week_no is None:
+            raise ValueError("Year and week are required")
+        df = df.assign(year=year, week_no=week_no)
+
+    numeric_cols = ["year", "week_no", "incoming", "outgoing", "inventory"]
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors="coerce")
+    df[numeric_cols] = df[numeric_cols].fillna(0).astype(int)
+    df = df[(df["year"] > 0) & df["week_no"].between(1, 53)].copy()
+    df["yayoi_code"] = df["yayoi_code"].astype(str).str.strip()
+
+    # --- 1. Resolve every yayoi code with one query ---
+    products = pd.DataFrame(
+        list(
+            Product.objects.filter(
+                yayoi_code__in=df["yayoi_code"].unique().tolist()
+            ).values_list("yayoi_code", "id", "forecast")
+        ),
+        columns=["yayoi_code", "product_id", "forecast"],
+    )
+    df = df.merge(products, on="yayoi_code", how="left")
+    missing = df.loc[df["product_id"].isna(), "yayoi_code"].unique().tolist()
+    df = df.dropna(subset=["product_id"])
+    df["product_id"] = df["product_id"].astype(int)
+
+    # Same product & week twice in a file → last row wins
+    df = df.drop_duplicates(["product_id", "year", "week_no"], keep="last")
+
+    # --- 2. Remaining weeks, vectorized ---
+    df["remaining_weeks"] = (df["inventory"] / df["forecast"]).where(df["forecast"] > 0, 0)
+
+    # --- 3. Chunked upserts ---
+    records = [
+        WeeklyRecord(
+            product_id=row.product_id,
+            year=row.year,
+            week_no=row.week_no,
+            incoming_goods=row.incoming,
+            outgoing_goods=row.outgoing,
+            inventory=row.inventory,
+            remaining_weeks=float(row.remaining_weeks),
+            is_historical=True,
+        )
+        for row in df.itertuples(index=False)
+    ]
+
+    latest = df.sort_values(["year", "week_no"]).drop_duplicates("product_id", keep="last")
+    if progress:
+        progress(0, total=len(records))
+
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        with transaction.atomic():
+            WeeklyRecord.objects.bulk_create(
+                chunk,
+                update_conflicts=True,
+                unique_fields=["year", "week_no", "product"],
+                update_fields=[
+                    "week_key", "incoming_goods", "outgoing_goods",
+                    "inventory", "remaining_weeks", "is_historical",
+                ],
+            )
+        if progress:
+            progress(start + len(chunk))
+
+    with transaction.atomic():
+        # History feeds the outgoing of the first live week after it
+        recompute_downstream({
+            row.product_id: (row.year, row.week_no, row.inventory)
+            for row in latest.itertuples(index=False)
+        })
+        refresh_snapshots(df["product_id"].unique().tolist())
+
+    return {
+        "imported": len(records),
+        "weeks": sorted(set(zip(df["year"].tolist(), df["week_no"].tolist()))),
+        "missing": missing,
+    }
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from products.models import Product
+from .models import WeeklyRecord, FutureIncomingPlan, PackRule
+from .snapshots import queue_refresh
+from .inventory_sheet import invalidate_pack_rules
+
+
+def _deleting_product(origin):
+    # Product delete cascades to its records; the snapshot goes with it.
+    return getattr(origin, "model", type(origin)) is Product
+
+
+@receiver(post_save, sender=WeeklyRecord)
+@receiver(post_save, sender=FutureIncomingPlan)
+def refresh_snapshot_on_save(sender, instance, **kwargs):
+    queue_refresh(instance.product_id)
+
+
+@receiver(post_delete, sender=WeeklyRecord)
+@receiver(post_delete, sender=FutureIncomingPlan)
+def refresh_snapshot_on_delete(sender, instance, origin=None, **kwargs):
+    if _deleting_product(origin):
+        return
+    queue_refresh(instance.product_id)
+
+
+@receiver(post_save, sender=PackRule)
+@receiver(post_delete, sender=PackRule)
+def recompile_pack_rules(sender, **kwargs):
+    invalidate_pack_rules()
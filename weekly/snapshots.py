@@ -0,0 +1,135 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import OuterRef, Subquery
+from django.dispatch import Signal
+
+from inventory.calendar import current_week_key
+
+from products.models import Product
+from .models import WeeklyRecord, FutureIncomingPlan, StockSnapshot
+
+SNAPSHOT_FIELDS = [
+    "year", "week_no", "week_key", "incoming_goods", "outgoing_goods",
+    "inventory", "remaining_weeks", "next_incoming", "next_incoming_key",
+    "updated_at",
+]
+
+_deferred = threading.local()
+
+# sent after snapshot rows were rewritten (bulk upsert → no post_save)
+snapshots_refreshed = Signal()
+
+
+def refresh_snapshots(product_ids=None):
+    """
+    Rebuild StockSnapshot rows for the given products (all when None).
+
+    Runs a fixed number of queries regardless of how many products
+    are refreshed: products, latest records, upcoming plans, one upsert.
+    """
+    products = Product.objects.all()
+    records = WeeklyRecord.objects.all()
+    plans = FutureIncomingPlan.objects.filter(
+        planned_incoming__gt=0, week_key__gte=current_week_key()
+    )
+    if product_ids is not None:
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+        products = products.filter(id__in=product_ids)
+        records = records.filter(product_id__in=product_ids)
+        plans = plans.filter(product_id__in=product_ids)
+
+    ids = list(products.values_list("id", flat=True))
+
+    # --- latest weekly record per product ---
+    latest_id = (
+        WeeklyRecord.objects.filter(product_id=OuterRef("product_id"))
+        .order_by("-week_key")
+        .values("id")[:1]
+    )
+    latest = {
+        r["product_id"]: r
+        for r in records.filter(id=Subquery(latest_id)).values(
+            "product_id", "year", "week_no", "incoming_goods",
+            "outgoing_goods", "inventory", "remaining_weeks",
+        )
+    }
+
+    # --- next planned incoming per product (first one wins) ---
+    upcoming = {}
+    for plan in plans.order_by("product_id", "week_key").values(
+        "product_id", "week_key", "planned_incoming"
+    ):
+        upcoming.setdefault(plan["product_id"], plan)
+
+    snapshots = []
+    for pid in ids:
+        record = latest.get(pid, {})
+        plan = upcoming.get(pid, {})
+        snapshots.append(StockSnapshot(
+            product_id=pid,
+            year=record.get("year"),
+            week_no=record.get("week_no"),
+            incoming_goods=record.get("incoming_goods"),
+            outgoing_goods=record.get("outgoing_goods"),
+            inventory=record.get("inventory"),
+            remaining_weeks=record.get("remaining_weeks"),
+            next_incoming=plan.get("planned_incoming", 0),
+            next_incoming_key=plan.get("week_key"),
+        ))
+
+    StockSnapshot.objects.bulk_create(
+        snapshots,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=SNAPSHOT_FIELDS,
+    )
+    snapshots_refreshed.send(sender=StockSnapshot, product_ids=ids)
+    return len(snapshots)
+
+
+def refresh_passed_plans():
+    """
+    The next planned incoming depends on today's week, so once a planned
+    week is over the snapshot must move on to the following plan.
+    """
+    stale = list(
+        StockSnapshot.objects.filter(
+            next_incoming_key__lt=current_week_key()
+        ).values_list("product_id", flat=True)
+    )
+    if stale:
+        refresh_snapshots(stale)
+    return len(stale)
+
+
+@contextmanager
+def deferred_refresh():
+    """
+    Collect snapshot refreshes triggered by signals inside the block and
+    run them as one batch on exit. Use around loops of single-row writes.
+    """
+    pending = getattr(_deferred, "pending", None)
+    if pending is not None:
+        # nested → the outer block refreshes
+        yield pending
+        return
+
+    _deferred.pending = set()
+    try:
+        yield _deferred.pending
+        pending = _deferred.pending
+    finally:
+        _deferred.pending = None
+    refresh_snapshots(pending)
+
+
+def queue_refresh(product_id):
+    pending = getattr(_deferred, "pending", None)
+    if pending is not None:
+        pending.add(product_id)
+    else:
+        refresh_snapshots([product_id])
@@ -0,0 +1,113 @@
+import time
+
+import pandas as pd
+
+from jobs.services import JobError, job_handler, periodic_task
+from products.models import Product
+from products.services import sync_product_master
+from .inventory_sheet import compute_final_quantities
+from .services import import_historical
+from .snapshots import refresh_passed_plans
+
+
+def read_stock_sheet(file):
+    """Yayoi exports: .xls / .xlsx with the header on the 4th row."""
+    file_ext = file.name.split('.')[-1].lower()
+    try:
+        if file_ext == 'xls':
+            return pd.read_excel(file, header=3, engine='xlrd')  # for old .xls files
+        elif file_ext == 'xlsx':
+            return pd.read_excel(file, header=3, engine='openpyxl')  # for .xlsx files
+    except Exception:
+        raise JobError("Invalid Excel file")
+    raise JobError("Unsupported file type")
+
+
+@job_handler("weekly.product_master")
+def upload_product_master_job(job, file, progress):
+    parse_started = time.perf_counter()
+    df = read_stock_sheet(file)
+
+    required_columns = {"商品コード", "商品名", "入り数"}
+    if not required_columns.issubset(df.columns):
+        raise JobError("Missing required columns")
+    parse_time = time.perf_counter() - parse_started
+
+    result = sync_product_master(df, progress=progress)
+    timings = result["timings"]
+    return {
+        "message": (
+            f"{result['created']} products created, {result['updated']} updated, "
+            f"{result['unchanged']} unchanged "
+            f"(parse {parse_time:.2f}s, diff {timings['diff']:.2f}s, write {timings['write']:.2f}s)"
+        ),
+        **result,
+    }
+
+
+@job_handler("weekly.inventory_sheet")
+def upload_weekly_inventory_job(job, file, progress):
+    df = read_stock_sheet(file)
+
+    required = {"商品コード", "商品名", "総数"}
+    if not required.issubset(df.columns):
+        raise JobError("Excel must include: 商品コード, 商品名, 総数")
+    progress(0, total=len(df))
+
+    # Excel formula emulation (H/I/G/final D columns)
+    final_d = compute_final_quantities(df)
+
+    # product id → quantity, for the bulk add form inputs
+    products = pd.DataFrame(
+        list(Product.objects.values_list("id", "yayoi_code")),
+        columns=["id", "yayoi_code"],
+    )
+    quantities = products["yayoi_code"].map(final_d).fillna(0).astype(int)
+    return {
+        "message": "Inventory loaded successfully!",
+        "data": dict(zip(map(str, products["id"].tolist()), quantities.tolist())),
+    }
+
+
+@job_handler("weekly.historical")
+def upload_historical_job(job, file, progress):
+    try:
+        df = pd.read_excel(file)
+    except Exception:
+        raise JobError("Invalid Excel file")
+
+    required = {"yayoi_code", "incoming", "outgoing", "inventory"}
+    if not required.issubset(df.columns):
+        raise JobError("Excel must contain: yayoi_code, incoming, outgoing, inventory")
+
+    try:
+        result = import_historical(
+            df,
+            year=job.params.get("year"),
+            week_no=job.params.get("week_no"),
+            progress=progress,
+        )
+    except ValueError:
+        raise JobError("Enter Year and Week No, or include year / week_no columns in the file")
+
+    warnings = []
+    if result["missing"]:
+        warnings.append(f"{len(result['missing'])} products not found and skipped.")
+
+    if len(result["weeks"]) == 1:
+        (year, week), = result["weeks"]
+        message = f"Historical data uploaded for Year {year}, Week {week}. ({result['imported']} records)"
+    else:
+        message = f"Historical data uploaded for {len(result['weeks'])} weeks. ({result['imported']} records)"
+
+    return {
+        "message": message,
+        "warnings": warnings,
+        "imported": result["imported"],
+        "weeks": [list(w) for w in result["weeks"]],
+        "missing": result["missing"],
+    }
+
+
+# the next planned incoming depends on today's week → follow week roll-overs
+periodic_task("weekly.refresh_passed_plans")(refresh_passed_plans)
@@ -0,0 +1,490 @@
+import io
+import random
+
+import pandas as pd
+from django.core.management import call_command
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from inventory.calendar import current_week, week_range
+from products.models import Product, ProductDefaults, ProductMaster
+from .inventory_sheet import CompiledPackRules, PatternMatcher, compute_final_quantities, get_pack_rules
+from .models import (
+    FutureIncomingPlan, PackRule, PackRuleVersion, StockSnapshot, WeeklyInventory, WeeklyRecord,
+)
+from .services import close_week, import_historical, recompute_downstream
+from .snapshots import deferred_refresh
+
+# Rules as they were hard-coded before moving to PackRule
+DATA3_MAP = {f"02-99-{59 + n:04d}": f"02-52-{1 + n:04d}" for n in range(12)}
+CATEGORY_MAP = {
+    "02-52-0001": 25, "02-52-0002": 15, "02-52-0003": 8,
+    "02-52-0004": 5,  "02-52-0005": 3,  "02-52-0006": 25,
+    "02-52-0007": 25, "02-52-0008": 15, "02-52-0009": 8,
+    "02-52-0010": 5,  "02-52-0011": 3,  "02-52-0012": 25
+}
+NAME_GROUPS = [
+    ("ねこちゃんにもやさしいみるく2", "C", 1),
+    ("わんちゃんにもやさしいみるく300ml 3", "D", 1),
+    ("わんちゃんにもやさしいみるく3個", "D", 3),
+]
+LEGACY_RULES = CompiledPackRules(DATA3_MAP, CATEGORY_MAP, NAME_GROUPS)
+
+
+def legacy_final_quantities(df):
+    """The original per-row implementation of upload_weekly_inventory, kept as the reference."""
+    codes = df["商品コード"].astype(str).tolist()
+    names = df["商品名"].astype(str).tolist()
+    c_values = df["総数"].fillna(0).astype(int).tolist()
+
+    e_values = [CATEGORY_MAP.get(code, 0) for code in codes]
+
+    h_values = []
+    count_c, count_d1, count_d3 = 0, 0, 0
+    for name in names:
+        if "ねこちゃんにもやさしいみるく2" in name:
+            count_c += 1
+            h_values.append(f"C1_{count_c}")
+        elif "わんちゃんにもやさしいみるく300ml 3" in name:
+            count_d1 += 1
+            h_values.append(f"D1_{count_d1}")
+        elif "わんちゃんにもやさしいみるく3個" in name:
+            count_d3 += 1
+            h_values.append(f"D3_{count_d3}")
+        else:
+            h_values.append(None)
+
+    i_values = []
+    for h in h_values:
+        if not h:
+            i_values.append(0)
+            continue
+        prefix = h[0]
+        total = 0
+        for h2, c in zip(h_values, c_values):
+            if not h2 or not h2.startswith(prefix):
+                continue
+            if h2.startswith("D3"):
+                total += c * 3
+            else:
+                total += c
+        i_values.append(total)
+
+    d_pre = [i if i > 0 else c for i, c in zip(i_values, c_values)]
+    f_values = [d * e for d, e in zip(d_pre, e_values)]
+
+    f_lookup = dict(zip(codes, f_values))
+    g_values = []
+    for code in codes:
+        if code in DATA3_MAP:
+            g_values.append(f_lookup.get(DATA3_MAP[code], 0))
+        else:
+            g_values.append(0)
+
+    final_d = [i if i > 0 else (c + g) for i, c, g in zip(i_values, c_values, g_values)]
+
+    result = {}
+    for code in set(codes):
+        result[code] = final_d[codes.index(code)]
+    return result
+
+
+# Recorded stock sheets (trimmed) — 商品コード / 商品名 / 総数
+SAMPLE_SHEETS = {
+    "bundles_and_packs": pd.DataFrame({
+        "商品コード": ["02-52-0001", "02-99-0059", "02-52-0002", "02-99-0060",
+                   "03-10-0001", "03-10-0002", "03-10-0003", "03-10-0004", "01-01-0001"],
+        "商品名": ["みるく 25本入", "みるく バラ", "みるく 15本入", "みるく バラ15",
+                "ねこちゃんにもやさしいみるく2 200ml", "わんちゃんにもやさしいみるく300ml 3本",
+                "わんちゃんにもやさしいみるく3個パック", "ねこちゃんにもやさしいみるく2 x24",
+                "ドッグフード 1kg"],
+        "総数": [4, 7, 2, None, 10, 5, 6, 3, 120],
+    }),
+    "duplicates_and_blanks": pd.DataFrame({
+        "商品コード": ["02-52-0003", "02-52-0003", "02-99-0061", "02-99-0061", "02-99-0070", None],
+        "商品名": ["A", "A 2", "B", "B 2", None, "C"],
+        "総数": [1, 9, 2, 4, 8, 3],
+    }),
+    "no_groups": pd.DataFrame({
+        "商品コード": ["02-99-0062", "02-52-0004", "09-00-0001"],
+        "商品名": ["x", "y", "z"],
+        "総数": [0, 0, 0],
+    }),
+}
+
+
+def random_sheet(seed, rows=400):
+    rng = random.Random(seed)
+    codes = list(DATA3_MAP) + list(CATEGORY_MAP) + [f"05-00-{n:04d}" for n in range(60)]
+    names = ["ねこちゃんにもやさしいみるく2", "わんちゃんにもやさしいみるく300ml 3",
+             "わんちゃんにもやさしいみるく3個", "その他"]
+    return pd.DataFrame({
+        "商品コード": [rng.choice(codes) for _ in range(rows)],
+        "商品名": [rng.choice(names) + str(rng.randint(0, 9)) for _ in range(rows)],
+        "総数": [rng.choice([None, 0, rng.randint(1, 500)]) for _ in range(rows)],
+    })
+
+
+class ComputeFinalQuantitiesTests(SimpleTestCase):
+
+    def assertMatchesLegacy(self, df):
+        expected = legacy_final_quantities(df)
+        actual = compute_final_quantities(df, LEGACY_RULES)
+        self.assertEqual({k: int(v) for k, v in actual.items()}, expected)
+
+    def test_sample_sheets_match_legacy(self):
+        for name, df in SAMPLE_SHEETS.items():
+            with self.subTest(sheet=name):
+                self.assertMatchesLegacy(df)
+
+    def test_random_sheets_match_legacy(self):
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                self.assertMatchesLegacy(random_sheet(seed))
+
+    def test_empty_sheet(self):
+        df = pd.DataFrame({"商品コード": [], "商品名": [], "総数": []})
+        self.assertTrue(compute_final_quantities(df, LEGACY_RULES).empty)
+
+    def test_first_listed_pattern_wins(self):
+        rules = CompiledPackRules({}, {}, [("B", "X", 1), ("A", "Y", 2)])
+        self.assertEqual(list(rules.match_names(["A B", "A", "none"])), [0, 1, 2])
+
+    def test_overlapping_patterns_match_like_substring_search(self):
+        # patterns inside / overlapping each other exercise the suffix links
+        patterns = ["abcd", "bc", "cdx", "c", "zz"]
+        matcher = PatternMatcher(patterns)
+        for text in ["abcx", "xabcdx", "abd", "bcdx", "zzc", "", "ab"]:
+            with self.subTest(text=text):
+                expected = next((n for n, p in enumerate(patterns) if p in text), len(patterns))
+                self.assertEqual(matcher.first(text), expected)
+
+
+class PackRuleTests(TestCase):
+
+    def test_seeded_rules_match_legacy(self):
+        for name, df in SAMPLE_SHEETS.items():
+            with self.subTest(sheet=name):
+                self.assertEqual(
+                    {k: int(v) for k, v in compute_final_quantities(df).items()},
+                    legacy_final_quantities(df),
+                )
+
+    def test_rule_changes_are_picked_up(self):
+        df = pd.DataFrame({"商品コード": ["09-00-0001"], "商品名": ["新しいセット"], "総数": [4]})
+        self.assertEqual(compute_final_quantities(df)["09-00-0001"], 4)
+
+        rule = PackRule.objects.create(kind="name", pattern="新しいセット", group="N", multiplier=6)
+        self.assertEqual(compute_final_quantities(df)["09-00-0001"], 24)
+
+        rule.delete()
+        self.assertEqual(compute_final_quantities(df)["09-00-0001"], 4)
+
+    def test_rules_are_compiled_once(self):
+        first = get_pack_rules()
+        with self.assertNumQueries(1):  # the watermark
+            self.assertIs(get_pack_rules(), first)
+
+    def test_writes_from_another_process_are_picked_up(self):
+        df = pd.DataFrame({"商品コード": ["09-00-0001"], "商品名": ["新しいセット"], "総数": [4]})
+        rule = PackRule.objects.create(kind="name", pattern="新しいセット", group="N", multiplier=6)
+        self.assertEqual(compute_final_quantities(df)["09-00-0001"], 24)
+
+        # what the web process leaves behind for the run_jobs worker: new rows, new version
+        PackRule.objects.filter(id=rule.id).update(multiplier=2)
+        PackRuleVersion.objects.update(version=F("version") + 1)
+        self.assertEqual(compute_final_quantities(df)["09-00-0001"], 8)
+
+
+class UploadWeeklyInventoryTests(TestCase):
+
+    def setUp(self):
+        user = CustomUser.objects.create_user("staff", password="pw", role="Staff")
+        self.client.force_login(user)
+
+    def test_returns_quantity_for_every_product(self):
+        df = SAMPLE_SHEETS["bundles_and_packs"]
+        linked = Product.objects.create(yayoi_code="02-99-0059", product_name="みるく バラ")
+        missing = Product.objects.create(yayoi_code="99-99-9999", product_name="未登録")
+
+        buf = io.BytesIO()
+        df.to_excel(buf, index=False, startrow=3)
+        buf.seek(0)
+        buf.name = "stock.xlsx"
+
+        response = self.client.post(reverse("upload_weekly_inventory"), {"file": buf})
+        self.assertEqual(response.status_code, 202)
+
+        call_command("run_jobs", "--once", stdout=io.StringIO())
+        job = self.client.get(response.json()["status_url"]).json()
+
+        self.assertEqual(job["status"], "done")
+        data = job["result"]["data"]
+        expected = legacy_final_quantities(df)
+        self.assertEqual(data[str(linked.id)], expected["02-99-0059"])
+        self.assertEqual(data[str(missing.id)], 0)
+
+
+class SaveWeeklyInventoryTableTests(TestCase):
+
+    def setUp(self):
+        user = CustomUser.objects.create_superuser("admin", password="pw", role="Admin")
+        self.client.force_login(user)
+
+    def test_missing_or_invalid_week_is_a_bad_request(self):
+        url = reverse("save_weekly_inventory_table")
+        for data in ({}, {"year": "2025"}, {"year": "2025", "week_no": "W3"}):
+            with self.subTest(data=data):
+                response = self.client.post(url, data)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+    def test_saves_cases_and_loose(self):
+        master = ProductMaster.objects.create(yayoi_code="02-52-0001", product_name="みるく", quantity=12)
+        cleared = ProductMaster.objects.create(yayoi_code="02-52-0002", product_name="ふーど", quantity=6)
+        response = self.client.post(reverse("save_weekly_inventory_table"), {
+            "year": "2025", "week_no": "3",
+            f"quantity_{master.id}": "12", f"total_{master.id}": "30",
+            f"quantity_{cleared.id}": "", f"total_{cleared.id}": "",  # cleared cells
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict((pid, rest) for pid, *rest in WeeklyInventory.objects.values_list(
+                "product_id", "total_quantity", "no_of_cases", "loose")),
+            {master.id: [30, 2, 6], cleared.id: [0, 0, 0]},
+        )
+
+    def test_non_numeric_cells_are_a_bad_request(self):
+        master = ProductMaster.objects.create(yayoi_code="02-52-0001", product_name="みるく", quantity=12)
+        url = reverse("save_weekly_inventory_table")
+        for cells in ({f"quantity_{master.id}": "12", f"total_{master.id}": "三十"},
+                      {f"quantity_{master.id}": "a dozen"},
+                      {"quantity_abc": "12"}):
+            with self.subTest(cells=cells):
+                response = self.client.post(url, {"year": "2025", "week_no": "3", **cells})
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(WeeklyInventory.objects.exists())
+
+    def test_login_required(self):
+        master = ProductMaster.objects.create(yayoi_code="02-52-0001", product_name="みるく", quantity=12)
+        self.client.logout()
+        response = self.client.post(reverse("save_weekly_inventory_table"), {
+            "year": "2025", "week_no": "3", f"quantity_{master.id}": "12", f"total_{master.id}": "30",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(WeeklyInventory.objects.exists())
+
+
+def record(product, year, week_no, inventory, incoming=0, outgoing=0, **fields):
+    """A WeeklyRecord written as is (bulk insert: no save() recompute, no signals)."""
+    return WeeklyRecord.objects.bulk_create([WeeklyRecord(
+        product=product, year=year, week_no=week_no, inventory=inventory,
+        incoming_goods=incoming, outgoing_goods=outgoing, **fields,
+    )])[0]
+
+
+class CloseWeekTests(TestCase):
+
+    def setUp(self):
+        # forecast = 30 / 30 * 7 = 7 per week
+        self.known = Product.objects.create(
+            yayoi_code="02-52-0001", product_name="みるく", monthly_sales_prediction=30)
+        self.new = Product.objects.create(
+            yayoi_code="02-52-0002", product_name="ふーど", monthly_sales_prediction=30)
+        ProductDefaults.objects.create(product=self.new, default_outgoing=4)
+        record(self.known, 2020, 53, inventory=50)
+        FutureIncomingPlan.objects.create(product=self.known, year=2021, week_no=1, planned_incoming=20)
+
+    def test_close_week(self):
+        result = close_week(2021, 1, {
+            str(self.known.id): {"incoming": None, "inventory": 56},  # blank → planned 20
+            str(self.new.id): {"incoming": 5, "inventory": 14},
+        })
+        self.assertEqual((result["created"], result["updated"]), (2, 0))
+
+        known = WeeklyRecord.objects.get(product=self.known, week_key=202101)
+        self.assertEqual((known.incoming_goods, known.outgoing_goods, known.inventory),
+                         (20, 14, 56))  # 50 + 20 - 56, previous week across the year end
+        self.assertEqual(known.remaining_weeks, 8)
+
+        new = WeeklyRecord.objects.get(product=self.new, week_key=202101)
+        self.assertEqual((new.incoming_goods, new.outgoing_goods, new.remaining_weeks), (5, 4, 2))
+
+        self.assertFalse(FutureIncomingPlan.objects.filter(product=self.known).exists())
+        snapshot = StockSnapshot.objects.get(product=self.known)
+        self.assertEqual((snapshot.week_key, snapshot.inventory, snapshot.next_incoming),
+                         (202101, 56, 0))
+
+    def test_closing_again_updates_and_cascades(self):
+        close_week(2021, 1, {self.known.id: {"incoming": 0, "inventory": 40}})
+        record(self.known, 2021, 2, inventory=30, incoming=10, outgoing=20)
+
+        result = close_week(2021, 1, {self.known.id: {"incoming": 0, "inventory": 45}})
+
+        self.assertEqual((result["created"], result["updated"], result["cascaded"]), (0, 1, 1))
+        following = WeeklyRecord.objects.get(product=self.known, week_key=202102)
+        self.assertEqual(following.outgoing_goods, 25)  # 45 + 10 - 30
+        snapshot = StockSnapshot.objects.get(product=self.known)
+        self.assertEqual((snapshot.week_key, snapshot.outgoing_goods), (202102, 25))
+
+
+# 2020 has 53 ISO weeks: the chain crosses W53 and the year end
+CHAIN = [(2020, 52), (2020, 53), (2021, 1), (2021, 2), (2021, 3)]
+
+
+class RecomputeDownstreamTests(TestCase):
+
+    def setUp(self):
+        self.products = [
+            Product.objects.create(yayoi_code=f"02-52-000{n}", product_name=f"p{n}",
+                                   monthly_sales_prediction=30)
+            for n in range(2)
+        ]
+        # stale derived values everywhere (as left by a raw import)
+        for n, product in enumerate(self.products):
+            for i, (year, week_no) in enumerate(CHAIN):
+                record(product, year, week_no, inventory=100 - 10 * i + n, incoming=5 * i)
+        # forecast changed since: every remaining_weeks is stale too
+        Product.objects.update(monthly_sales_prediction=60, forecast=14)
+
+    def rows(self):
+        return list(WeeklyRecord.objects.order_by("product_id", "week_key").values_list(
+            "product_id", "week_key", "outgoing_goods", "remaining_weeks"))
+
+    def per_row_reference(self):
+        """What saving every following record one by one (the old way) gives."""
+        for r in WeeklyRecord.objects.filter(week_key__gt=202052).order_by("week_key"):
+            r.save()
+        return self.rows()
+
+    def edit_first_week(self, forecasts=None):
+        WeeklyRecord.objects.filter(week_key=202052).update(inventory=120)
+        return recompute_downstream(
+            {p.id: (2020, 52, 120) for p in self.products}, forecasts=forecasts,
+        )
+
+    def test_following_weeks_match_per_row_save(self):
+        self.assertEqual(self.edit_first_week(), 2 * (len(CHAIN) - 1))
+        recomputed = self.rows()
+
+        self.assertEqual(recomputed, self.per_row_reference())
+        first = WeeklyRecord.objects.get(product=self.products[0], week_key=202053)
+        self.assertEqual(first.outgoing_goods, 35)  # 120 + 5 - 90, carried from W52
+        self.assertEqual(first.remaining_weeks, 90 / 14)
+
+    def test_given_forecasts_match_loaded_ones(self):
+        self.edit_first_week(forecasts={p.id: 14 for p in self.products})
+        self.assertEqual(self.rows(), self.per_row_reference())
+
+    def test_stops_at_historical_rows(self):
+        WeeklyRecord.objects.filter(week_key=202101).update(is_historical=True)
+        self.edit_first_week()
+        after = WeeklyRecord.objects.filter(week_key__gte=202101).values_list(
+            "outgoing_goods", flat=True)
+        self.assertEqual(set(after), {0})
+
+
+class StockSnapshotSyncTests(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            yayoi_code="02-52-0001", product_name="みるく", monthly_sales_prediction=30)
+        self.next_week, self.later = week_range(current_week().key, 1, 2)
+
+    def snapshot(self):
+        return StockSnapshot.objects.filter(product=self.product).values(
+            "week_key", "inventory", "next_incoming", "next_incoming_key").first()
+
+    def plan(self, key, planned):
+        return FutureIncomingPlan.objects.create(
+            product=self.product, year=key // 100, week_no=key % 100, planned_incoming=planned)
+
+    def test_follows_record_save_and_delete(self):
+        WeeklyRecord.objects.create(product=self.product, year=2021, week_no=1, inventory=30)
+        latest = WeeklyRecord.objects.create(product=self.product, year=2021, week_no=2, inventory=20)
+        self.assertEqual(self.snapshot()["week_key"], 202102)
+
+        latest.inventory = 25
+        latest.save()
+        self.assertEqual(self.snapshot()["inventory"], 25)
+
+        latest.delete()
+        self.assertEqual((self.snapshot()["week_key"], self.snapshot()["inventory"]), (202101, 30))
+
+    def test_follows_plan_save_and_delete(self):
+        later = self.plan(self.later, 40)
+        self.assertEqual(self.snapshot()["next_incoming_key"], self.later)
+
+        sooner = self.plan(self.next_week, 10)
+        self.assertEqual((self.snapshot()["next_incoming"], self.snapshot()["next_incoming_key"]),
+                         (10, self.next_week))
+
+        sooner.delete()
+        later.delete()
+        self.assertEqual((self.snapshot()["next_incoming"], self.snapshot()["next_incoming_key"]),
+                         (0, None))
+
+    def test_product_delete_cascades(self):
+        WeeklyRecord.objects.create(product=self.product, year=2021, week_no=1, inventory=30)
+        self.plan(self.next_week, 10)
+        self.product.delete()
+        self.assertFalse(StockSnapshot.objects.exists())
+
+    def test_deferred_refresh_batches(self):
+        with deferred_refresh():
+            for week_no in (1, 2, 3):
+                WeeklyRecord.objects.create(
+                    product=self.product, year=2021, week_no=week_no, inventory=10 * week_no)
+            self.plan(self.next_week, 10)
+            self.assertIsNone(self.snapshot())
+
+        self.assertEqual(self.snapshot(), {
+            "week_key": 202103, "inventory": 30,
+            "next_incoming": 10, "next_incoming_key": self.next_week,
+        })
+
+
+class ImportHistoricalTests(TestCase):
+
+    def setUp(self):
+        self.products = [
+            Product.objects.create(yayoi_code=f"02-52-000{n}", product_name=f"p{n}",
+                                   monthly_sales_prediction=30)  # forecast 7
+            for n in range(2)
+        ]
+        # first live week after the history, outgoing still from the defaults
+        record(self.products[0], 2021, 3, inventory=40, incoming=10, outgoing=0)
+
+    def test_chunked_multi_week_import(self):
+        rows = [
+            {"yayoi_code": p.yayoi_code, "year": year, "week_no": week_no,
+             "incoming": 0, "outgoing": 7, "inventory": 70 - 7 * i}
+            for p in self.products
+            for i, (year, week_no) in enumerate([(2020, 53), (2021, 1), (2021, 2)])
+        ]
+        rows.append({"yayoi_code": "99-99-9999", "year": 2021, "week_no": 1,
+                     "incoming": 0, "outgoing": 0, "inventory": 5})
+        calls = []
+
+        result = import_historical(
+            pd.DataFrame(rows), chunk_size=4,
+            progress=lambda done, total=None: calls.append((done, total)),
+        )
+
+        self.assertEqual(result["imported"], 6)
+        self.assertEqual(result["weeks"], [(2020, 53), (2021, 1), (2021, 2)])
+        self.assertEqual(result["missing"], ["99-99-9999"])
+        self.assertEqual(calls, [(0, 6), (4, None), (6, None)])
+
+        chain = list(WeeklyRecord.objects.filter(product=self.products[0], is_historical=True)
+                     .order_by("week_key").values_list("week_key", "remaining_weeks"))
+        self.assertEqual(chain, [(202053, 10), (202101, 9), (202102, 8)])
+
+        live = WeeklyRecord.objects.get(product=self.products[0], week_key=202103)
+        self.assertEqual(live.outgoing_goods, 26)  # 56 + 10 - 40, from the last imported week
+        self.assertEqual(
+            dict(StockSnapshot.objects.values_list("product_id", "week_key")),
+            {self.products[0].id: 202103, self.products[1].id: 202102},
+        )
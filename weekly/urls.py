@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, views_api
 
 urlpatterns = [
     path('', views.weekly_list, name='weekly_list'),
@@ -12,5 +12,6 @@ urlpatterns = [
     path('weekly-inventory/', views.weekly_inventory_table, name="weekly_inventory_form"),
     path("save/", views.save_weekly_inventory_table, name="save_weekly_inventory_table"),
     path("upload-product-master/", views.upload_product_master, name="upload_product_master"),
+    path("api/records/", views_api.weekly_records_api, name="weekly_records_api"),
 
 ]
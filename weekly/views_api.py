@@ -0,0 +1,97 @@
+from django.contrib.auth.decorators import login_required
+from django.db.models import F
+from django.http import JsonResponse
+
+from accounts.decorators import role_required
+from dashboard.pagination import keyset_paginate
+from products.search import search_products
+from .models import WeeklyRecord, week_key
+
+# API field → ORM path (product columns come from the same join)
+RECORD_FIELDS = {
+    "id": "id",
+    "year": "year",
+    "week_no": "week_no",
+    "week_key": "week_key",
+    "product_id": "product_id",
+    "yayoi_code": "product__yayoi_code",
+    "jan_code": "product__jan_code",
+    "product_name": "product__product_name",
+    "incoming_goods": "incoming_goods",
+    "outgoing_goods": "outgoing_goods",
+    "inventory": "inventory",
+    "remaining_weeks": "remaining_weeks",
+    "is_historical": "is_historical",
+}
+DEFAULT_FIELDS = ["id", "year", "week_no", "product_id", "product_name", "jan_code",
+                  "incoming_goods", "outgoing_goods", "inventory", "remaining_weeks"]
+
+RECORD_ORDERING = ("-week_key", "product__yayoi_code")
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+def parse_week(value):
+    """"YYYY-Www" → week key, None when empty or malformed."""
+    try:
+        year, week = value.split("-W")
+        return week_key(int(year), int(week))
+    except (AttributeError, ValueError):
+        return None
+
+
+def filter_records(records, params):
+    """Filters shared by weekly_list and the records API."""
+    product_ids = [p for p in params.getlist("product") if p.isdigit()]
+    if product_ids:
+        records = records.filter(product_id__in=product_ids)
+
+    start, end = parse_week(params.get("start_week")), parse_week(params.get("end_week"))
+    if start:
+        records = records.filter(week_key__gte=start)
+    if end:
+        records = records.filter(week_key__lte=end)
+
+    year, week = params.get("year"), params.get("week")
+    if year and week and year.isdigit() and week.isdigit():
+        records = records.filter(week_key=week_key(int(year), int(week)))
+
+    return search_products(records, params.get("search"), prefix="product__")
+
+
+@login_required
+@role_required(['view'])
+def weekly_records_api(request):
+    """
+    GET weekly records as JSON, newest week first.
+
+    ?fields=a,b,c       projection (see RECORD_FIELDS)
+    ?product=<id>       repeatable
+    ?start_week=YYYY-Www&end_week=YYYY-Www, ?year=&week=, ?search=
+    ?limit=             page size (max 500)
+    ?cursor=            "next" value of the previous response
+    """
+    fields = [f for f in request.GET.get("fields", "").split(",") if f] or DEFAULT_FIELDS
+    unknown = [f for f in fields if f not in RECORD_FIELDS]
+    if unknown:
+        return JsonResponse({"error": f"Unknown fields: {', '.join(unknown)}"}, status=400)
+
+    try:
+        limit = min(max(int(request.GET.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({"error": "limit must be a number"}, status=400)
+
+    records = filter_records(WeeklyRecord.objects.all(), request.GET)
+    # values() → one joined query, no model instances
+    records = records.values(**{
+        f"_f_{name}": F(RECORD_FIELDS[name]) for name in fields
+    })
+
+    page = keyset_paginate(
+        records, RECORD_ORDERING, request.GET.get("cursor"), per_page=limit, with_count=False
+    )
+
+    return JsonResponse({
+        "results": [{name: row[f"_f_{name}"] for name in fields} for row in page],
+        "next": page.next_cursor,
+    })